@@ -0,0 +1,127 @@
+"""
+Modo de execução ASGI.
+
+As rotas de leitura mais pesadas (`/estoque`, histórico do produto e
+`/api/contadores`) são atendidas direto por este módulo: a view Flask roda
+em um pool de threads dedicado ao banco (ESTOQUE_DB_THREADS), nunca no event
+loop, e o corpo da resposta é agrupado em blocos de até TAMANHO_BLOCO bytes
+antes de voltar ao loop. Assim o histórico em streaming faz uma troca de
+thread por bloco, e não por linha renderizada; se o cliente lê devagar, a
+fila limitada segura a thread produtora (backpressure).
+
+As demais rotas (escritas, jobs, API) passam pelo WSGIMiddleware do a2wsgi.
+
+Uso (requer `pip install uvicorn a2wsgi`):
+    uvicorn asgi:asgi_app --workers 2
+"""
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from werkzeug.exceptions import HTTPException
+
+from app import app
+
+DB_THREADS = int(os.environ.get('ESTOQUE_DB_THREADS', '16'))
+TAMANHO_BLOCO = 64 * 1024
+BLOCOS_PENDENTES = 4
+
+# Endpoints servidos pelo caminho assíncrono (apenas GET)
+ROTAS_ASSINCRONAS = {'layout_estoque', 'historico_produto', 'api_contadores'}
+
+_pool = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix='estoque-db')
+_wsgi = WSGIMiddleware(app, workers=DB_THREADS)
+_rotas = app.url_map.bind('localhost')
+
+_FIM = object()
+
+
+def _assincrona(scope) -> bool:
+    if scope['type'] != 'http' or scope['method'] != 'GET':
+        return False
+    try:
+        endpoint, _ = _rotas.match(scope['path'], method='GET')
+    except HTTPException:
+        return False
+    return endpoint in ROTAS_ASSINCRONAS
+
+
+def _executar(environ, loop, fila: asyncio.Queue, parar: threading.Event) -> None:
+    """
+    Chama a aplicação WSGI e entrega à fila o início da resposta e os blocos do corpo.
+
+    Roda inteiro em uma única thread do pool: o contexto do Flask empurrado
+    pelo stream_template é aberto e fechado na mesma thread.
+    """
+    def entregar(item) -> None:
+        asyncio.run_coroutine_threadsafe(fila.put(item), loop).result()
+
+    inicio: List[Tuple[str, list]] = []
+
+    def start_response(status, headers, exc_info=None):
+        inicio[:] = [(status, headers)]
+
+    corpo = None
+    try:
+        corpo = app(environ, start_response)
+        status, headers = inicio[0]
+        entregar((int(status.split(' ', 1)[0]), [
+            (nome.lower().encode('latin1'), valor.encode('latin1')) for nome, valor in headers
+        ]))
+        buffer = bytearray()
+        for pedaco in corpo:
+            if parar.is_set():
+                return
+            buffer += pedaco
+            if len(buffer) >= TAMANHO_BLOCO:
+                entregar(bytes(buffer))
+                buffer.clear()
+        if buffer:
+            entregar(bytes(buffer))
+    finally:
+        if corpo is not None and hasattr(corpo, 'close'):
+            corpo.close()
+        entregar(_FIM)
+
+
+async def _servir(scope, send) -> None:
+    loop = asyncio.get_running_loop()
+    fila: asyncio.Queue = asyncio.Queue(maxsize=BLOCOS_PENDENTES)
+    parar = threading.Event()
+    environ = build_environ(scope, io.BytesIO(b''))
+    produtor = loop.run_in_executor(_pool, _executar, environ, loop, fila, parar)
+
+    try:
+        inicio = await fila.get()
+        if inicio is _FIM:
+            await produtor  # propaga a exceção da aplicação
+            return
+        status, headers = inicio
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        while True:
+            bloco = await fila.get()
+            if bloco is _FIM:
+                break
+            await send({'type': 'http.response.body', 'body': bloco, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        # Cliente desconectado ou erro: libera a thread produtora e descarta o resto
+        parar.set()
+        while not produtor.done():
+            try:
+                await asyncio.wait_for(fila.get(), timeout=0.1)
+            except asyncio.TimeoutError:
+                pass
+        await produtor
+
+
+async def asgi_app(scope, receive, send) -> None:
+    if _assincrona(scope):
+        await _servir(scope, send)
+    else:
+        await _wsgi(scope, receive, send)
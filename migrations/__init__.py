@@ -0,0 +1,71 @@
+"""
+Migrações de esquema e dados.
+
+Bancos novos são criados direto pelo `db.create_all()` (já no esquema atual) e
+todas as migrações são apenas marcadas como aplicadas. Bancos existentes
+recebem somente as migrações pendentes, em ordem.
+
+Uso:
+    flask --app app migrar
+"""
+from sqlalchemy import inspect, text
+
+from migrations import (
+    m0001_chaves_inteiras, m0002_ponto_reposicao, m0003_indice_data_movimentacao, m0004_estados_reparo,
+    m0005_busca_trigrama, m0006_contadores_estoque, m0007_padroes_utc,
+    m0008_chaves_idempotencia, m0009_transicoes_com_sinal, m0010_ponto_tipo_por_rotulo,
+    m0011_saldo_arquivado_cascata, m0012_obra_cascata,
+)
+
+MIGRACOES = [
+    ('0001_chaves_inteiras', m0001_chaves_inteiras.aplicar),
+    ('0002_ponto_reposicao', m0002_ponto_reposicao.aplicar),
+    ('0003_indice_data_movimentacao', m0003_indice_data_movimentacao.aplicar),
+    ('0004_estados_reparo', m0004_estados_reparo.aplicar),
+    ('0005_busca_trigrama', m0005_busca_trigrama.aplicar),
+    ('0006_contadores_estoque', m0006_contadores_estoque.aplicar),
+    ('0007_padroes_utc', m0007_padroes_utc.aplicar),
+    ('0008_chaves_idempotencia', m0008_chaves_idempotencia.aplicar),
+    ('0009_transicoes_com_sinal', m0009_transicoes_com_sinal.aplicar),
+    ('0010_ponto_tipo_por_rotulo', m0010_ponto_tipo_por_rotulo.aplicar),
+    ('0011_saldo_arquivado_cascata', m0011_saldo_arquivado_cascata.aplicar),
+    ('0012_obra_cascata', m0012_obra_cascata.aplicar),
+]
+
+
+def atualizar_banco(db):
+    """
+    Aplica as migrações pendentes e cria tabelas novas.
+
+    Args:
+        db: Instância Flask-SQLAlchemy (requer app context)
+
+    Returns:
+        list: Nomes das migrações executadas neste banco
+    """
+    engine = db.engine
+    banco_novo = not inspect(engine).has_table('produto')
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_migracao ('
+            'nome VARCHAR(100) PRIMARY KEY, aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP)'
+        ))
+        aplicadas = {row[0] for row in conn.execute(text('SELECT nome FROM schema_migracao'))}
+
+    if banco_novo:
+        db.create_all()
+
+    executadas = []
+    for nome, aplicar in MIGRACOES:
+        if nome in aplicadas:
+            continue
+        if not banco_novo:
+            aplicar(engine)
+            executadas.append(nome)
+        with engine.begin() as conn:
+            conn.execute(text('INSERT INTO schema_migracao (nome) VALUES (:nome)'), {'nome': nome})
+
+    # Tabelas introduzidas sem migração de dados (create_all não altera as existentes)
+    db.create_all()
+    return executadas
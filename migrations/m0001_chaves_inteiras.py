@@ -0,0 +1,132 @@
+"""
+Troca as chaves UUID em texto por chaves inteiras.
+
+`produto.id` passa a ser INTEGER (rowid do SQLite) e o UUID antigo é mantido
+em `produto.id_publico`, usado nas URLs. Todas as chaves estrangeiras
+(`produto_id`, `origem_id`) e `usuario_id` são reescritas como inteiros.
+
+O DDL abaixo é o esquema desta versão e não deve acompanhar mudanças
+posteriores dos models; essas entram em migrações próprias.
+"""
+
+SCRIPT = """
+BEGIN;
+
+ALTER TABLE produto RENAME TO produto_old;
+ALTER TABLE movimentacao_estoque RENAME TO movimentacao_estoque_old;
+ALTER TABLE movimentacao_estoque_obra RENAME TO movimentacao_estoque_obra_old;
+ALTER TABLE compra RENAME TO compra_old;
+ALTER TABLE equipamento_danificado RENAME TO equipamento_danificado_old;
+
+CREATE TABLE produto (
+    id INTEGER NOT NULL PRIMARY KEY,
+    id_publico VARCHAR(36) NOT NULL UNIQUE,
+    nome VARCHAR(100) NOT NULL,
+    quantidade INTEGER NOT NULL,
+    local_produto VARCHAR(100) NOT NULL,
+    unidade_medida VARCHAR(50),
+    tipo VARCHAR(50) NOT NULL,
+    origem VARCHAR(50),
+    danificado BOOLEAN,
+    origem_id INTEGER REFERENCES produto (id)
+);
+
+INSERT INTO produto (id_publico, nome, quantidade, local_produto, unidade_medida, tipo, origem, danificado)
+SELECT id, nome, quantidade, local_produto, unidade_medida, tipo, origem, danificado
+FROM produto_old ORDER BY rowid;
+
+UPDATE produto SET origem_id = (
+    SELECT pai.id FROM produto_old o JOIN produto pai ON pai.id_publico = o.origem_id
+    WHERE o.id = produto.id_publico
+);
+
+CREATE TABLE movimentacao_estoque (
+    id INTEGER NOT NULL PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,
+    quantidade INTEGER NOT NULL,
+    produto_id INTEGER REFERENCES produto (id),
+    usuario_id INTEGER,
+    observacao TEXT,
+    data DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+CREATE INDEX ix_movimentacao_estoque_produto_id ON movimentacao_estoque (produto_id);
+
+INSERT INTO movimentacao_estoque (id, tipo, quantidade, produto_id, usuario_id, observacao, data)
+SELECT m.id, m.tipo, m.quantidade, p.id, {usuario_id}, m.observacao, m.data
+FROM movimentacao_estoque_old m LEFT JOIN produto p ON p.id_publico = m.produto_id;
+
+CREATE TABLE movimentacao_estoque_obra (
+    id INTEGER NOT NULL PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,
+    quantidade INTEGER NOT NULL,
+    produto_id INTEGER REFERENCES produto (id),
+    usuario_id INTEGER,
+    obra_id INTEGER,
+    data DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+CREATE INDEX ix_movimentacao_estoque_obra_produto_id ON movimentacao_estoque_obra (produto_id);
+
+INSERT INTO movimentacao_estoque_obra (id, tipo, quantidade, produto_id, usuario_id, obra_id, data)
+SELECT m.id, m.tipo, m.quantidade, p.id, {usuario_id}, m.obra_id, m.data
+FROM movimentacao_estoque_obra_old m LEFT JOIN produto p ON p.id_publico = m.produto_id;
+
+CREATE TABLE compra (
+    id INTEGER NOT NULL PRIMARY KEY,
+    produto_id INTEGER REFERENCES produto (id),
+    quantidade INTEGER,
+    fornecedor VARCHAR(200),
+    data DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+CREATE INDEX ix_compra_produto_id ON compra (produto_id);
+
+INSERT INTO compra (id, produto_id, quantidade, fornecedor, data)
+SELECT c.id, p.id, c.quantidade, c.fornecedor, c.data
+FROM compra_old c LEFT JOIN produto p ON p.id_publico = c.produto_id;
+
+CREATE TABLE equipamento_danificado (
+    id INTEGER NOT NULL PRIMARY KEY,
+    produto_id INTEGER REFERENCES produto (id),
+    nome VARCHAR(100) NOT NULL,
+    quantidade INTEGER NOT NULL,
+    data DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+CREATE INDEX ix_equipamento_danificado_produto_id ON equipamento_danificado (produto_id);
+
+INSERT INTO equipamento_danificado (id, produto_id, nome, quantidade, data)
+SELECT e.id, p.id, e.nome, e.quantidade, e.data
+FROM equipamento_danificado_old e LEFT JOIN produto p ON p.id_publico = e.produto_id;
+
+DROP TABLE equipamento_danificado_old;
+DROP TABLE compra_old;
+DROP TABLE movimentacao_estoque_obra_old;
+DROP TABLE movimentacao_estoque_old;
+DROP TABLE produto_old;
+
+COMMIT;
+"""
+
+# usuario_id era texto livre; apenas valores puramente numéricos são preservados
+USUARIO_ID_INTEIRO = (
+    "CASE WHEN m.usuario_id <> '' AND m.usuario_id NOT GLOB '*[^0-9]*' "
+    "THEN CAST(m.usuario_id AS INTEGER) END"
+)
+
+
+def aplicar(engine):
+    """Reescreve as tabelas com chaves inteiras (SQLite) e compacta o arquivo."""
+    conn = engine.raw_connection()
+    try:
+        sqlite_conn = conn.driver_connection
+        colunas = [row[1] for row in sqlite_conn.execute('PRAGMA table_info(produto)')]
+        if 'id_publico' in colunas:
+            return
+
+        try:
+            sqlite_conn.executescript(SCRIPT.format(usuario_id=USUARIO_ID_INTEIRO))
+        except Exception:
+            sqlite_conn.rollback()
+            raise
+
+        sqlite_conn.execute('VACUUM')
+    finally:
+        conn.close()
@@ -0,0 +1,14 @@
+"""Adiciona `produto.ponto_reposicao` e o índice (tipo, quantidade)."""
+from sqlalchemy import inspect, text
+
+
+def aplicar(engine):
+    inspetor = inspect(engine)
+    colunas = {c['name'] for c in inspetor.get_columns('produto')}
+    indices = {i['name'] for i in inspetor.get_indexes('produto')}
+
+    with engine.begin() as conn:
+        if 'ponto_reposicao' not in colunas:
+            conn.execute(text('ALTER TABLE produto ADD COLUMN ponto_reposicao INTEGER'))
+        if 'ix_produto_tipo_quantidade' not in indices:
+            conn.execute(text('CREATE INDEX ix_produto_tipo_quantidade ON produto (tipo, quantidade)'))
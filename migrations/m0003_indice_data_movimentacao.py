@@ -0,0 +1,15 @@
+"""Índices por data nas tabelas de movimentação (janelas de analytics e histórico por período)."""
+from sqlalchemy import inspect, text
+
+INDICES = {
+    'movimentacao_estoque': 'ix_movimentacao_estoque_data',
+    'movimentacao_estoque_obra': 'ix_movimentacao_estoque_obra_data',
+}
+
+
+def aplicar(engine):
+    inspetor = inspect(engine)
+    with engine.begin() as conn:
+        for tabela, indice in INDICES.items():
+            if indice not in {i['name'] for i in inspetor.get_indexes(tabela)}:
+                conn.execute(text(f'CREATE INDEX {indice} ON {tabela} (data)'))
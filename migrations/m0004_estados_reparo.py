@@ -0,0 +1,171 @@
+"""
+Substitui os produtos-clone "<nome> (Danificado)" por colunas de estado.
+
+- adiciona `produto.quantidade_danificada` e `produto.quantidade_em_reparo`;
+- soma a quantidade de cada clone no produto de origem e reaponta para ele
+  as linhas que referenciavam o clone (também nos bancos de arquivo);
+- grava no produto de origem uma movimentação 'danificar' com a diferença
+  entre o livro (entrada do total + ajustes do funcional) e o estoque
+  funcional, para que SUM(quantidade) volte a ser o saldo funcional;
+- clones sem produto de origem viram produtos com todo o estoque danificado;
+- remove os clones, as colunas `danificado`/`origem_id` e a tabela
+  `equipamento_danificado`, que não era usada.
+"""
+import os
+
+from sqlalchemy import inspect, text
+
+# Tabelas cujas linhas passam do clone para o produto de origem
+REAPONTAR = ('movimentacao_estoque', 'movimentacao_estoque_obra', 'compra', 'saldo_arquivado', 'unidade_equipamento')
+# Tabelas derivadas: as linhas do clone são descartadas
+DESCARTAR = ('alerta_estoque', 'resumo_consumo')
+
+CLONES = 'SELECT id FROM produto WHERE danificado = TRUE AND origem_id IS NOT NULL'
+
+# SQLite não remove coluna citada em FOREIGN KEY: a tabela é recriada
+PRODUTO_SQLITE = """
+CREATE TABLE produto_novo (
+    id INTEGER NOT NULL PRIMARY KEY,
+    id_publico VARCHAR(36) NOT NULL UNIQUE,
+    nome VARCHAR(100) NOT NULL,
+    quantidade INTEGER NOT NULL,
+    quantidade_danificada INTEGER NOT NULL DEFAULT 0,
+    quantidade_em_reparo INTEGER NOT NULL DEFAULT 0,
+    local_produto VARCHAR(100) NOT NULL,
+    unidade_medida VARCHAR(50),
+    tipo VARCHAR(50) NOT NULL,
+    origem VARCHAR(50),
+    ponto_reposicao INTEGER
+)
+"""
+COLUNAS_PRODUTO = (
+    'id, id_publico, nome, quantidade, quantidade_danificada, quantidade_em_reparo, '
+    'local_produto, unidade_medida, tipo, origem, ponto_reposicao'
+)
+
+
+def aplicar(engine):
+    inspetor = inspect(engine)
+    colunas = {c['name'] for c in inspetor.get_columns('produto')}
+    tabelas = set(inspetor.get_table_names())
+
+    # ATTACH não é permitido dentro de transação: os arquivos são tratados antes
+    if 'danificado' in colunas and 'arquivo_movimentacao' in tabelas and engine.dialect.name == 'sqlite':
+        _reapontar_arquivos(engine)
+
+    with engine.begin() as conn:
+        for coluna in ('quantidade_danificada', 'quantidade_em_reparo'):
+            if coluna not in colunas:
+                conn.execute(text(f'ALTER TABLE produto ADD COLUMN {coluna} INTEGER NOT NULL DEFAULT 0'))
+
+        if 'danificado' in colunas:
+            # Clones órfãos (origem removida) passam a ser produtos independentes
+            conn.execute(text(
+                'UPDATE produto SET origem_id = NULL WHERE danificado = TRUE AND origem_id IS NOT NULL '
+                'AND origem_id NOT IN (SELECT id FROM produto)'
+            ))
+            conn.execute(text(
+                "UPDATE produto SET quantidade_danificada = quantidade, quantidade = 0, "
+                "nome = REPLACE(nome, ' (Danificado)', '') "
+                "WHERE danificado = TRUE AND origem_id IS NULL"
+            ))
+
+            conn.execute(text(f"""
+                UPDATE produto SET quantidade_danificada = quantidade_danificada + COALESCE((
+                    SELECT SUM(c.quantidade) FROM produto c
+                    WHERE c.danificado = TRUE AND c.origem_id = produto.id
+                ), 0)
+                WHERE id IN (SELECT origem_id FROM produto WHERE id IN ({CLONES}))
+            """))
+
+            for tabela in REAPONTAR:
+                if tabela in tabelas:
+                    conn.execute(text(f"""
+                        UPDATE {tabela} SET produto_id = (
+                            SELECT c.origem_id FROM produto c WHERE c.id = {tabela}.produto_id
+                        )
+                        WHERE produto_id IN ({CLONES})
+                    """))
+            _registrar_danificadas(conn, tabelas)
+            for tabela in DESCARTAR:
+                if tabela in tabelas:
+                    conn.execute(text(f'DELETE FROM {tabela} WHERE produto_id IN ({CLONES})'))
+
+            conn.execute(text(f'DELETE FROM produto WHERE id IN ({CLONES})'))
+            if conn.dialect.name == 'sqlite':
+                conn.exec_driver_sql(PRODUTO_SQLITE)
+                conn.exec_driver_sql(
+                    f'INSERT INTO produto_novo ({COLUNAS_PRODUTO}) SELECT {COLUNAS_PRODUTO} FROM produto'
+                )
+                conn.exec_driver_sql('DROP TABLE produto')
+                conn.exec_driver_sql('ALTER TABLE produto_novo RENAME TO produto')
+                conn.exec_driver_sql('CREATE INDEX ix_produto_tipo_quantidade ON produto (tipo, quantidade)')
+            else:
+                conn.execute(text('ALTER TABLE produto DROP COLUMN origem_id'))
+                conn.execute(text('ALTER TABLE produto DROP COLUMN danificado'))
+
+        if 'equipamento_danificado' in tabelas:
+            conn.execute(text('DROP TABLE equipamento_danificado'))
+
+
+def _registrar_danificadas(conn, tabelas):
+    """
+    Fecha a diferença do livro dos produtos que receberam clones.
+
+    A entrada registrava o total e as edições só o ajuste do funcional, então
+    as unidades danificadas nunca saíram do livro; a diferença é gravada como
+    'danificar' (ou 'reparar', se o funcional estiver acima do livro).
+    """
+    obra = (
+        ' - COALESCE((SELECT SUM(o.quantidade) FROM movimentacao_estoque_obra o WHERE o.produto_id = p.id), 0)'
+        if 'movimentacao_estoque_obra' in tabelas else ''
+    )
+    conn.execute(text(f"""
+        INSERT INTO movimentacao_estoque (tipo, quantidade, produto_id, observacao)
+        SELECT CASE WHEN diferenca < 0 THEN 'danificar' ELSE 'reparar' END, diferenca, id,
+               'Migração: ' || CAST(danificadas AS VARCHAR(20)) || ' unidades do produto-clone danificado.'
+        FROM (
+            SELECT p.id,
+                   p.quantidade
+                   - COALESCE((SELECT SUM(m.quantidade) FROM movimentacao_estoque m WHERE m.produto_id = p.id), 0)
+                   {obra} AS diferenca,
+                   (SELECT SUM(c.quantidade) FROM produto c
+                    WHERE c.danificado = TRUE AND c.origem_id = p.id) AS danificadas
+            FROM produto p
+            WHERE p.id IN (SELECT origem_id FROM produto WHERE id IN ({CLONES}))
+        ) AS livro
+        WHERE diferenca <> 0
+    """))
+
+
+def _reapontar_arquivos(engine):
+    """Reaponta as movimentações já movidas para os bancos de arquivo anuais (idempotente)."""
+    with engine.connect() as conn:
+        mapa = conn.execute(text(
+            'SELECT c.id, c.origem_id FROM produto c JOIN produto pai ON pai.id = c.origem_id '
+            'WHERE c.danificado = TRUE'
+        )).all()
+        arquivos = conn.execute(text('SELECT ano, caminho FROM arquivo_movimentacao')).all()
+        conn.commit()
+        if not mapa:
+            return
+
+        for ano, caminho in arquivos:
+            if not os.path.exists(caminho):
+                continue
+            alias = f'arq_{int(ano)}'
+            conn.exec_driver_sql(f'ATTACH DATABASE ? AS {alias}', (caminho,))
+            try:
+                existentes = {
+                    row[0] for row in conn.exec_driver_sql(f"SELECT name FROM {alias}.sqlite_master WHERE type = 'table'")
+                }
+                for tabela in ('movimentacao_estoque', 'movimentacao_estoque_obra', 'compra'):
+                    if tabela in existentes:
+                        conn.execute(
+                            text(f'UPDATE {alias}.{tabela} SET produto_id = :pai WHERE produto_id = :clone'),
+                            [{'pai': pai, 'clone': clone} for clone, pai in mapa],
+                        )
+                conn.commit()
+            finally:
+                conn.exec_driver_sql(f'DETACH DATABASE {alias}')
+                conn.commit()
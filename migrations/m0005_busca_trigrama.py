@@ -0,0 +1,12 @@
+"""PostgreSQL: extensão pg_trgm e índice GIN trigram em `produto.nome` (busca ILIKE). Nada a fazer no SQLite."""
+from sqlalchemy import text
+
+
+def aplicar(engine):
+    if engine.dialect.name != 'postgresql':
+        return
+    with engine.begin() as conn:
+        conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_produto_nome_trgm ON produto USING gin (nome gin_trgm_ops)'
+        ))
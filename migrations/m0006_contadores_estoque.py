@@ -0,0 +1,26 @@
+"""Cria `contador_estoque` e calcula os contadores iniciais a partir de `produto`."""
+from sqlalchemy import text
+
+
+def aplicar(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS contador_estoque ('
+            'chave VARCHAR(100) NOT NULL PRIMARY KEY, valor BIGINT NOT NULL)'
+        ))
+        conn.execute(text('DELETE FROM contador_estoque'))
+        conn.execute(text("""
+            INSERT INTO contador_estoque (chave, valor)
+            SELECT 'produtos', COUNT(*) FROM produto
+            UNION ALL
+            SELECT 'zerados', COALESCE(SUM(CASE WHEN quantidade = 0 THEN 1 ELSE 0 END), 0) FROM produto
+            UNION ALL
+            SELECT 'danificadas', COALESCE(SUM(quantidade_danificada), 0) FROM produto
+            UNION ALL
+            SELECT 'em_reparo', COALESCE(SUM(quantidade_em_reparo), 0) FROM produto
+        """))
+        conn.execute(text("""
+            INSERT INTO contador_estoque (chave, valor)
+            SELECT 'unidades:' || tipo, SUM(quantidade + quantidade_danificada + quantidade_em_reparo)
+            FROM produto GROUP BY tipo
+        """))
@@ -0,0 +1,32 @@
+"""
+PostgreSQL: padrões das colunas de data passam a ser `TIMEZONE('utc', CURRENT_TIMESTAMP)`.
+
+`now()` em coluna `timestamp without time zone` grava o horário no fuso da
+sessão. Linhas já existentes não são alteradas (em servidores configurados
+com TimeZone = UTC elas já estão em UTC). Nada a fazer no SQLite, cujo
+CURRENT_TIMESTAMP já é UTC.
+"""
+from sqlalchemy import inspect, text
+
+COLUNAS = [
+    ('movimentacao_estoque', 'data'),
+    ('movimentacao_estoque_obra', 'data'),
+    ('compra', 'data'),
+    ('saldo_arquivado', 'data'),
+    ('alerta_estoque', 'data'),
+    ('unidade_equipamento', 'atualizado_em'),
+    ('job', 'criado_em'),
+    ('job', 'disponivel_em'),
+]
+
+
+def aplicar(engine):
+    if engine.dialect.name != 'postgresql':
+        return
+    existentes = set(inspect(engine).get_table_names())
+    with engine.begin() as conn:
+        for tabela, coluna in COLUNAS:
+            if tabela in existentes:
+                conn.execute(text(
+                    f"ALTER TABLE {tabela} ALTER COLUMN {coluna} SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)"
+                ))
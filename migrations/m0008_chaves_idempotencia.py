@@ -0,0 +1,25 @@
+"""Cria `chave_idempotencia` (respostas gravadas por Idempotency-Key) e o índice de expiração."""
+from sqlalchemy import text
+
+
+def aplicar(engine):
+    if engine.dialect.name == 'postgresql':
+        binario, padrao = 'BYTEA', "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+    else:
+        binario, padrao = 'BLOB', 'CURRENT_TIMESTAMP'
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS chave_idempotencia ('
+            'chave VARCHAR(100) NOT NULL PRIMARY KEY, '
+            'assinatura VARCHAR(64) NOT NULL, '
+            'status VARCHAR(20) NOT NULL, '
+            'codigo INTEGER, '
+            f'corpo {binario}, '
+            'cabecalhos JSON, '
+            'mensagens JSON, '
+            f'criado_em TIMESTAMP DEFAULT {padrao}, '
+            'expira_em TIMESTAMP NOT NULL)'
+        ))
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_chave_idempotencia_expira_em ON chave_idempotencia (expira_em)'
+        ))
@@ -0,0 +1,93 @@
+"""
+Movimentações do fluxo de reparo passam a gravar o efeito no estoque funcional.
+
+Antes, `quantidade` era o número de unidades movidas (sempre positivo), o que
+distorcia `SUM(quantidade)` (saldo_arquivado, analytics). Agora:
+
+- `danificar` grava -n (reparar e concluir_reparo já eram +n);
+- `enviar_reparo` e `descartar` não mudam o estoque funcional e gravam 0,
+  com o número de unidades no início da observação.
+
+As linhas já arquivadas também são corrigidas, e o `saldo_arquivado` mais
+recente de cada produto recebe a diferença. Só linhas ainda no formato antigo
+(quantidade > 0) são alteradas, então reaplicar não tem efeito.
+"""
+import os
+
+from sqlalchemy import inspect, text
+
+SEM_EFEITO = "('enviar_reparo', 'descartar')"
+ANTIGAS = f"((tipo = 'danificar' OR tipo IN {SEM_EFEITO}) AND quantidade > 0)"
+
+
+def aplicar(engine):
+    tabelas = set(inspect(engine).get_table_names())
+    if 'arquivo_movimentacao' in tabelas:
+        # ATTACH não é permitido dentro de transação: os arquivos são tratados antes
+        _corrigir_arquivos(engine, corrigir_saldos='saldo_arquivado' in tabelas)
+    with engine.begin() as conn:
+        _corrigir(conn, 'movimentacao_estoque')
+
+
+def _corrigir(conn, tabela: str):
+    conn.execute(text(
+        f"UPDATE {tabela} SET quantidade = -quantidade WHERE tipo = 'danificar' AND quantidade > 0"
+    ))
+    conn.execute(text(
+        f"UPDATE {tabela} SET quantidade = 0, "
+        f"observacao = CAST(quantidade AS VARCHAR(20)) || ' unidades: ' || COALESCE(observacao, '') "
+        f"WHERE tipo IN {SEM_EFEITO} AND quantidade > 0"
+    ))
+
+
+def _corrigir_arquivos(engine, corrigir_saldos: bool):
+    sqlite = engine.dialect.name == 'sqlite'
+    with engine.connect() as conn:
+        arquivos = conn.execute(text('SELECT ano, caminho FROM arquivo_movimentacao')).all()
+        conn.commit()
+
+        for ano, caminho in arquivos:
+            anexado = False
+            if sqlite:
+                if not os.path.exists(caminho):
+                    continue
+                alias = f'arq_{int(ano)}'
+                # Conexões do pool podem já ter o arquivo anexado (anexar_arquivo)
+                if alias not in {row[1] for row in conn.exec_driver_sql('PRAGMA database_list')}:
+                    conn.exec_driver_sql(f'ATTACH DATABASE ? AS {alias}', (caminho,))
+                    anexado = True
+                existe = conn.exec_driver_sql(
+                    f"SELECT 1 FROM {alias}.sqlite_master WHERE type = 'table' AND name = 'movimentacao_estoque'"
+                ).scalar()
+            else:
+                alias = caminho
+                existe = conn.execute(
+                    text('SELECT to_regclass(:tabela)'), {'tabela': f'{alias}.movimentacao_estoque'}
+                ).scalar()
+            try:
+                if existe:
+                    if corrigir_saldos:
+                        _corrigir_saldos(conn, f'{alias}.movimentacao_estoque')
+                    _corrigir(conn, f'{alias}.movimentacao_estoque')
+                conn.commit()
+            finally:
+                if anexado:
+                    conn.exec_driver_sql(f'DETACH DATABASE {alias}')
+                    conn.commit()
+
+
+def _corrigir_saldos(conn, tabela: str):
+    """Aplica ao saldo_arquivado mais recente de cada produto a variação das linhas corrigidas."""
+    variacoes = [
+        {'produto_id': produto_id, 'variacao': variacao}
+        for produto_id, variacao in conn.execute(text(
+            f"SELECT produto_id, SUM(CASE WHEN tipo = 'danificar' THEN -2 * quantidade ELSE -quantidade END) "
+            f"FROM {tabela} WHERE {ANTIGAS} GROUP BY produto_id"
+        ))
+        if variacao
+    ]
+    if variacoes:
+        conn.execute(text(
+            'UPDATE saldo_arquivado SET saldo_movimentacoes = saldo_movimentacoes + :variacao '
+            'WHERE id = (SELECT MAX(id) FROM saldo_arquivado WHERE produto_id = :produto_id)'
+        ), variacoes)
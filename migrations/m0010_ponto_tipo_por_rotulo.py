@@ -0,0 +1,31 @@
+"""
+Rechaveia `ponto_reposicao_tipo` pelo rótulo do tipo.
+
+Produto.tipo guarda o rótulo ('Material'), mas o ponto padrão podia ser
+gravado com o nome informado ('material') e nunca era encontrado. Linhas de
+tipos registrados passam para o rótulo; se já houver linha com o rótulo, ela
+prevalece. Linhas de tipos desconhecidos ficam como estão.
+"""
+from sqlalchemy import inspect, text
+
+
+def aplicar(engine):
+    from services.tipos_produto import RegistroTiposProduto
+
+    if not inspect(engine).has_table('ponto_reposicao_tipo'):
+        return
+    with engine.begin() as conn:
+        chaves = [row[0] for row in conn.execute(text('SELECT tipo FROM ponto_reposicao_tipo'))]
+        existentes = set(chaves)
+        for chave in chaves:
+            tipo = RegistroTiposProduto.buscar(chave)
+            if tipo is None or tipo.rotulo == chave:
+                continue
+            if tipo.rotulo in existentes:
+                conn.execute(text('DELETE FROM ponto_reposicao_tipo WHERE tipo = :tipo'), {'tipo': chave})
+            else:
+                conn.execute(
+                    text('UPDATE ponto_reposicao_tipo SET tipo = :rotulo WHERE tipo = :tipo'),
+                    {'rotulo': tipo.rotulo, 'tipo': chave},
+                )
+                existentes.add(tipo.rotulo)
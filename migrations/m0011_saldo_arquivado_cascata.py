@@ -0,0 +1,31 @@
+"""
+`saldo_arquivado.produto_id` passa a ser ON DELETE CASCADE.
+
+Sem isso o PostgreSQL recusava excluir um produto com saldos arquivados. O
+SQLite não aplica chaves estrangeiras (a exclusão é feita pelo cascade do
+ORM), então só o PostgreSQL é alterado.
+"""
+from sqlalchemy import inspect, text
+
+
+def aplicar(engine):
+    cascata_produto(engine, 'saldo_arquivado')
+
+
+def cascata_produto(engine, tabela: str):
+    """Recria as chaves de `tabela` para `produto` com ON DELETE CASCADE (idempotente)."""
+    if engine.dialect.name != 'postgresql':
+        return
+    inspetor = inspect(engine)
+    if not inspetor.has_table(tabela):
+        return
+    with engine.begin() as conn:
+        for fk in inspetor.get_foreign_keys(tabela):
+            if fk['referred_table'] != 'produto' or (fk.get('options') or {}).get('ondelete', '').upper() == 'CASCADE':
+                continue
+            colunas = ', '.join(fk['constrained_columns'])
+            conn.execute(text(f'ALTER TABLE {tabela} DROP CONSTRAINT {fk["name"]}'))
+            conn.execute(text(
+                f'ALTER TABLE {tabela} ADD CONSTRAINT {fk["name"]} '
+                f'FOREIGN KEY ({colunas}) REFERENCES produto (id) ON DELETE CASCADE'
+            ))
@@ -0,0 +1,11 @@
+"""
+`movimentacao_estoque_obra.produto_id` passa a ser ON DELETE CASCADE.
+
+Mesmo problema da 0011: o PostgreSQL recusava excluir um produto que já
+teve unidades transferidas para obra.
+"""
+from migrations.m0011_saldo_arquivado_cascata import cascata_produto
+
+
+def aplicar(engine):
+    cascata_produto(engine, 'movimentacao_estoque_obra')
@@ -1,76 +1,261 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy import func
+from sqlalchemy import DDL, event
 import uuid
 
-db = SQLAlchemy()
+from utils.datetime_utils import DataHoraUTC, utc_agora
+from utils.roteamento_leitura import SessaoRoteada
+
+# Sessão que envia consultas de rotas somente leitura à fonte de leitura (ver utils.roteamento_leitura)
+db = SQLAlchemy(session_options={'class_': SessaoRoteada})
 
 
 class Produto(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.Integer, primary_key=True)
+    # Identificador público (URLs, logs, API); a chave interna é o inteiro acima.
+    id_publico = db.Column(db.String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
     nome = db.Column(db.String(100), nullable=False)
+    # Estoque por estado: funcional, danificado e em reparo (ver danificado_service)
     quantidade = db.Column(db.Integer, nullable=False)
+    quantidade_danificada = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    quantidade_em_reparo = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     local_produto = db.Column(db.String(100), nullable=False, default='Estoque Geral')
     unidade_medida = db.Column(db.String(50), nullable=True)
     tipo = db.Column(db.String(50), nullable=False)
     origem = db.Column(db.String(50))
+    # Ponto de reposição do produto; se nulo vale o do tipo (PontoReposicaoTipo)
+    ponto_reposicao = db.Column(db.Integer, nullable=True)
     movimentacoes = db.relationship('MovimentacaoEstoque', 
                                     backref ='produto', 
                                     cascade='all, delete-orphan')
 
-    danificado = db.Column(db.Boolean, default=False)
-    origem_id = db.Column(db.String(36), db.ForeignKey('produto.id'), nullable=True)
-    produto_pai = db.relationship('Produto', remote_side=[id], backref='produtos_danificados')
+    __table_args__ = (
+        db.Index('ix_produto_tipo_quantidade', 'tipo', 'quantidade'),
+        # PostgreSQL: busca por nome (ILIKE '%termo%') usa o índice trigram
+        db.Index('ix_produto_nome_trgm', 'nome', postgresql_using='gin',
+                 postgresql_ops={'nome': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
 
     @hybrid_property
-    def quantidade_danificada(self):
-        return sum([p.quantidade for p in self.produtos_danificados])
+    def quantidade_total(self):
+        return self.quantidade + self.quantidade_danificada + self.quantidade_em_reparo
 
     def to_dict(self):
         return {
-            'id': self.id,
+            'id': self.id_publico,
             'nome': self.nome,
             'quantidade': self.quantidade,
             'local_produto': self.local_produto,
             'unidade_medida': self.unidade_medida,
             'tipo': self.tipo,
             'origem': self.origem,
-            'danificado': bool(self.danificado),
-            'origem_id': self.origem_id,
+            'ponto_reposicao': self.ponto_reposicao,
+            'quantidade_danificada': self.quantidade_danificada,
+            'quantidade_em_reparo': self.quantidade_em_reparo,
         }
 
 
+# Extensão do índice trigram, criada antes da tabela em bancos PostgreSQL novos
+event.listen(
+    Produto.__table__, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'),
+)
+
+
 class MovimentacaoEstoque(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     tipo = db.Column(db.String(50), nullable=False)
     quantidade = db.Column(db.Integer, nullable=False)
-    produto_id = db.Column(db.String(36), db.ForeignKey('produto.id'))
-    usuario_id = db.Column(db.String(36))
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), index=True)
+    usuario_id = db.Column(db.Integer)
     observacao = db.Column(db.Text)
-    data = db.Column(db.DateTime, server_default=func.now())
+    data = db.Column(DataHoraUTC, server_default=utc_agora(), index=True)
 
 
 class MovimentacaoEstoqueObra(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     tipo = db.Column(db.String(50), nullable=False)
     quantidade = db.Column(db.Integer, nullable=False)
-    produto_id = db.Column(db.String(36), db.ForeignKey('produto.id'))
-    usuario_id = db.Column(db.String(36))
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id', ondelete='CASCADE'), index=True)
+    usuario_id = db.Column(db.Integer)
     obra_id = db.Column(db.Integer, nullable=True)
-    data = db.Column(db.DateTime, server_default=func.now())
+    data = db.Column(DataHoraUTC, server_default=utc_agora(), index=True)
+
+    produto = db.relationship('Produto', backref=db.backref('movimentacoes_obra', cascade='all, delete-orphan'))
 
 
 class Compra(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    produto_id = db.Column(db.String(36), db.ForeignKey('produto.id'))
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), index=True)
     quantidade = db.Column(db.Integer, nullable=True)
     fornecedor = db.Column(db.String(200), nullable=True)
-    data = db.Column(db.DateTime, server_default=func.now())
+    data = db.Column(DataHoraUTC, server_default=utc_agora())
 
 
-class EquipamentoDanificado(db.Model):
+class SaldoArquivado(db.Model):
+    """Totais por produto das linhas movidas para os bancos de arquivo."""
     id = db.Column(db.Integer, primary_key=True)
-    produto_id = db.Column(db.String(36), db.ForeignKey('produto.id'))
-    nome = db.Column(db.String(100), nullable=False)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id', ondelete='CASCADE'), index=True)
+    data_corte = db.Column(DataHoraUTC, nullable=False)
+    saldo_movimentacoes = db.Column(db.Integer, nullable=False, default=0)
+    saldo_obra = db.Column(db.Integer, nullable=False, default=0)
+    total_compras = db.Column(db.Integer, nullable=False, default=0)
+    linhas = db.Column(db.Integer, nullable=False, default=0)
+    data = db.Column(DataHoraUTC, server_default=utc_agora())
+
+    produto = db.relationship('Produto', backref=db.backref('saldos_arquivados', cascade='all, delete-orphan'))
+
+
+class ArquivoMovimentacao(db.Model):
+    """Banco SQLite anual que recebe as movimentações arquivadas."""
+    ano = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    caminho = db.Column(db.String(255), nullable=False)
+    data_corte = db.Column(DataHoraUTC, nullable=False)
+    linhas = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PontoReposicaoTipo(db.Model):
+    """Ponto de reposição padrão para todos os produtos de um tipo."""
+    tipo = db.Column(db.String(50), primary_key=True)
+    ponto_reposicao = db.Column(db.Integer, nullable=False)
+
+
+class AlertaEstoque(db.Model):
+    """Alerta de estoque abaixo do ponto de reposição (no máximo um aberto por produto)."""
+    id = db.Column(db.Integer, primary_key=True)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), nullable=False)
     quantidade = db.Column(db.Integer, nullable=False)
-    data = db.Column(db.DateTime, server_default=func.now())
+    ponto_reposicao = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='aberto')
+    data = db.Column(DataHoraUTC, server_default=utc_agora())
+    resolvido_em = db.Column(DataHoraUTC, nullable=True)
+    produto = db.relationship('Produto', backref=db.backref('alertas', cascade='all, delete-orphan'))
+
+    __table_args__ = (
+        db.Index('ux_alerta_estoque_aberto', 'produto_id', unique=True,
+                 sqlite_where=db.text("status = 'aberto'"),
+                 postgresql_where=db.text("status = 'aberto'")),
+        db.Index('ix_alerta_estoque_status_data', 'status', 'data'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'produto_id': self.produto.id_publico,
+            'produto_nome': self.produto.nome,
+            'tipo': self.produto.tipo,
+            'quantidade': self.quantidade,
+            'ponto_reposicao': self.ponto_reposicao,
+            'status': self.status,
+            'data': self.data.isoformat() if self.data else None,
+            'resolvido_em': self.resolvido_em.isoformat() if self.resolvido_em else None,
+        }
+
+
+class ResumoConsumo(db.Model):
+    """Consumo agregado por produto (mantido por services.analytics_service)."""
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id', ondelete='CASCADE'), primary_key=True)
+    consumo_total = db.Column(db.Integer, nullable=False, default=0)
+    saidas = db.Column(db.Integer, nullable=False, default=0)
+    primeira_saida = db.Column(DataHoraUTC, nullable=True)
+    ultima_saida = db.Column(DataHoraUTC, nullable=True)
+    consumo_7d = db.Column(db.Integer, nullable=False, default=0)
+    consumo_30d = db.Column(db.Integer, nullable=False, default=0)
+    taxa_diaria = db.Column(db.Float, nullable=False, default=0.0)
+    previsao_30d = db.Column(db.Float, nullable=False, default=0.0)
+    atualizado_em = db.Column(DataHoraUTC, nullable=True)
+
+
+class EstadoAnalytics(db.Model):
+    """Última movimentação processada por tabela de origem."""
+    tabela = db.Column(db.String(50), primary_key=True)
+    ultimo_id = db.Column(db.Integer, nullable=False, default=0)
+
+
+class UnidadeEquipamento(db.Model):
+    """Unidade física de um equipamento, identificada pelo número de série."""
+    id = db.Column(db.Integer, primary_key=True)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), nullable=False)
+    numero_serie = db.Column(db.String(100), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default='disponivel')
+    obra_id = db.Column(db.Integer, nullable=True)
+    atualizado_em = db.Column(DataHoraUTC, server_default=utc_agora())
+    produto = db.relationship('Produto', backref=db.backref('unidades', cascade='all, delete-orphan', lazy='dynamic'))
+
+    __table_args__ = (
+        db.Index('ix_unidade_equipamento_produto_status', 'produto_id', 'status'),
+    )
+
+    def to_dict(self):
+        return {
+            'numero_serie': self.numero_serie,
+            'produto_id': self.produto.id_publico,
+            'status': self.status,
+            'obra_id': self.obra_id,
+            'atualizado_em': self.atualizado_em.isoformat() if self.atualizado_em else None,
+        }
+
+
+class Job(db.Model):
+    """Tarefa em segundo plano (ver services.job_service)."""
+    id = db.Column(db.Integer, primary_key=True)
+    id_publico = db.Column(db.String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
+    tipo = db.Column(db.String(50), nullable=False)
+    # pendente, executando, concluido, falhou, cancelado
+    status = db.Column(db.String(20), nullable=False, default='pendente')
+    parametros = db.Column(db.JSON, nullable=True)
+    resultado = db.Column(db.JSON, nullable=True)
+    erro = db.Column(db.Text, nullable=True)
+    progresso = db.Column(db.Float, nullable=False, default=0.0)
+    mensagem = db.Column(db.String(200), nullable=True)
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    max_tentativas = db.Column(db.Integer, nullable=False, default=3)
+    cancelar = db.Column(db.Boolean, nullable=False, default=False)
+    worker = db.Column(db.String(100), nullable=True)
+    criado_em = db.Column(DataHoraUTC, server_default=utc_agora())
+    disponivel_em = db.Column(DataHoraUTC, server_default=utc_agora())
+    iniciado_em = db.Column(DataHoraUTC, nullable=True)
+    heartbeat = db.Column(DataHoraUTC, nullable=True)
+    concluido_em = db.Column(DataHoraUTC, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_job_status_disponivel', 'status', 'disponivel_em'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id_publico,
+            'tipo': self.tipo,
+            'status': self.status,
+            'progresso': round(self.progresso or 0.0, 4),
+            'mensagem': self.mensagem,
+            'resultado': self.resultado,
+            'erro': self.erro,
+            'tentativas': self.tentativas,
+            'max_tentativas': self.max_tentativas,
+            'cancelamento_solicitado': bool(self.cancelar),
+            'criado_em': self.criado_em.isoformat() if self.criado_em else None,
+            'iniciado_em': self.iniciado_em.isoformat() if self.iniciado_em else None,
+            'concluido_em': self.concluido_em.isoformat() if self.concluido_em else None,
+        }
+
+
+class ContadorEstoque(db.Model):
+    """Totais do cabeçalho de /estoque, mantidos pelos write paths (ver services.contador_service)."""
+    chave = db.Column(db.String(100), primary_key=True)
+    valor = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class ChaveIdempotencia(db.Model):
+    """Resposta gravada por Idempotency-Key (ver services.idempotencia_service)."""
+    chave = db.Column(db.String(100), primary_key=True)
+    # sha256 de método, caminho e corpo: a mesma chave não vale para outra requisição
+    assinatura = db.Column(db.String(64), nullable=False)
+    # processando, concluido
+    status = db.Column(db.String(20), nullable=False)
+    codigo = db.Column(db.Integer, nullable=True)
+    corpo = db.Column(db.LargeBinary, nullable=True)
+    cabecalhos = db.Column(db.JSON, nullable=True)
+    mensagens = db.Column(db.JSON, nullable=True)
+    criado_em = db.Column(DataHoraUTC, server_default=utc_agora())
+    expira_em = db.Column(DataHoraUTC, nullable=False, index=True)
@@ -0,0 +1,131 @@
+"""
+Alertas de estoque abaixo do ponto de reposição.
+
+A avaliação é incremental: os write paths chamam `avaliar_reposicao` apenas
+com os produtos que acabaram de alterar, dentro da mesma transação. Nenhuma
+rotina percorre a tabela inteira de produtos.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from utils.datetime_utils import agora_utc
+
+
+def ponto_reposicao_efetivo(produto, pontos_por_tipo: Optional[Dict[str, Optional[int]]] = None) -> Optional[int]:
+    """Ponto do próprio produto ou, na ausência dele, o padrão do tipo."""
+    from models import db, PontoReposicaoTipo
+
+    if produto.ponto_reposicao is not None:
+        return produto.ponto_reposicao
+
+    if pontos_por_tipo is not None and produto.tipo in pontos_por_tipo:
+        return pontos_por_tipo[produto.tipo]
+
+    padrao = db.session.get(PontoReposicaoTipo, produto.tipo)
+    ponto = padrao.ponto_reposicao if padrao else None
+    if pontos_por_tipo is not None:
+        pontos_por_tipo[produto.tipo] = ponto
+    return ponto
+
+
+def avaliar_reposicao(produtos: Iterable) -> None:
+    """
+    Abre, atualiza ou resolve alertas para os produtos informados.
+
+    Deve ser chamada antes do commit do write path; os alertas são gravados
+    na mesma transação. Deduplicação: no máximo um alerta aberto por produto
+    (garantido também pelo índice único parcial `ux_alerta_estoque_aberto`).
+
+    Args:
+        produtos: Produtos criados ou alterados pela operação
+    """
+    from models import db, AlertaEstoque
+
+    pontos_por_tipo: Dict[str, Optional[int]] = {}
+
+    for produto in produtos:
+        if produto is None:
+            continue
+
+        if produto.id is None:
+            db.session.flush()
+
+        ponto = ponto_reposicao_efetivo(produto, pontos_por_tipo)
+        aberto = AlertaEstoque.query.filter_by(produto_id=produto.id, status='aberto').first()
+        abaixo = ponto is not None and produto.quantidade <= ponto
+
+        if abaixo and aberto is None:
+            db.session.add(AlertaEstoque(
+                produto_id=produto.id,
+                quantidade=produto.quantidade,
+                ponto_reposicao=ponto,
+                status='aberto',
+            ))
+        elif abaixo:
+            aberto.quantidade = produto.quantidade
+            aberto.ponto_reposicao = ponto
+        elif aberto is not None:
+            aberto.status = 'resolvido'
+            aberto.quantidade = produto.quantidade
+            aberto.resolvido_em = agora_utc()
+
+
+def definir_ponto_tipo(tipo: str, ponto_reposicao: Optional[int]) -> int:
+    """
+    Define (ou remove, com None) o ponto de reposição padrão de um tipo.
+
+    Reavalia apenas os candidatos afetados: produtos do tipo sem ponto próprio
+    com quantidade até o novo ponto (índice tipo/quantidade) e os que já têm
+    alerta aberto.
+
+    Args:
+        tipo: Nome ou rótulo do tipo; o ponto é gravado pelo rótulo, que é o
+            valor guardado em Produto.tipo
+        ponto_reposicao: Novo ponto padrão, ou None para remover
+
+    Returns:
+        int: Quantidade de produtos reavaliados
+
+    Raises:
+        ValueError: Se o tipo não estiver registrado
+    """
+    from models import db, Produto, PontoReposicaoTipo, AlertaEstoque
+    from services.tipos_produto import RegistroTiposProduto
+
+    tipo = RegistroTiposProduto.resolver(tipo).rotulo
+    registro = db.session.get(PontoReposicaoTipo, tipo)
+    if ponto_reposicao is None:
+        if registro:
+            db.session.delete(registro)
+    elif registro:
+        registro.ponto_reposicao = ponto_reposicao
+    else:
+        db.session.add(PontoReposicaoTipo(tipo=tipo, ponto_reposicao=ponto_reposicao))
+    db.session.flush()
+
+    candidatos = {}
+    if ponto_reposicao is not None:
+        abaixo = Produto.query.filter(
+            Produto.tipo == tipo,
+            Produto.quantidade <= ponto_reposicao,
+            Produto.ponto_reposicao.is_(None),
+        )
+        candidatos.update((p.id, p) for p in abaixo)
+    com_alerta = Produto.query.join(AlertaEstoque).filter(
+        Produto.tipo == tipo,
+        AlertaEstoque.status == 'aberto',
+    )
+    candidatos.update((p.id, p) for p in com_alerta)
+
+    avaliar_reposicao(candidatos.values())
+    db.session.commit()
+    return len(candidatos)
+
+
+def listar_alertas(status: Optional[str] = 'aberto', limite: int = 500) -> List:
+    """Alertas mais recentes primeiro, filtrados por status (None = todos)."""
+    from models import AlertaEstoque
+
+    query = AlertaEstoque.query
+    if status:
+        query = query.filter_by(status=status)
+    return query.order_by(AlertaEstoque.data.desc(), AlertaEstoque.id.desc()).limit(limite).all()
@@ -0,0 +1,248 @@
+"""
+Análise de consumo sobre o histórico de movimentações.
+
+Consumo é toda movimentação com quantidade negativa em `movimentacao_estoque`
+ou `movimentacao_estoque_obra`, exceto as transições do fluxo de reparo
+(unidades danificadas continuam no estoque). Os dados são lidos em bloco como arrays
+colunares (uma consulta por tabela) e agregados com NumPy, sem laços por
+produto:
+
+- os totais acumulados (consumo_total, saidas, primeira/última saída) são
+  incrementais a partir do último id processado de cada tabela;
+- as janelas móveis de 7/30 dias e a taxa diária (média exponencial) são
+  recalculadas apenas sobre as linhas dentro da janela.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, insert, text, update
+
+from utils.datetime_utils import DataHoraUTC, agora_utc, como_utc
+
+TABELAS_MOVIMENTACAO = ('movimentacao_estoque', 'movimentacao_estoque_obra')
+SEGUNDOS_DIA = 86400
+VAZIO = np.empty((0, 3), dtype=np.int64)
+TAMANHO_BLOCO = 100_000
+
+
+def _sem_transicoes() -> str:
+    """Filtro SQL que exclui as transições do fluxo de reparo (ações fixas, não vêm do usuário)."""
+    from services.danificado_service import TRANSICOES
+    return 'tipo NOT IN (' + ', '.join(f"'{acao}'" for acao in TRANSICOES) + ')'
+
+
+def _epoch(conn, coluna: str = 'data') -> str:
+    """Expressão SQL que converte a coluna datetime (UTC) em segundos desde a época."""
+    if conn.dialect.name == 'sqlite':
+        return f'CAST(ROUND((julianday({coluna}) - 2440587.5) * 86400) AS INTEGER)'
+    return f'CAST(EXTRACT(EPOCH FROM {coluna}) AS BIGINT)'
+
+
+def _carregar(conn, sql: str, params: Dict) -> np.ndarray:
+    """Executa a consulta (produto_id, consumo, epoch) e devolve matriz int64 N x 3."""
+    stmt = text(sql)
+    for nome, valor in params.items():
+        if isinstance(valor, datetime):
+            stmt = stmt.bindparams(bindparam(nome, type_=DataHoraUTC()))
+    # Lê direto do cursor DBAPI em blocos, sem criar um Row por linha
+    # (cursor do lado do servidor no PostgreSQL)
+    cursor = conn.execute(stmt, params, execution_options={'stream_results': True}).cursor
+    blocos = []
+    while True:
+        linhas = cursor.fetchmany(TAMANHO_BLOCO)
+        if not linhas:
+            break
+        blocos.append(np.array(linhas, dtype=np.int64).reshape(-1, 3))
+    cursor.close()
+    return np.concatenate(blocos) if blocos else VAZIO
+
+
+def _para_datetime(epoch: int) -> datetime:
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc)
+
+
+def agregar_por_produto(linhas: np.ndarray):
+    """
+    Agrega linhas (produto_id, consumo, epoch) por produto.
+
+    Returns:
+        tuple: (ids, consumo_total, saidas, primeira_epoch, ultima_epoch), arrays alinhados
+    """
+    if not len(linhas):
+        vazio = np.empty(0, dtype=np.int64)
+        return vazio, vazio, vazio, vazio, vazio
+
+    # Uma única ordenação por chave (produto, epoch) empacotada em int64
+    chave = (linhas[:, 0] << 32) | (linhas[:, 2] & 0xFFFFFFFF)
+    ordenadas = linhas[np.argsort(chave)]
+    ids, inicio, contagem = np.unique(ordenadas[:, 0], return_index=True, return_counts=True)
+    total = np.add.reduceat(ordenadas[:, 1], inicio)
+    primeira = ordenadas[inicio, 2]
+    ultima = ordenadas[inicio + contagem - 1, 2]
+    return ids, total, contagem, primeira, ultima
+
+
+def janela_movel(linhas: np.ndarray, agora_epoch: int, janela_dias: int = 30, meia_vida_dias: float = 7.0):
+    """
+    Monta a matriz produto x dia da janela e calcula os agregados móveis.
+
+    Returns:
+        tuple: (ids, consumo_7d, consumo_janela, taxa_diaria) — a taxa é a média
+        diária ponderada exponencialmente (dias recentes pesam mais)
+    """
+    if not len(linhas):
+        vazio = np.empty(0, dtype=np.int64)
+        return vazio, vazio, vazio, np.empty(0, dtype=np.float64)
+
+    ids, inverso = np.unique(linhas[:, 0], return_inverse=True)
+    dia = np.clip((agora_epoch - linhas[:, 2]) // SEGUNDOS_DIA, 0, janela_dias - 1)
+    matriz = np.bincount(
+        inverso * janela_dias + dia,
+        weights=linhas[:, 1],
+        minlength=len(ids) * janela_dias,
+    ).reshape(len(ids), janela_dias)
+
+    pesos = 0.5 ** (np.arange(janela_dias) / meia_vida_dias)
+    pesos /= pesos.sum()
+
+    consumo_7d = matriz[:, :7].sum(axis=1).astype(np.int64)
+    consumo_janela = matriz.sum(axis=1).astype(np.int64)
+    return ids, consumo_7d, consumo_janela, matriz @ pesos
+
+
+def atualizar_resumo_consumo(janela_dias: int = 30, meia_vida_dias: float = 7.0,
+                             horizonte_dias: int = 30, agora: Optional[datetime] = None) -> Dict:
+    """
+    Atualiza ResumoConsumo com as movimentações novas e a janela móvel atual.
+
+    Args:
+        janela_dias: Tamanho da janela móvel
+        meia_vida_dias: Meia-vida da média exponencial da taxa diária
+        horizonte_dias: Horizonte da previsão de demanda
+        agora: Referência de tempo (ingênua = UTC); padrão: agora
+
+    Returns:
+        dict: {'novas_saidas': int, 'produtos_atualizados': int}
+    """
+    from models import db, ResumoConsumo, EstadoAnalytics
+
+    conn = db.session.connection()
+    agora = como_utc(agora) or agora_utc()
+    agora_epoch = int(agora.timestamp())
+    epoch = _epoch(conn)
+    sem_transicoes = _sem_transicoes()
+
+    # 1. Saídas novas desde o último id processado (incremental)
+    blocos = []
+    for tabela in TABELAS_MOVIMENTACAO:
+        estado = db.session.get(EstadoAnalytics, tabela)
+        if estado is None:
+            estado = EstadoAnalytics(tabela=tabela, ultimo_id=0)
+            db.session.add(estado)
+        max_id = conn.execute(text(f'SELECT MAX(id) FROM {tabela}')).scalar() or 0
+        if max_id > estado.ultimo_id:
+            blocos.append(_carregar(conn, f"""
+                SELECT produto_id, -quantidade, {epoch} FROM {tabela}
+                WHERE id > :de AND id <= :ate AND quantidade < 0 AND {sem_transicoes}
+                  AND produto_id IS NOT NULL AND data IS NOT NULL
+            """, {'de': estado.ultimo_id, 'ate': max_id}))
+            estado.ultimo_id = max_id
+    novas = np.concatenate(blocos) if blocos else VAZIO
+    ids_novos, total_novo, saidas_novas, primeira_nova, ultima_nova = agregar_por_produto(novas)
+
+    # 2. Janela móvel (apenas linhas dentro da janela)
+    inicio = agora - timedelta(days=janela_dias)
+    janela = np.concatenate([
+        _carregar(conn, f"""
+            SELECT produto_id, -quantidade, {epoch} FROM {tabela}
+            WHERE data >= :inicio AND quantidade < 0 AND {sem_transicoes} AND produto_id IS NOT NULL
+        """, {'inicio': inicio})
+        for tabela in TABELAS_MOVIMENTACAO
+    ])
+    ids_janela, consumo_7d, consumo_janela, taxa = janela_movel(janela, agora_epoch, janela_dias, meia_vida_dias)
+
+    # 3. Resumo atual em colunas; produtos que saíram da janela precisam ser zerados
+    atual = conn.execute(text(
+        'SELECT produto_id, consumo_total, saidas, '
+        f'{_epoch(conn, "primeira_saida")}, {_epoch(conn, "ultima_saida")}, consumo_30d '
+        'FROM resumo_consumo'
+    )).all()
+    atual_ativos = np.array([r[0] for r in atual if r[5]], dtype=np.int64)
+    atual_por_id = {r[0]: r for r in atual}
+
+    afetados = np.union1d(np.union1d(ids_novos, ids_janela), atual_ativos)
+    if not len(afetados):
+        db.session.commit()
+        return {'novas_saidas': 0, 'produtos_atualizados': 0}
+
+    def alinhar(ids, valores, padrao=0):
+        saida = np.full(len(afetados), padrao, dtype=valores.dtype if len(valores) else np.int64)
+        if len(ids):
+            saida[np.searchsorted(afetados, ids)] = valores
+        return saida
+
+    total_a = alinhar(ids_novos, total_novo)
+    saidas_a = alinhar(ids_novos, saidas_novas)
+    primeira_a = alinhar(ids_novos, primeira_nova, -1)
+    ultima_a = alinhar(ids_novos, ultima_nova, -1)
+    c7_a = alinhar(ids_janela, consumo_7d)
+    cj_a = alinhar(ids_janela, consumo_janela)
+    taxa_a = alinhar(ids_janela, taxa, 0.0).astype(np.float64)
+
+    atualizar, inserir = [], []
+    for i, produto_id in enumerate(afetados.tolist()):
+        anterior = atual_por_id.get(produto_id)
+        primeira = [e for e in (primeira_a[i], anterior[3] if anterior else None) if e is not None and e >= 0]
+        ultima = [e for e in (ultima_a[i], anterior[4] if anterior else None) if e is not None and e >= 0]
+        valores = {
+            'produto_id': produto_id,
+            'consumo_total': int(total_a[i]) + (anterior[1] if anterior else 0),
+            'saidas': int(saidas_a[i]) + (anterior[2] if anterior else 0),
+            'primeira_saida': _para_datetime(min(primeira)) if primeira else None,
+            'ultima_saida': _para_datetime(max(ultima)) if ultima else None,
+            'consumo_7d': int(c7_a[i]),
+            'consumo_30d': int(cj_a[i]),
+            'taxa_diaria': float(taxa_a[i]),
+            'previsao_30d': float(taxa_a[i]) * horizonte_dias,
+            'atualizado_em': agora,
+        }
+        (atualizar if anterior else inserir).append(valores)
+
+    if atualizar:
+        db.session.execute(update(ResumoConsumo), atualizar)
+    if inserir:
+        db.session.execute(insert(ResumoConsumo), inserir)
+    db.session.commit()
+
+    return {'novas_saidas': int(len(novas)), 'produtos_atualizados': int(len(afetados))}
+
+
+def listar_resumo(limite: int = 500) -> List[Dict]:
+    """Resumo de consumo com dias de cobertura calculados sobre a quantidade atual."""
+    from models import db, Produto, ResumoConsumo
+
+    linhas = (
+        db.session.query(ResumoConsumo, Produto)
+        .join(Produto, Produto.id == ResumoConsumo.produto_id)
+        .order_by(ResumoConsumo.taxa_diaria.desc())
+        .limit(limite)
+        .all()
+    )
+
+    resultado = []
+    for resumo, produto in linhas:
+        resultado.append({
+            'produto_id': produto.id_publico,
+            'nome': produto.nome,
+            'quantidade': produto.quantidade,
+            'consumo_total': resumo.consumo_total,
+            'consumo_7d': resumo.consumo_7d,
+            'consumo_30d': resumo.consumo_30d,
+            'taxa_diaria': round(resumo.taxa_diaria, 4),
+            'previsao_30d': round(resumo.previsao_30d, 2),
+            'dias_cobertura': round(produto.quantidade / resumo.taxa_diaria, 1) if resumo.taxa_diaria > 0 else None,
+            'ultima_saida': resumo.ultima_saida.isoformat() if resumo.ultima_saida else None,
+            'atualizado_em': resumo.atualizado_em.isoformat() if resumo.atualizado_em else None,
+        })
+    return resultado
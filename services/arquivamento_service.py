@@ -0,0 +1,369 @@
+"""
+Arquivamento de movimentações antigas em bancos anuais.
+
+Linhas de `movimentacao_estoque`, `movimentacao_estoque_obra` e `compra`
+anteriores à janela de retenção são movidas para bancos SQLite por ano
+(`<ARQUIVO_DIR>/estoque_<ano>.db`), anexados à conexão como `arq_<ano>`.
+No PostgreSQL o arquivo de cada ano é o schema `arq_<ano>` do mesmo banco.
+Antes da remoção é gravado um SaldoArquivado por produto, de forma que os
+totais acumulados continuem corretos sem consultar o arquivo: `saldos_livro`
+soma os snapshots às linhas do banco principal e `conferir_saldos` compara o
+resultado com o estoque funcional de cada produto.
+
+Limitação no SQLite: com o banco principal em modo WAL (roteamento de
+leitura ligado), um commit que envolve bancos anexados é atômico em cada
+arquivo, mas não no conjunto. Uma queda no meio do commit pode deixar as
+linhas copiadas no arquivo e ainda presentes no principal. Por isso a cópia
+ignora ids que o arquivo já tem, e a remoção apaga do principal só os ids
+confirmados no arquivo: basta repetir o arquivamento. O caso inverso (o
+principal confirmado e o arquivo não) perde as linhas do arquivo. Mesmo
+assim, o snapshot gravado no principal mantém os saldos corretos. No
+PostgreSQL os schemas estão no mesmo banco e a transação é atômica.
+"""
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+
+from utils.datetime_utils import DataHoraUTC, agora_utc, como_utc
+
+TABELAS_ARQUIVADAS = ('movimentacao_estoque', 'movimentacao_estoque_obra', 'compra')
+TAMANHO_LOTE = 1000
+
+
+def _diretorio_arquivo() -> str:
+    from flask import current_app
+    diretorio = current_app.config.get('ARQUIVO_DIR') or os.path.join(current_app.instance_path, 'arquivo')
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def _sqlite(conn) -> bool:
+    return conn.dialect.name == 'sqlite'
+
+
+def _schema_principal(conn) -> str:
+    if _sqlite(conn):
+        return 'main'
+    return conn.execute(text('SELECT current_schema()')).scalar()
+
+
+def _expr_ano(conn) -> str:
+    """Expressão SQL do ano (texto 'AAAA') da coluna `data`."""
+    if _sqlite(conn):
+        return "strftime('%Y', data)"
+    return "to_char(data, 'YYYY')"
+
+
+def _caminho_arquivo(conn, ano: int) -> str:
+    if _sqlite(conn):
+        return os.path.join(_diretorio_arquivo(), f'estoque_{int(ano)}.db')
+    return f'arq_{int(ano)}'
+
+
+def anexar_arquivo(conn, ano: int, criar: bool = False) -> Optional[str]:
+    """
+    Anexa o banco de arquivo do ano à conexão, se ainda não estiver anexado
+    (no PostgreSQL, localiza ou cria o schema do ano).
+
+    Args:
+        conn: Connection SQLAlchemy (normalmente db.session.connection())
+        ano: Ano do arquivo
+        criar: Se True, cria o arquivo caso não exista
+
+    Returns:
+        str ou None: Alias do banco anexado, ou None se o arquivo não existir
+    """
+    alias = f'arq_{int(ano)}'
+    if not _sqlite(conn):
+        existe = conn.execute(
+            text('SELECT 1 FROM information_schema.schemata WHERE schema_name = :nome'), {'nome': alias}
+        ).scalar()
+        if not existe:
+            if not criar:
+                return None
+            conn.execute(text(f'CREATE SCHEMA {alias}'))
+        return alias
+
+    anexados = {row[1] for row in conn.exec_driver_sql('PRAGMA database_list')}
+    if alias in anexados:
+        return alias
+
+    caminho = _caminho_arquivo(conn, ano)
+    if not criar and not os.path.exists(caminho):
+        return None
+
+    conn.exec_driver_sql(f'ATTACH DATABASE ? AS {alias}', (caminho,))
+    return alias
+
+
+def _colunas_tipos(conn, schema: str, tabela: str) -> List[Tuple[str, str]]:
+    if _sqlite(conn):
+        return [(row[1], row[2]) for row in conn.exec_driver_sql(f'PRAGMA {schema}.table_info({tabela})')]
+    return [tuple(row) for row in conn.execute(text(
+        'SELECT column_name, data_type FROM information_schema.columns '
+        'WHERE table_schema = :schema AND table_name = :tabela ORDER BY ordinal_position'
+    ), {'schema': schema, 'tabela': tabela})]
+
+
+def _colunas(conn, schema: str, tabela: str) -> List[str]:
+    return [nome for nome, _ in _colunas_tipos(conn, schema, tabela)]
+
+
+def _preparar_tabela(conn, alias: str, tabela: str) -> List[str]:
+    """Cria (ou completa) a tabela no arquivo com o esquema atual do banco principal."""
+    principal = _schema_principal(conn)
+    colunas_main = _colunas_tipos(conn, principal, tabela)
+    colunas_arquivo = set(_colunas(conn, alias, tabela))
+
+    if not colunas_arquivo and not _sqlite(conn):
+        conn.execute(text(f'CREATE TABLE {alias}.{tabela} (LIKE {principal}.{tabela})'))
+        conn.execute(text(f'CREATE INDEX ix_{tabela}_produto_id ON {alias}.{tabela} (produto_id)'))
+    elif not colunas_arquivo:
+        ddl = conn.exec_driver_sql(
+            "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (tabela,)
+        ).scalar()
+        ddl = re.sub(rf'^CREATE TABLE\s+"?{tabela}"?', f'CREATE TABLE {alias}.{tabela}', ddl)
+        conn.exec_driver_sql(ddl)
+        conn.exec_driver_sql(f'CREATE INDEX {alias}.ix_{tabela}_produto_id ON {tabela} (produto_id)')
+    else:
+        for nome, tipo in colunas_main:
+            if nome not in colunas_arquivo:
+                conn.execute(text(f'ALTER TABLE {alias}.{tabela} ADD COLUMN {nome} {tipo}'))
+
+    return [nome for nome, _ in colunas_main]
+
+
+def arquivar_movimentacoes(dias_retencao: int = 730, usuario_nome: Optional[str] = None) -> Dict:
+    """
+    Move movimentações e compras mais antigas que a janela de retenção para o arquivo.
+
+    Args:
+        dias_retencao: Quantidade de dias mantidos no banco principal
+        usuario_nome: Nome do usuário para logging (opcional)
+
+    Returns:
+        dict: {'data_corte': datetime, 'anos': {ano: linhas_arquivadas}}
+    """
+    from models import db, ArquivoMovimentacao
+    from utils.log_utils import registrar_log
+
+    corte = agora_utc() - timedelta(days=dias_retencao)
+    conn = db.session.connection()
+
+    def executar(sql: str, **params):
+        stmt = text(sql)
+        if 'corte' in params:
+            stmt = stmt.bindparams(bindparam('corte', type_=DataHoraUTC()))
+        return conn.execute(stmt, params)
+
+    # Snapshot dos saldos antes de remover as linhas do banco principal
+    executar("""
+        INSERT INTO saldo_arquivado
+            (produto_id, data_corte, saldo_movimentacoes, saldo_obra, total_compras, linhas)
+        SELECT produto_id, :corte, SUM(mov), SUM(obra), SUM(compras), COUNT(*) FROM (
+            SELECT produto_id, quantidade AS mov, 0 AS obra, 0 AS compras
+              FROM movimentacao_estoque WHERE data < :corte
+            UNION ALL
+            SELECT produto_id, 0, quantidade, 0 FROM movimentacao_estoque_obra WHERE data < :corte
+            UNION ALL
+            SELECT produto_id, 0, 0, COALESCE(quantidade, 0) FROM compra WHERE data < :corte
+        ) AS antigas GROUP BY produto_id
+    """, corte=corte)
+
+    expr_ano = _expr_ano(conn)
+    principal = _schema_principal(conn)
+    anos = [int(row[0]) for row in executar(
+        ' UNION '.join(
+            f'SELECT DISTINCT {expr_ano} FROM {tabela} WHERE data < :corte'
+            for tabela in TABELAS_ARQUIVADAS
+        ),
+        corte=corte,
+    )]
+
+    resultado = {}
+    for ano in sorted(anos):
+        alias = anexar_arquivo(conn, ano, criar=True)
+        linhas = 0
+        for tabela in TABELAS_ARQUIVADAS:
+            colunas = ', '.join(_preparar_tabela(conn, alias, tabela))
+            filtro = f'data < :corte AND {expr_ano} = :ano'
+            # Idempotente: uma execução interrompida pode ter deixado a cópia no arquivo (ver docstring)
+            arquivada = f'EXISTS (SELECT 1 FROM {alias}.{tabela} a WHERE a.id = {principal}.{tabela}.id)'
+            executar(
+                f'INSERT INTO {alias}.{tabela} ({colunas}) SELECT {colunas} FROM {principal}.{tabela} '
+                f'WHERE {filtro} AND NOT {arquivada}',
+                corte=corte, ano=f'{ano:04d}',
+            )
+            linhas += executar(
+                f'DELETE FROM {principal}.{tabela} WHERE {filtro} AND {arquivada}', corte=corte, ano=f'{ano:04d}'
+            ).rowcount
+
+        registro = db.session.get(ArquivoMovimentacao, ano)
+        if registro is None:
+            registro = ArquivoMovimentacao(
+                ano=ano,
+                caminho=_caminho_arquivo(conn, ano),
+                data_corte=corte,
+                linhas=0,
+            )
+            db.session.add(registro)
+        registro.data_corte = max(registro.data_corte, corte)
+        registro.linhas += linhas
+        resultado[ano] = linhas
+
+    db.session.commit()
+
+    if usuario_nome:
+        registrar_log(usuario_nome, f'Arquivou movimentações anteriores a {corte:%Y-%m-%d}: {resultado}')
+
+    return {'data_corte': corte, 'anos': resultado}
+
+
+# Saldo funcional pelo livro: snapshots arquivados + linhas ainda no banco principal
+_SQL_SALDOS = """
+    SELECT produto_id, SUM(quantidade) AS saldo FROM (
+        SELECT produto_id, saldo_movimentacoes + saldo_obra AS quantidade FROM saldo_arquivado
+        UNION ALL
+        SELECT produto_id, quantidade FROM movimentacao_estoque
+        UNION ALL
+        SELECT produto_id, quantidade FROM movimentacao_estoque_obra
+    ) AS livro WHERE produto_id IS NOT NULL GROUP BY produto_id
+"""
+
+
+def saldos_livro(produto_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    """
+    Saldo funcional de cada produto calculado pelas movimentações.
+
+    Soma os SaldoArquivado às movimentações (estoque e obra) do banco
+    principal; os bancos de arquivo não são consultados.
+
+    Args:
+        produto_ids: Chaves internas a calcular (None = todos)
+
+    Returns:
+        dict: produto_id -> saldo (produtos sem movimentação ficam de fora)
+    """
+    from models import db
+
+    sql = _SQL_SALDOS
+    params = {}
+    if produto_ids is not None:
+        params['ids'] = list(produto_ids)
+        if not params['ids']:
+            return {}
+        sql = f'SELECT produto_id, saldo FROM ({sql}) AS saldos WHERE produto_id IN :ids'
+    stmt = text(sql)
+    if 'ids' in params:
+        stmt = stmt.bindparams(bindparam('ids', expanding=True))
+    return {produto_id: int(saldo) for produto_id, saldo in db.session.execute(stmt, params)}
+
+
+def conferir_saldos(limite: int = 500) -> Dict:
+    """
+    Compara o saldo pelo livro (saldos_livro) com Produto.quantidade.
+
+    Args:
+        limite: Máximo de divergências devolvidas
+
+    Returns:
+        dict: {'produtos_verificados': int, 'total_divergencias': int,
+            'divergencias': [{'produto_id', 'nome', 'quantidade', 'saldo_livro'}]}
+    """
+    from models import db, Produto
+
+    divergente = 'p.quantidade <> COALESCE(s.saldo, 0)'
+    base = f'FROM produto p LEFT JOIN ({_SQL_SALDOS}) AS s ON s.produto_id = p.id'
+    total = db.session.execute(text(f'SELECT COUNT(*) {base} WHERE {divergente}')).scalar()
+    linhas = db.session.execute(text(
+        f'SELECT p.id_publico, p.nome, p.quantidade, COALESCE(s.saldo, 0) {base} '
+        f'WHERE {divergente} ORDER BY p.id LIMIT :limite'
+    ), {'limite': limite}).all()
+    verificados = db.session.query(db.func.count(Produto.id)).scalar()
+    db.session.commit()
+
+    return {
+        'produtos_verificados': verificados,
+        'total_divergencias': total,
+        'divergencias': [
+            {'produto_id': id_publico, 'nome': nome, 'quantidade': quantidade, 'saldo_livro': int(saldo)}
+            for id_publico, nome, quantidade, saldo in linhas
+        ],
+    }
+
+
+def limite_arquivo() -> Optional[datetime]:
+    """Data até a qual (exclusive) as movimentações já foram arquivadas."""
+    from models import db, ArquivoMovimentacao
+    return como_utc(db.session.query(db.func.max(ArquivoMovimentacao.data_corte)).scalar())
+
+
+def consultar_arquivo(model, produto_id: int, desde: Optional[datetime] = None,
+                      ate: Optional[datetime] = None, **filtros) -> Iterable:
+    """
+    Busca linhas arquivadas de `model` para um produto no intervalo [desde, ate).
+
+    Apenas os bancos anuais que intersectam o intervalo são anexados e
+    consultados. As linhas, com os mesmos atributos do model, vêm da mais
+    recente para a mais antiga e são lidas sob demanda do cursor (do lado do
+    servidor no PostgreSQL).
+
+    Args:
+        model: MovimentacaoEstoque, MovimentacaoEstoqueObra ou Compra
+        produto_id: Chave interna do produto
+        desde: Início do intervalo (None = sem limite)
+        ate: Fim do intervalo, exclusivo (None = sem limite)
+        **filtros: Igualdades adicionais (valor None vira IS NULL)
+    """
+    from models import db, ArquivoMovimentacao
+
+    anos_query = ArquivoMovimentacao.query
+    if desde is not None:
+        anos_query = anos_query.filter(ArquivoMovimentacao.ano >= desde.year)
+    if ate is not None:
+        anos_query = anos_query.filter(ArquivoMovimentacao.ano <= ate.year)
+    anos = [a.ano for a in anos_query.order_by(ArquivoMovimentacao.ano).all()]
+    if not anos:
+        return []
+
+    tabela = model.__table__
+    conn = db.session.connection()
+
+    condicoes = ['produto_id = :produto_id']
+    params = {'produto_id': produto_id}
+    if desde is not None:
+        condicoes.append('data >= :desde')
+        params['desde'] = desde
+    if ate is not None:
+        condicoes.append('data < :ate')
+        params['ate'] = ate
+    for coluna, valor in filtros.items():
+        if valor is None:
+            condicoes.append(f'{coluna} IS NULL')
+        else:
+            condicoes.append(f'{coluna} = :f_{coluna}')
+            params[f'f_{coluna}'] = valor
+
+    selects = []
+    for ano in anos:
+        alias = anexar_arquivo(conn, ano)
+        if alias is None:
+            continue
+        existentes = set(_colunas(conn, alias, tabela.name))
+        if not existentes:
+            continue
+        lista = ', '.join(c.name if c.name in existentes else f'NULL AS {c.name}' for c in tabela.columns)
+        selects.append(f'SELECT {lista} FROM {alias}.{tabela.name} WHERE {" AND ".join(condicoes)}')
+
+    if not selects:
+        return []
+
+    sql = ' UNION ALL '.join(selects) + ' ORDER BY data DESC NULLS LAST, id DESC'
+    stmt = text(sql).columns(*tabela.columns)
+    for nome in ('desde', 'ate'):
+        if nome in params:
+            stmt = stmt.bindparams(bindparam(nome, type_=DataHoraUTC()))
+    return conn.execute(stmt, params, execution_options={'stream_results': True, 'yield_per': TAMANHO_LOTE})
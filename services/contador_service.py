@@ -0,0 +1,167 @@
+"""
+Contadores do cabeçalho de /estoque.
+
+Os totais (produtos, unidades por tipo, danificadas, em reparo, produtos
+zerados) ficam na tabela `contador_estoque` e são atualizados de forma
+incremental pelos write paths do service layer, na mesma transação da
+alteração do produto: cada write path captura `estado(produto)` antes e
+depois e chama `registrar_alteracao`. `verificar_contadores` recalcula tudo a
+partir de `produto` e corrige desvios (job periódico `verificar_contadores`).
+"""
+from collections import Counter
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from sqlalchemy import case, func, text, update
+
+PRODUTOS = 'produtos'
+ZERADOS = 'zerados'
+DANIFICADAS = 'danificadas'
+EM_REPARO = 'em_reparo'
+PREFIXO_UNIDADES = 'unidades:'
+
+
+class EstadoProduto(NamedTuple):
+    tipo: str
+    quantidade: int
+    quantidade_danificada: int
+    quantidade_em_reparo: int
+
+
+def estado(produto) -> Optional[EstadoProduto]:
+    """Estado do produto relevante para os contadores (None = produto inexistente)."""
+    if produto is None:
+        return None
+    return EstadoProduto(
+        produto.tipo,
+        produto.quantidade or 0,
+        produto.quantidade_danificada or 0,
+        produto.quantidade_em_reparo or 0,
+    )
+
+
+def _contribuicao(e: Optional[EstadoProduto]) -> Counter:
+    if e is None:
+        return Counter()
+    return Counter({
+        PRODUTOS: 1,
+        ZERADOS: int(e.quantidade == 0),
+        DANIFICADAS: e.quantidade_danificada,
+        EM_REPARO: e.quantidade_em_reparo,
+        PREFIXO_UNIDADES + e.tipo: e.quantidade + e.quantidade_danificada + e.quantidade_em_reparo,
+    })
+
+
+def delta(alteracoes: Iterable[Tuple[Optional[EstadoProduto], Optional[EstadoProduto]]]) -> Dict[str, int]:
+    """Soma das variações de vários pares (antes, depois); None = produto inexistente."""
+    total: Dict[str, int] = {}
+    for antes, depois in alteracoes:
+        for chave, valor in _contribuicao(depois).items():
+            total[chave] = total.get(chave, 0) + valor
+        for chave, valor in _contribuicao(antes).items():
+            total[chave] = total.get(chave, 0) - valor
+    return {chave: valor for chave, valor in total.items() if valor}
+
+
+def registrar_alteracao(antes: Optional[EstadoProduto], depois: Optional[EstadoProduto]):
+    """Aplica a variação de um produto aos contadores, sem commit."""
+    aplicar(delta([(antes, depois)]))
+
+
+def aplicar(variacoes: Dict[str, int]):
+    """
+    Soma as variações aos contadores na transação corrente (sem commit).
+
+    UPSERT com `valor = valor + variação`: escritores concorrentes não se
+    sobrescrevem.
+    """
+    from models import db, ContadorEstoque
+    from utils.banco_utils import insert_com_conflito
+
+    if not variacoes:
+        return
+    insert = insert_com_conflito(db.session.get_bind())
+    stmt = insert(ContadorEstoque.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['chave'],
+        set_={'valor': ContadorEstoque.__table__.c.valor + stmt.excluded.valor},
+    )
+    db.session.execute(stmt, [{'chave': chave, 'valor': valor} for chave, valor in sorted(variacoes.items())])
+
+
+def obter_contadores() -> Dict:
+    """Contadores atuais no formato do cabeçalho e de `/api/contadores`."""
+    from models import db, ContadorEstoque
+
+    valores = dict(db.session.query(ContadorEstoque.chave, ContadorEstoque.valor).all())
+    return {
+        'produtos': valores.get(PRODUTOS, 0),
+        'zerados': valores.get(ZERADOS, 0),
+        'danificadas': valores.get(DANIFICADAS, 0),
+        'em_reparo': valores.get(EM_REPARO, 0),
+        'unidades_por_tipo': {
+            chave[len(PREFIXO_UNIDADES):]: valor
+            for chave, valor in sorted(valores.items())
+            if chave.startswith(PREFIXO_UNIDADES) and valor
+        },
+    }
+
+
+def _recalcular() -> Dict[str, int]:
+    from models import db, Produto
+
+    total = Produto.quantidade + Produto.quantidade_danificada + Produto.quantidade_em_reparo
+    linhas = db.session.query(
+        Produto.tipo,
+        func.count(),
+        func.sum(case((Produto.quantidade == 0, 1), else_=0)),
+        func.sum(Produto.quantidade_danificada),
+        func.sum(Produto.quantidade_em_reparo),
+        func.sum(total),
+    ).group_by(Produto.tipo).all()
+
+    esperado = {PRODUTOS: 0, ZERADOS: 0, DANIFICADAS: 0, EM_REPARO: 0}
+    for tipo, produtos, zerados, danificadas, em_reparo, unidades in linhas:
+        esperado[PRODUTOS] += produtos
+        esperado[ZERADOS] += zerados or 0
+        esperado[DANIFICADAS] += danificadas or 0
+        esperado[EM_REPARO] += em_reparo or 0
+        esperado[PREFIXO_UNIDADES + tipo] = unidades or 0
+    return esperado
+
+
+def verificar_contadores(corrigir: bool = True) -> Dict:
+    """
+    Recalcula os contadores a partir de `produto` e corrige os desvios.
+
+    Os escritores são bloqueados durante a verificação (lock da tabela no
+    PostgreSQL; lock de escrita do SQLite), de modo que nenhuma variação
+    incremental se perde entre o recálculo e a correção.
+
+    Returns:
+        dict: {'divergencias': {chave: {'contador': int, 'esperado': int}}, 'corrigido': bool}
+    """
+    from models import db, ContadorEstoque
+
+    tabela = ContadorEstoque.__table__
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(text('LOCK TABLE contador_estoque IN SHARE ROW EXCLUSIVE MODE'))
+    else:
+        # Primeira escrita da transação: o SQLite passa a segurar o lock de escrita
+        db.session.execute(update(tabela).where(tabela.c.chave == PRODUTOS).values(valor=tabela.c.valor))
+
+    esperado = _recalcular()
+    atual = dict(db.session.query(ContadorEstoque.chave, ContadorEstoque.valor).all())
+
+    divergencias = {
+        chave: {'contador': atual.get(chave, 0), 'esperado': esperado.get(chave, 0)}
+        for chave in sorted(set(esperado) | set(atual))
+        if atual.get(chave, 0) != esperado.get(chave, 0)
+    }
+    if corrigir and divergencias:
+        aplicar({chave: d['esperado'] - d['contador'] for chave, d in divergencias.items()})
+    if corrigir:
+        db.session.commit()
+    else:
+        db.session.rollback()
+
+    return {'divergencias': divergencias, 'corrigido': corrigir and bool(divergencias)}
@@ -1,75 +1,127 @@
+"""
+Fluxo de reparo de equipamentos.
+
+O estoque de um equipamento é dividido em três estados, todos colunas do
+próprio Produto: funcional (`quantidade`), danificado (`quantidade_danificada`)
+e em reparo (`quantidade_em_reparo`). Cada transição move unidades entre
+estados e é registrada como uma MovimentacaoEstoque cujo `tipo` é a ação e
+cuja `quantidade` é o efeito no estoque funcional (EFEITO_FUNCIONAL: -n para
+danificar, +n para reparar/concluir_reparo, 0 para enviar_reparo/descartar,
+com o número de unidades na observação). Assim `SUM(quantidade)` das
+movimentações continua sendo o saldo funcional.
+"""
 from typing import Optional
-from services.validators import QuantidadeValidator
 
+from services.validators import ProdutoSchemaValidator
+from services.alerta_service import avaliar_reposicao
+
+# estado -> coluna de Produto
+ESTADOS = {
+    'funcional': 'quantidade',
+    'danificado': 'quantidade_danificada',
+    'em_reparo': 'quantidade_em_reparo',
+}
+
+# ação -> (estado de origem, estado de destino); destino None = baixa do estoque
+TRANSICOES = {
+    'danificar': ('funcional', 'danificado'),
+    'reparar': ('danificado', 'funcional'),
+    'enviar_reparo': ('danificado', 'em_reparo'),
+    'concluir_reparo': ('em_reparo', 'funcional'),
+    'descartar': ('danificado', None),
+}
 
-def atualizar_produto_danificado(produto_danificado_id: int, form_data: dict, usuario_nome: Optional[str] = None):
+# ação -> sinal do efeito no estoque funcional
+EFEITO_FUNCIONAL = {
+    acao: (destino == 'funcional') - (origem == 'funcional')
+    for acao, (origem, destino) in TRANSICOES.items()
+}
+
+
+def registrar_transicao(produto, acao: str, quantidade: int, usuario_id: int, observacao: Optional[str] = None):
     """
-    Atualiza equipamento danificado e ajusta quantidade do produto pai.
+    Move unidades entre estados e registra a movimentação, sem commit.
+
+    Args:
+        produto: Produto já carregado na sessão
+        acao: Uma das chaves de TRANSICOES
+        quantidade: Unidades movidas (> 0)
+        usuario_id: ID do usuário responsável
+        observacao: Texto adicional da movimentação (opcional)
+
+    Returns:
+        MovimentacaoEstoque: Movimentação criada
+
+    Raises:
+        ValueError: Ação desconhecida ou saldo insuficiente no estado de origem
     """
+    from services.repositories import MovimentacaoRepository
+    from services.contador_service import estado, registrar_alteracao
 
-    from models import db, Produto
-    from utils.log_utils import registrar_log
-    
-    # Buscar produto danificado e validações iniciais
-    produto_danificado = Produto.query.get_or_404(produto_danificado_id)
-    
-    if not produto_danificado.danificado or not produto_danificado.origem_id:
-        raise ValueError('Este item não é um equipamento danificado válido.')
-    
-    produto_pai = Produto.query.get(produto_danificado.origem_id)
-    if not produto_pai:
-        raise ValueError('Produto pai não encontrado.')
-    
-    # Validar nova quantidade
-    nova_qtd_danificada = QuantidadeValidator.validar(form_data.get('quantidade_danificada', 0))
-    
-    # Regra de negócio: total disponível é constante
-    total_disponivel = produto_pai.quantidade + produto_danificado.quantidade
-    if nova_qtd_danificada > total_disponivel:
+    if acao not in TRANSICOES:
+        raise ValueError(f'Ação desconhecida: {acao}')
+    if quantidade <= 0:
+        raise ValueError('A quantidade deve ser maior que zero.')
+
+    origem, destino = TRANSICOES[acao]
+    saldo_origem = getattr(produto, ESTADOS[origem]) or 0
+    if quantidade > saldo_origem:
         raise ValueError(
-            f"Quantidade danificada ({nova_qtd_danificada}) excede o total disponível ({total_disponivel})."
+            f"Quantidade ({quantidade}) excede o saldo em '{origem}' ({saldo_origem})."
         )
-    
-    # Atualizar quantidades
-    produto_danificado.quantidade = nova_qtd_danificada
-    produto_danificado.nome = f"{produto_pai.nome} (Danificado)"
-    produto_danificado.unidade_medida = form_data.get('unidade_medida') or produto_danificado.unidade_medida
-    produto_danificado.origem = form_data.get('origem') or produto_danificado.origem
-    
-    produto_pai.quantidade = total_disponivel - nova_qtd_danificada
-    
-    # Persistir
-    db.session.commit()
-    
-    # Log
-    if usuario_nome:
-        registrar_log(usuario_nome, f'Editou equipamento danificado ID {produto_danificado.id}')
-    
-    return produto_danificado
+
+    anterior = estado(produto)
+    setattr(produto, ESTADOS[origem], saldo_origem - quantidade)
+    if destino is not None:
+        setattr(produto, ESTADOS[destino], (getattr(produto, ESTADOS[destino]) or 0) + quantidade)
+    registrar_alteracao(anterior, estado(produto))
+
+    return MovimentacaoRepository().criar_transicao(
+        produto.id, usuario_id, acao, quantidade,
+        observacao or f"{origem} → {destino or 'baixa'}",
+        commit=False,
+    )
 
 
-def excluir_produto_danificado(produto_danificado_id: int, usuario_nome: Optional[str] = None):
+def transicionar_estado(produto_id_publico: str, acao: str, quantidade, usuario_id: int,
+                        usuario_nome: Optional[str] = None, observacao: Optional[str] = None):
     """
-    Exclui equipamento danificado e retorna quantidade ao produto pai.
+    Aplica uma transição do fluxo de reparo e confirma a transação.
+
+    Raises:
+        ValueError: Tipo sem controle de danificados, ação ou quantidade
+            inválida, ou unidades com número de série afetadas (conferir_unidades)
     """
-    from models import db, Produto
+    from models import db
+    from services.repositories import ProdutoRepository
+    from services.tipos_produto import RegistroTiposProduto
+    from services.unidade_service import conferir_unidades
     from utils.log_utils import registrar_log
-    
-    # Buscar e validar
-    produto_danificado = Produto.query.get_or_404(produto_danificado_id)
-    
-    if not produto_danificado.danificado or not produto_danificado.origem_id:
-        raise ValueError('Este item não é um equipamento danificado válido.')
-    
-    # Retornar quantidade ao produto pai
-    produto_pai = Produto.query.get(produto_danificado.origem_id)
-    if produto_pai:
-        produto_pai.quantidade += produto_danificado.quantidade
-    
-    # Excluir
-    db.session.delete(produto_danificado)
+
+    produto = ProdutoRepository().get_by_id_publico(produto_id_publico)
+    tipo = RegistroTiposProduto.buscar(produto.tipo)
+    if tipo is None or not tipo.rastreia_danificados:
+        raise ValueError('Este produto não controla unidades danificadas.')
+
+    quantidade = ProdutoSchemaValidator.quantidade(quantidade)
+    registrar_transicao(produto, acao, quantidade, usuario_id, observacao)
+    conferir_unidades(produto)
+    avaliar_reposicao([produto])
     db.session.commit()
-    
-    # Log
+
     if usuario_nome:
-        registrar_log(usuario_nome, f'Excluiu equipamento danificado ID {produto_danificado.id}')
+        registrar_log(usuario_nome, f'{acao}: {quantidade} unidades do produto ID {produto.id_publico}')
+
+    return produto
+
+
+def listar_danificados():
+    """Produtos com unidades danificadas ou em reparo."""
+    from models import Produto
+
+    return (
+        Produto.query
+        .filter((Produto.quantidade_danificada > 0) | (Produto.quantidade_em_reparo > 0))
+        .order_by(Produto.nome)
+        .all()
+    )
@@ -0,0 +1,85 @@
+import heapq
+from datetime import datetime, timezone
+from typing import Iterator, Optional, Tuple
+
+from utils.datetime_utils import como_utc, formatar_em_lotes
+
+TAMANHO_LOTE = 1000
+_SEM_DATA = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _sob_demanda(consulta) -> Iterator:
+    """
+    Executa `consulta()` só na primeira leitura.
+
+    Com stream_template a sessão da view é encerrada antes de o template
+    começar a iterar; adiando a execução, o cursor é aberto na sessão do
+    contexto restaurado pelo streaming e continua válido até o fim da resposta.
+    """
+    yield from consulta()
+
+
+def _mais_recente_primeiro(*fontes) -> Iterator:
+    """Intercala fontes já ordenadas por data decrescente sem materializá-las."""
+    return heapq.merge(*fontes, key=lambda linha: linha.data or _SEM_DATA, reverse=True)
+
+
+def obter_historico(produto, desde: Optional[datetime] = None,
+                    ate: Optional[datetime] = None) -> Tuple[Iterator, Iterator]:
+    """
+    Monta o histórico de movimentações e compras de um produto.
+
+    Sem `desde` nem `ate`, o histórico começa no limite do arquivo (apenas o
+    banco principal é lido). Os bancos de arquivo só entram na consulta
+    quando o intervalo pedido alcança datas já arquivadas (inclusive quando
+    só `ate` é informado).
+
+    Args:
+        produto: Instância de Produto
+        desde: Início do intervalo (inclusive; ingênuo = UTC)
+        ate: Fim do intervalo (exclusivo; ingênuo = UTC)
+
+    Returns:
+        tuple: (movimentacoes, compras), iteradores de pares (linha, data no
+            fuso local já formatada), da mais recente para a mais antiga. Cada
+            fonte (tabela principal ou arquivo) é lida em lotes de TAMANHO_LOTE
+            (cursor do lado do servidor no PostgreSQL), as fontes são
+            intercaladas sob demanda e as datas convertidas a cada TAMANHO_LOTE
+            linhas; nada é carregado inteiro na memória.
+    """
+    from models import MovimentacaoEstoque, MovimentacaoEstoqueObra, Compra
+    from services.arquivamento_service import limite_arquivo, consultar_arquivo
+
+    desde, ate = como_utc(desde), como_utc(ate)
+    limite = limite_arquivo()
+    if desde is None and ate is None:
+        desde = limite
+    alcanca_arquivo = limite is not None and (desde is None or desde < limite)
+
+    def intervalo(model, **filtros):
+        query = model.query.filter_by(produto_id=produto_id, **filtros)
+        if desde is not None:
+            query = query.filter(model.data >= desde)
+        if ate is not None:
+            query = query.filter(model.data < ate)
+        query = query.order_by(model.data.desc().nulls_last(), model.id.desc())
+        # Cursor do lado do servidor no PostgreSQL (linhas lidas em lotes)
+        return query.yield_per(TAMANHO_LOTE)
+
+    produto_id = produto.id
+    movimentacoes = [
+        _sob_demanda(lambda: intervalo(MovimentacaoEstoque)),
+        _sob_demanda(lambda: intervalo(MovimentacaoEstoqueObra)),
+    ]
+    compras = [_sob_demanda(lambda: intervalo(Compra))]
+
+    if alcanca_arquivo:
+        ate_arquivo = min(ate, limite) if ate is not None else limite
+        movimentacoes.append(_sob_demanda(
+            lambda: consultar_arquivo(MovimentacaoEstoque, produto_id, desde, ate_arquivo)))
+        movimentacoes.append(_sob_demanda(
+            lambda: consultar_arquivo(MovimentacaoEstoqueObra, produto_id, desde, ate_arquivo)))
+        compras.append(_sob_demanda(lambda: consultar_arquivo(Compra, produto_id, desde, ate_arquivo)))
+
+    return (formatar_em_lotes(_mais_recente_primeiro(*movimentacoes), TAMANHO_LOTE),
+            formatar_em_lotes(_mais_recente_primeiro(*compras), TAMANHO_LOTE))
@@ -0,0 +1,107 @@
+"""
+Chaves de idempotência das rotas de escrita.
+
+O cliente envia a chave no cabeçalho `Idempotency-Key` ou no campo oculto
+`chave_idempotencia` do formulário. A primeira requisição reserva a chave
+(INSERT ... ON CONFLICT, em transação própria) e, ao terminar, grava a
+resposta; repetições com a mesma chave recebem a resposta gravada sem
+executar a rota outra vez. Chaves expiram após `IDEMPOTENCIA_TTL` segundos e
+são removidas pelo job periódico `limpar_chaves_idempotencia`.
+"""
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from utils.datetime_utils import agora_utc
+
+PROCESSANDO = 'processando'
+CONCLUIDO = 'concluido'
+TTL_PADRAO = 86400
+TAMANHO_LOTE_LIMPEZA = 1000
+
+
+def reservar(chave: str, assinatura: str, ttl: int = TTL_PADRAO) -> Tuple[bool, Optional[object]]:
+    """
+    Reserva a chave para esta requisição.
+
+    Uma chave expirada (ainda não removida pela limpeza) é reaproveitada.
+    A reserva é confirmada imediatamente, fora da transação da rota, para que
+    uma requisição repetida em paralelo já a encontre.
+
+    Args:
+        chave: Valor de Idempotency-Key / chave_idempotencia
+        assinatura: Hash de método, caminho e corpo da requisição
+        ttl: Validade da chave, em segundos
+
+    Returns:
+        tuple: (True, None) se reservou; (False, ChaveIdempotencia existente) caso contrário
+    """
+    from models import db, ChaveIdempotencia
+    from utils.banco_utils import insert_com_conflito
+
+    tabela = ChaveIdempotencia.__table__
+    agora = agora_utc()
+    valores = {
+        'chave': chave, 'assinatura': assinatura, 'status': PROCESSANDO,
+        'codigo': None, 'corpo': None, 'cabecalhos': None, 'mensagens': None,
+        'criado_em': agora, 'expira_em': agora + timedelta(seconds=ttl),
+    }
+    insert = insert_com_conflito(db.session.get_bind())
+    stmt = insert(tabela).values(**valores)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['chave'],
+        set_={nome: getattr(stmt.excluded, nome) for nome in valores if nome != 'chave'},
+        where=tabela.c.expira_em <= agora,
+    ).returning(tabela.c.chave)
+
+    reservou = db.session.execute(stmt).scalar() is not None
+    db.session.commit()
+    if reservou:
+        return True, None
+    return False, db.session.get(ChaveIdempotencia, chave, populate_existing=True)
+
+
+def concluir(chave: str, codigo: int, corpo: bytes, cabecalhos: Dict[str, str], mensagens: List):
+    """Grava a resposta da requisição que reservou a chave (com commit)."""
+    from models import db, ChaveIdempotencia
+
+    registro = db.session.get(ChaveIdempotencia, chave, populate_existing=True)
+    if registro is None:
+        return
+    registro.status = CONCLUIDO
+    registro.codigo = codigo
+    registro.corpo = corpo
+    registro.cabecalhos = cabecalhos
+    registro.mensagens = mensagens
+    db.session.commit()
+
+
+def liberar(chave: str):
+    """Remove a reserva (falha na rota): uma nova tentativa executa de novo."""
+    from models import db, ChaveIdempotencia
+
+    db.session.rollback()
+    db.session.execute(delete(ChaveIdempotencia).where(
+        ChaveIdempotencia.chave == chave, ChaveIdempotencia.status == PROCESSANDO
+    ))
+    db.session.commit()
+
+
+def limpar_expiradas() -> int:
+    """Remove as chaves expiradas em lotes (índice em `expira_em`). Retorna quantas removeu."""
+    from models import db, ChaveIdempotencia
+
+    agora = agora_utc()
+    total = 0
+    while True:
+        lote = select(ChaveIdempotencia.chave).where(
+            ChaveIdempotencia.expira_em <= agora
+        ).limit(TAMANHO_LOTE_LIMPEZA)
+        removidas = db.session.execute(
+            delete(ChaveIdempotencia).where(ChaveIdempotencia.chave.in_(lote))
+        ).rowcount
+        db.session.commit()
+        total += removidas
+        if removidas < TAMANHO_LOTE_LIMPEZA:
+            return total
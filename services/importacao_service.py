@@ -0,0 +1,184 @@
+"""Importação e exportação de produtos em lote (CSV / JSON)."""
+import csv
+import io
+import uuid
+from typing import Callable, Dict, List, Optional
+
+TAMANHO_LOTE = 500
+
+COLUNAS_CSV = (
+    'id', 'nome', 'quantidade', 'quantidade_danificada', 'quantidade_em_reparo',
+    'unidade_medida', 'local_produto', 'tipo', 'origem', 'ponto_reposicao',
+)
+
+
+def ler_csv(conteudo: str) -> List[Dict[str, str]]:
+    """Lê CSV com cabeçalho (separador ',' ou ';') em uma lista de linhas."""
+    conteudo = conteudo.lstrip('\ufeff')
+    try:
+        dialeto = csv.Sniffer().sniff(conteudo[:4096], delimiters=',;')
+    except csv.Error:
+        dialeto = csv.excel
+    return list(csv.DictReader(io.StringIO(conteudo), dialect=dialeto))
+
+
+def importar_produtos(linhas, usuario_id: int, usuario_nome: Optional[str] = None,
+                      parcial: bool = True, verificar: Optional[Callable[[], None]] = None) -> Dict:
+    """
+    Valida e cria produtos em lote, em uma única transação.
+
+    Os produtos são gravados com INSERT ... ON CONFLICT (id_publico) DO
+    NOTHING em blocos: linhas com `id` de um produto que já existe (CSV
+    reimportado, job de importação reexecutado) são reportadas como erro em
+    vez de duplicar o produto.
+
+    Args:
+        linhas: Lista de linhas ou mapeamento de colunas (ver ProdutoSchemaValidator)
+        usuario_id: ID do usuário responsável
+        usuario_nome: Nome do usuário para logging (opcional)
+        parcial: Se False, nada é gravado quando alguma linha tiver erro
+        verificar: Chamada antes de cada bloco; uma exceção levantada por ela
+            (ex.: JobCancelado) interrompe a importação sem gravar nada
+
+    Returns:
+        dict: {'criados': [Produto], 'erros': {indice_linha: [mensagens]}}
+    """
+    from models import db, Produto
+    from services.validators import ProdutoSchemaValidator
+    from services.repositories import MovimentacaoRepository
+    from services.alerta_service import avaliar_reposicao
+    from services.contador_service import aplicar, delta, estado
+    from utils.log_utils import registrar_log
+
+    verificar = verificar or (lambda: None)
+    resultado = ProdutoSchemaValidator.padrao().validar(linhas)
+    erros = dict(resultado.erros)
+    if not resultado.validos or (erros and not parcial):
+        return {'criados': [], 'erros': erros}
+
+    movimentacao_repo = MovimentacaoRepository()
+    observacao = 'Produto importado em lote.'
+    observacao_danificadas = 'Importado com unidades danificadas.'
+    observacao_em_reparo = 'Importado com unidades em reparo.'
+    criados = []
+    lote = []
+
+    for posicao, (indice, data) in enumerate(resultado.validos):
+        if posicao % TAMANHO_LOTE == 0:
+            verificar()
+        create_strategy = data['tipo_produto'].create_strategy
+        valores = create_strategy.valores(data)
+        if valores is None:
+            # Strategy com lógica própria: criação linha a linha
+            if data['id_publico'] and Produto.query.filter_by(id_publico=data['id_publico']).first() is not None:
+                erros[indice] = [f"id: Produto {data['id_publico']} já existe."]
+                continue
+            produto = create_strategy.novo_produto(data)
+            movimentacao_repo.criar_movimentacao_entrada(
+                produto_id=produto.id,
+                usuario_id=usuario_id,
+                quantidade=data['quantidade_int'],
+                observacao=observacao,
+                commit=False,
+            )
+            avariadas = data['quantidade_danificada_int'] + data['quantidade_em_reparo_int']
+            if avariadas:
+                movimentacao_repo.criar_transicao(
+                    produto.id, usuario_id, 'danificar', avariadas, observacao_danificadas, commit=False,
+                )
+            if data['quantidade_em_reparo_int']:
+                movimentacao_repo.criar_transicao(
+                    produto.id, usuario_id, 'enviar_reparo', data['quantidade_em_reparo_int'],
+                    observacao_em_reparo, commit=False,
+                )
+            criados.append(produto)
+            continue
+        valores['id_publico'] = data['id_publico'] or str(uuid.uuid4())
+        lote.append((indice, data['quantidade_int'], valores))
+
+    inseridos: Dict[str, int] = {}
+    for inicio in range(0, len(lote), TAMANHO_LOTE):
+        verificar()
+        bloco = [valores for _, _, valores in lote[inicio:inicio + TAMANHO_LOTE]]
+        inseridos.update(_inserir_novos(db.session, Produto.__table__, bloco))
+
+    entradas, danificadas, em_reparo = {}, {}, {}
+    for indice, quantidade, valores in lote:
+        produto_id = inseridos.pop(valores['id_publico'], None)
+        if produto_id is None:
+            erros[indice] = [f"id: Produto {valores['id_publico']} já existe."]
+        else:
+            entradas[produto_id] = quantidade
+            avariadas = (valores.get('quantidade_danificada') or 0) + (valores.get('quantidade_em_reparo') or 0)
+            if avariadas:
+                danificadas[produto_id] = avariadas
+            if valores.get('quantidade_em_reparo'):
+                em_reparo[produto_id] = valores['quantidade_em_reparo']
+
+    if erros and not parcial:
+        db.session.rollback()
+        return {'criados': [], 'erros': erros}
+
+    verificar()
+    movimentacao_repo.criar_movimentacoes_entrada(entradas, usuario_id, observacao)
+    # A entrada é o total; as unidades danificadas e em reparo saem do saldo funcional
+    movimentacao_repo.criar_transicoes('danificar', danificadas, usuario_id, observacao_danificadas)
+    movimentacao_repo.criar_transicoes('enviar_reparo', em_reparo, usuario_id, observacao_em_reparo)
+    ids = list(entradas)
+    por_id = {}
+    for inicio in range(0, len(ids), TAMANHO_LOTE):
+        por_id.update(
+            (produto.id, produto)
+            for produto in Produto.query.filter(Produto.id.in_(ids[inicio:inicio + TAMANHO_LOTE]))
+        )
+    criados.extend(por_id[produto_id] for produto_id in ids)
+
+    avaliar_reposicao(criados)
+    # Contadores do cabeçalho: uma única variação para o lote inteiro
+    aplicar(delta((None, estado(produto)) for produto in criados))
+    db.session.commit()
+
+    if usuario_nome:
+        registrar_log(usuario_nome, f'Importou {len(criados)} produtos ({len(erros)} linhas com erro)')
+
+    return {'criados': criados, 'erros': erros}
+
+
+def _inserir_novos(session, tabela, linhas: List[Dict]) -> Dict[str, int]:
+    """
+    INSERT ... ON CONFLICT (id_publico) DO NOTHING RETURNING.
+
+    Returns:
+        dict: {id_publico: id} apenas das linhas efetivamente inseridas
+    """
+    from utils.banco_utils import insert_com_conflito
+
+    insert = insert_com_conflito(session.get_bind())
+    stmt = (
+        insert(tabela)
+        .values(linhas)
+        .on_conflict_do_nothing(index_elements=['id_publico'])
+        .returning(tabela.c.id_publico, tabela.c.id)
+    )
+    return dict(session.execute(stmt).all())
+
+
+def valores_csv(produto) -> tuple:
+    """
+    Valores de um produto na ordem de COLUNAS_CSV.
+
+    `quantidade` é o total, como na importação; danificadas e em reparo vão
+    em colunas próprias, então reimportar o arquivo mantém a divisão.
+    """
+    return (
+        produto.id_publico,
+        produto.nome,
+        produto.quantidade_total,
+        produto.quantidade_danificada,
+        produto.quantidade_em_reparo,
+        produto.unidade_medida,
+        produto.local_produto,
+        produto.tipo,
+        produto.origem or '',
+        '' if produto.ponto_reposicao is None else produto.ponto_reposicao,
+    )
@@ -0,0 +1,419 @@
+"""
+Execução de tarefas pesadas em segundo plano, sem broker externo.
+
+A fila é a tabela `job`. Rotas chamam `enfileirar` e respondem na hora;
+um ou mais processos worker (`flask --app app jobs worker`) reivindicam
+jobs com um UPDATE condicional (compare-and-set em `status = 'pendente'`),
+de modo que vários processos podem consumir a mesma fila sem executar um
+job duas vezes.
+
+Tarefas são funções registradas com `@tarefa('nome')` que recebem um
+ContextoJob e os parâmetros do job. O contexto publica progresso e expõe o
+pedido de cancelamento. Falhas são reexecutadas com espera exponencial até
+`max_tentativas`; tarefa desconhecida ou parâmetros que não casam com a
+assinatura da tarefa falham na hora, sem novas tentativas. Enquanto a tarefa executa, uma thread do worker renova o
+heartbeat do job a cada HEARTBEAT_INTERVALO_SEGUNDOS, mesmo que a tarefa
+passe muito tempo sem chamar `progresso`; jobs de workers que morreram (sem
+heartbeat) voltam para a fila. Tarefas em `app.config['JOBS_PERIODICOS']`
+({tipo: segundos}) são enfileiradas pelos próprios workers quando o
+intervalo vence.
+"""
+import inspect
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from importlib import import_module
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import case, exists, func, insert, literal, select, text, update
+
+from utils.datetime_utils import DataHoraUTC, agora_utc
+
+TAREFAS: Dict[str, Callable] = {}
+
+ESPERA_RETENTATIVA_SEGUNDOS = 30
+HEARTBEAT_EXPIRADO_SEGUNDOS = 600
+HEARTBEAT_INTERVALO_SEGUNDOS = 60
+VERIFICAR_PERIODICOS_SEGUNDOS = 30
+
+
+class JobCancelado(Exception):
+    """Levantada dentro da tarefa quando o cancelamento foi solicitado."""
+
+
+class ParametrosInvalidos(ValueError):
+    """Tipo ou parâmetros do job que nenhuma nova tentativa vai corrigir."""
+
+
+def _agora() -> datetime:
+    return agora_utc()
+
+
+def tarefa(nome: str):
+    """Registra a função como tarefa executável pelos workers."""
+    def registrar(funcao):
+        TAREFAS[nome] = funcao
+        return funcao
+    return registrar
+
+
+def _carregar_tarefas():
+    import services.tarefas  # noqa: F401 (registra as tarefas padrão)
+
+
+def validar_job(tipo: str, parametros) -> Callable:
+    """
+    Tarefa registrada para `tipo`, conferindo os parâmetros com a assinatura dela.
+
+    Raises:
+        ParametrosInvalidos: Tipo desconhecido, parâmetros que não são um
+            objeto ou que não casam com a assinatura da tarefa
+    """
+    _carregar_tarefas()
+    funcao = TAREFAS.get(tipo) if isinstance(tipo, str) else None
+    if funcao is None:
+        raise ParametrosInvalidos(f'Tarefa desconhecida: {tipo}')
+    if not isinstance(parametros, dict):
+        raise ParametrosInvalidos('Os parâmetros do job devem ser um objeto.')
+    try:
+        inspect.signature(funcao).bind(None, **parametros)
+    except TypeError as e:
+        raise ParametrosInvalidos(f'Parâmetros inválidos para {tipo}: {e}') from None
+    return funcao
+
+
+class ContextoJob:
+    """
+    Canal entre a tarefa e a linha do job.
+
+    As atualizações usam uma conexão própria, fora da transação da tarefa.
+    No SQLite, chame `progresso` entre transações de escrita da tarefa (o
+    banco aceita um único escritor por vez); dentro de uma transação longa,
+    use `verificar_cancelamento`, que apenas lê o job.
+    """
+
+    def __init__(self, job_id: int, parametros: Optional[Dict] = None):
+        self.job_id = job_id
+        self.parametros = parametros or {}
+
+    def progresso(self, fracao: float, mensagem: Optional[str] = None):
+        """Publica o progresso (0 a 1) e interrompe a tarefa se ela foi cancelada."""
+        from models import db, Job
+
+        valores = {'progresso': max(0.0, min(1.0, fracao)), 'heartbeat': _agora()}
+        if mensagem is not None:
+            valores['mensagem'] = mensagem[:200]
+        tabela = Job.__table__
+        with db.engine.begin() as conn:
+            conn.execute(update(tabela).where(tabela.c.id == self.job_id).values(**valores))
+            cancelar = conn.execute(select(tabela.c.cancelar).where(tabela.c.id == self.job_id)).scalar()
+        if cancelar:
+            raise JobCancelado()
+
+    def cancelado(self) -> bool:
+        from models import db, Job
+
+        with db.engine.connect() as conn:
+            return bool(conn.execute(select(Job.cancelar).where(Job.id == self.job_id)).scalar())
+
+    def verificar_cancelamento(self):
+        """Interrompe a tarefa se ela foi cancelada (sem gravar no job)."""
+        if self.cancelado():
+            raise JobCancelado()
+
+
+def _manter_heartbeat(engine, job_id: int, worker: str, parar: threading.Event):
+    """Renova o heartbeat do job até `parar` ser sinalizado (thread do worker)."""
+    from models import Job
+
+    tabela = Job.__table__
+    while not parar.wait(HEARTBEAT_INTERVALO_SEGUNDOS):
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    update(tabela)
+                    .where(tabela.c.id == job_id, tabela.c.status == 'executando', tabela.c.worker == worker)
+                    .values(heartbeat=_agora())
+                )
+        except Exception:
+            # SQLite ocupado por uma transação longa da tarefa: tenta de novo no próximo intervalo
+            continue
+
+
+def enfileirar(tipo: str, parametros: Optional[Dict] = None, max_tentativas: int = 3):
+    """
+    Cria um job pendente.
+
+    Raises:
+        ParametrosInvalidos: Tipo desconhecido ou parâmetros incompatíveis
+            com a tarefa (ver validar_job)
+    """
+    from models import db, Job
+
+    parametros = {} if parametros is None else parametros
+    validar_job(tipo, parametros)
+
+    job = Job(tipo=tipo, parametros=parametros, max_tentativas=max_tentativas, disponivel_em=_agora())
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def buscar_job(id_publico: str):
+    """Job pelo identificador público, sempre relido do banco (workers o alteram por fora da sessão)."""
+    from models import Job
+    return Job.query.filter_by(id_publico=id_publico).populate_existing().first_or_404()
+
+
+def listar_jobs(status: Optional[str] = None, limite: int = 100):
+    from models import Job
+
+    query = Job.query
+    if status:
+        query = query.filter_by(status=status)
+    return query.order_by(Job.id.desc()).limit(limite).all()
+
+
+def cancelar_job(id_publico: str):
+    """
+    Cancela um job pendente na hora; um job em execução recebe o pedido e
+    para no próximo `progresso` ou `verificar_cancelamento`. No SQLite o pedido
+    só é gravado quando a transação de escrita em andamento termina.
+    """
+    from models import db, Job
+
+    tabela = Job.__table__
+    # Condicionais no status, para não disputar com um worker reivindicando o job
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(tabela)
+            .where(tabela.c.id_publico == id_publico, tabela.c.status == 'pendente')
+            .values(status='cancelado', concluido_em=_agora())
+        )
+        conn.execute(
+            update(tabela)
+            .where(tabela.c.id_publico == id_publico, tabela.c.status == 'executando')
+            .values(cancelar=True)
+        )
+    return buscar_job(id_publico)
+
+
+def _recuperar_expirados(conn, tabela):
+    """Devolve à fila jobs cujo worker parou de enviar heartbeat."""
+    limite = _agora() - timedelta(seconds=HEARTBEAT_EXPIRADO_SEGUNDOS)
+    conn.execute(
+        update(tabela)
+        .where(tabela.c.status == 'executando', func.coalesce(tabela.c.heartbeat, tabela.c.iniciado_em) < limite)
+        .values(
+            status=case((tabela.c.tentativas < tabela.c.max_tentativas, 'pendente'), else_='falhou'),
+            erro='Worker interrompido durante a execução.',
+            worker=None,
+        )
+    )
+
+
+def reivindicar(worker: str) -> Optional[int]:
+    """
+    Reivindica o próximo job disponível para o worker.
+
+    Returns:
+        int ou None: ID interno do job reivindicado
+    """
+    from models import db, Job
+
+    tabela = Job.__table__
+    with db.engine.begin() as conn:
+        _recuperar_expirados(conn, tabela)
+
+    for _ in range(5):
+        agora = _agora()
+        with db.engine.begin() as conn:
+            # PostgreSQL: FOR UPDATE SKIP LOCKED evita que workers disputem a mesma
+            # linha (o SQLite ignora a cláusula e serializa os escritores)
+            candidato = conn.execute(
+                select(tabela.c.id)
+                .where(tabela.c.status == 'pendente', tabela.c.disponivel_em <= agora)
+                .order_by(tabela.c.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).scalar()
+            if candidato is None:
+                return None
+            # Compare-and-set: só um worker vence a corrida pelo mesmo job
+            reivindicado = conn.execute(
+                update(tabela)
+                .where(tabela.c.id == candidato, tabela.c.status == 'pendente')
+                .values(status='executando', worker=worker, iniciado_em=agora, heartbeat=agora,
+                        tentativas=tabela.c.tentativas + 1)
+            ).rowcount
+        if reivindicado:
+            return candidato
+    return None
+
+
+def executar_job(job_id: int, worker: str) -> bool:
+    """
+    Executa um job já reivindicado por `worker` e grava o desfecho
+    (concluído, nova tentativa, falha ou cancelamento).
+
+    O desfecho só é gravado se o job ainda pertence a esta reivindicação
+    (mesmo worker e mesma tentativa): se o heartbeat expirou e o job voltou
+    para a fila ou foi reivindicado por outro worker, o resultado é descartado.
+
+    Returns:
+        bool: Se o desfecho foi gravado
+    """
+    from models import db, Job
+
+    job = db.session.get(Job, job_id, populate_existing=True)
+    contexto = ContextoJob(job.id, job.parametros)
+    tipo, tentativas, max_tentativas = job.tipo, job.tentativas, job.max_tentativas
+    db.session.commit()
+
+    parar_heartbeat = threading.Event()
+    heartbeat = threading.Thread(target=_manter_heartbeat, args=(db.engine, job_id, worker, parar_heartbeat), daemon=True)
+    heartbeat.start()
+    try:
+        funcao = validar_job(tipo, contexto.parametros)
+        resultado = funcao(contexto, **contexto.parametros)
+        db.session.commit()
+        valores = {'status': 'concluido', 'progresso': 1.0, 'resultado': resultado, 'erro': None,
+                   'concluido_em': _agora()}
+    except JobCancelado:
+        db.session.rollback()
+        valores = {'status': 'cancelado', 'concluido_em': _agora()}
+    except Exception as e:
+        db.session.rollback()
+        valores = {'erro': f'{e}\n{traceback.format_exc(limit=5)}', 'worker': None}
+        if tentativas < max_tentativas and not isinstance(e, ParametrosInvalidos):
+            espera = ESPERA_RETENTATIVA_SEGUNDOS * 2 ** (tentativas - 1)
+            valores.update(status='pendente', disponivel_em=_agora() + timedelta(seconds=espera))
+        else:
+            valores.update(status='falhou', concluido_em=_agora())
+    finally:
+        parar_heartbeat.set()
+        heartbeat.join()
+        db.session.remove()
+
+    tabela = Job.__table__
+    with db.engine.begin() as conn:
+        gravado = conn.execute(
+            update(tabela)
+            .where(tabela.c.id == job_id, tabela.c.status == 'executando',
+                   tabela.c.worker == worker, tabela.c.tentativas == tentativas)
+            .values(**valores)
+        ).rowcount
+    return bool(gravado)
+
+
+def _chave_lock(tipo: str) -> int:
+    """Chave (bigint) do advisory lock de agendamento do tipo."""
+    return zlib.crc32(f'job_periodico:{tipo}'.encode())
+
+
+def agendar_periodicos(periodicos: Dict[str, int]) -> int:
+    """
+    Enfileira as tarefas periódicas cujo último job foi criado há mais que o intervalo.
+
+    Cada tipo é um INSERT ... SELECT ... WHERE NOT EXISTS. No PostgreSQL
+    (READ COMMITTED) dois workers poderiam passar pelo NOT EXISTS ao mesmo
+    tempo, então a transação segura antes um advisory lock do tipo; o
+    segundo worker espera o primeiro e, com um novo snapshot, já vê o job
+    inserido. No SQLite o próprio INSERT serializa os escritores.
+
+    Args:
+        periodicos: {tipo: intervalo em segundos}
+
+    Returns:
+        int: Jobs enfileirados
+    """
+    from models import db, Job
+
+    tabela = Job.__table__
+    enfileirados = 0
+    for tipo, intervalo in periodicos.items():
+        agora = _agora()
+        recente = exists().where(
+            tabela.c.tipo == tipo,
+            tabela.c.criado_em > agora - timedelta(seconds=intervalo),
+        )
+        colunas = ('id_publico', 'tipo', 'status', 'parametros', 'progresso', 'tentativas', 'max_tentativas',
+                   'cancelar', 'criado_em', 'disponivel_em')
+        valores = select(
+            literal(str(uuid.uuid4())), literal(tipo), literal('pendente'), literal({}, Job.parametros.type),
+            literal(0.0), literal(0), literal(3), literal(False), literal(agora, DataHoraUTC()), literal(agora, DataHoraUTC()),
+        ).where(~recente)
+        with db.engine.begin() as conn:
+            if conn.dialect.name == 'postgresql':
+                conn.execute(text('SELECT pg_advisory_xact_lock(:chave)'), {'chave': _chave_lock(tipo)})
+            enfileirados += conn.execute(insert(tabela).from_select(colunas, valores)).rowcount
+    return enfileirados
+
+
+def _importar_app(alvo: str):
+    modulo, _, atributo = alvo.partition(':')
+    return getattr(import_module(modulo), atributo or 'app')
+
+
+def _loop_worker(nome: str, intervalo: float, uma_vez: bool):
+    from flask import current_app
+
+    periodicos = current_app.config.get('JOBS_PERIODICOS') or {}
+    proxima_verificacao = 0.0
+    while True:
+        if periodicos and time.monotonic() >= proxima_verificacao:
+            agendar_periodicos(periodicos)
+            proxima_verificacao = time.monotonic() + VERIFICAR_PERIODICOS_SEGUNDOS
+        job_id = reivindicar(nome)
+        if job_id is None:
+            if uma_vez:
+                return
+            time.sleep(intervalo)
+            continue
+        executar_job(job_id, nome)
+
+
+def _processo_worker(alvo_app: str, nome: str, intervalo: float, uma_vez: bool):
+    app = _importar_app(alvo_app)
+    with app.app_context():
+        _loop_worker(nome, intervalo, uma_vez)
+
+
+def executar_worker(processos: int = 1, intervalo: float = 1.0, uma_vez: bool = False, alvo_app: str = 'app:app'):
+    """
+    Consome a fila de jobs.
+
+    Args:
+        processos: Quantidade de processos worker; 1 executa no processo atual
+            (requer app context)
+        intervalo: Espera, em segundos, quando a fila está vazia
+        uma_vez: Se True, termina quando não houver mais jobs disponíveis
+        alvo_app: Aplicação Flask ("modulo:atributo") carregada em cada processo
+    """
+    base = f'{socket.gethostname()}:{os.getpid()}'
+    if processos <= 1:
+        _loop_worker(base, intervalo, uma_vez)
+        return
+
+    # spawn: cada processo cria a própria aplicação e o próprio pool de conexões
+    contexto = multiprocessing.get_context('spawn')
+    workers = [
+        contexto.Process(target=_processo_worker, args=(alvo_app, f'{base}/{i}', intervalo, uma_vez), daemon=False)
+        for i in range(processos)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
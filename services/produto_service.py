@@ -1,5 +1,7 @@
 from typing import Dict, Optional
 
+from services.validators import ProdutoSchemaValidator
+
 
 class FormValidationError(Exception):
     """Erro simples para sinalizar problemas de validação de formulários."""
@@ -7,56 +9,19 @@ class FormValidationError(Exception):
 
 
 def parse_produto_form(form):
-    nome = form.get('nome')
-    quantidade = form.get('quantidade')
-    tipo = form.get('tipo')
-    unidade_medida = form.get('unidade_medida')
-    local_produto = form.get('local_produto', 'Estoque Geral')
-    quantidade_danificada = form.get('quantidade_danificada', 0)
-
-    if not (nome and quantidade and tipo and unidade_medida):
-        raise FormValidationError('Todos os campos são obrigatórios.')
-
-    tipo_clean = tipo.strip().lower()
-    origem_raw = form.get('origem', '').strip().lower() if tipo_clean == 'equipamento' else None
-
-    if origem_raw in ['alugada', 'alugado']:
-        origem = 'Alugado'
-    elif origem_raw == 'comprado':
-        origem = 'Comprado'
-    else:
-        origem = None
-
-    try:
-        quantidade_int = int(quantidade)
-        quantidade_danificada_int = int(quantidade_danificada)
-    except ValueError:
-        raise FormValidationError('Quantidade deve ser um número válido.')
-
-    if quantidade_int < 0 or quantidade_danificada_int < 0:
-        raise FormValidationError('Quantidade não pode ser negativa.')
-
-    if tipo_clean == 'equipamento' and quantidade_danificada_int > quantidade_int:
-        raise FormValidationError('Quantidade danificada não pode ser maior que a quantidade total.')
-
-    quantidade_funcional = quantidade_int
-    if tipo_clean == 'equipamento' and quantidade_danificada_int > 0:
-        quantidade_funcional = quantidade_int - quantidade_danificada_int
-
-    return {
-        'nome': nome,
-        'quantidade_int': quantidade_int,
-        'tipo': tipo,
-        'tipo_clean': tipo_clean,
-        'unidade_medida': unidade_medida,
-        'local_produto': local_produto,
-        'quantidade_danificada_int': quantidade_danificada_int,
-        'origem': origem,
-        'quantidade_funcional': quantidade_funcional,
-    }
+    """
+    Valida o formulário de cadastro com o mesmo schema da API e da importação.
+    
+    Raises:
+        FormValidationError: Com todos os erros encontrados no formulário
+    """
+    resultado = ProdutoSchemaValidator.padrao().validar([form])
+    if resultado.erros:
+        raise FormValidationError(' '.join(resultado.erros[0]))
+    return resultado.validos[0][1]
 
 
-def criar_produto(data: Dict, usuario_id: str, usuario_nome: Optional[str] = None):
+def criar_produto(data: Dict, usuario_id: int, usuario_nome: Optional[str] = None):
     """
     Cria novo produto
     Args:
@@ -72,21 +37,27 @@ def criar_produto(data: Dict, usuario_id: str, usuario_nome: Optional[str] = Non
         
     Example:
         >>> data = parse_produto_form(request.form)
-        >>> produto = criar_produto(data, usuario_id='123', usuario_nome='João')
+        >>> produto = criar_produto(data, usuario_id=1, usuario_nome='João')
     """
     from services.repositories import ProdutoRepository, MovimentacaoRepository
-    from services.produto_strategies import ProdutoStrategyFactory
+    from services.tipos_produto import RegistroTiposProduto
+    from services.alerta_service import avaliar_reposicao
+    from services.contador_service import estado, registrar_alteracao
     from utils.log_utils import registrar_log
     
     # Injeção de dependências
     produto_repo = ProdutoRepository()
     movimentacao_repo = MovimentacaoRepository()
     
-    # delegar criação ao tipo apropriado
-    strategy = ProdutoStrategyFactory.get_create_strategy(data['tipo_clean'])
-    produto = strategy.criar(data)
+    # delegar criação ao tipo apropriado (já resolvido na validação)
+    tipo = data.get('tipo_produto') or RegistroTiposProduto.resolver(data['tipo_clean'])
+    produto = tipo.create_strategy.novo_produto(data)
+    
+    # Alertas de reposição e contadores do cabeçalho na mesma transação
+    avaliar_reposicao([produto])
+    registrar_alteracao(None, estado(produto))
     
-    # Persistir produto principal (e danificado se criado pela strategy)
+    # Persistir produto
     produto_repo.commit()
     
     # Registrar movimentação de entrada no estoque
@@ -95,8 +66,21 @@ def criar_produto(data: Dict, usuario_id: str, usuario_nome: Optional[str] = Non
         produto_id=produto.id,
         usuario_id=usuario_id,
         quantidade=data['quantidade_int'],
-        observacao=observacao
+        observacao=observacao,
+        commit=False,
     )
+    # A entrada é o total; as unidades danificadas e em reparo saem do saldo funcional
+    avariadas = data['quantidade_danificada_int'] + data['quantidade_em_reparo_int']
+    if avariadas:
+        movimentacao_repo.criar_transicao(
+            produto.id, usuario_id, 'danificar', avariadas, 'Cadastrado com unidades danificadas.', commit=False,
+        )
+    if data['quantidade_em_reparo_int']:
+        movimentacao_repo.criar_transicao(
+            produto.id, usuario_id, 'enviar_reparo', data['quantidade_em_reparo_int'],
+            'Cadastrado com unidades em reparo.', commit=False,
+        )
+    produto_repo.commit()
     
     # Registrar operação no log do sistema
     if usuario_nome:
@@ -109,8 +93,7 @@ def _log_criacao_produto(usuario_nome: str, data: Dict):
     """Registra log da criação de produto com detalhes."""
     from utils.log_utils import registrar_log
     
-    tipo_clean = data['tipo_clean']
-    qtd_danif = data['quantidade_danificada_int'] if tipo_clean == 'equipamento' else 0
+    qtd_danif = data['quantidade_danificada_int']
     
     mensagem = (
         f"Adicionou produto: {data['nome']} "
@@ -127,40 +110,76 @@ def _log_criacao_produto(usuario_nome: str, data: Dict):
         pass 
 
 
-def atualizar_produto(produto_id: int, form_data: Dict, usuario_id: str, usuario_nome: Optional[str] = None):
+def atualizar_produto(produto_id_publico: str, form_data: Dict, usuario_id: int, usuario_nome: Optional[str] = None):
+    from models import db
     from services.repositories import ProdutoRepository, MovimentacaoRepository
-    from services.produto_strategies import ProdutoStrategyFactory
+    from services.tipos_produto import RegistroTiposProduto
+    from services.alerta_service import avaliar_reposicao
+    from services.contador_service import estado, registrar_alteracao
+    from services.unidade_service import conferir_unidades
     from utils.log_utils import registrar_log
     
     # Injeção de dependências
     produto_repo = ProdutoRepository()
     movimentacao_repo = MovimentacaoRepository()
     
+    # Tipo desconhecido é rejeitado antes de alterar o produto
+    tipo = RegistroTiposProduto.resolver(form_data.get('tipo'))
+    
     # Recuperar produto do banco de dados
-    produto = produto_repo.get_by_id(produto_id)
+    produto = produto_repo.get_by_id_publico(produto_id_publico)
     
     # Guardar estado atual para auditoria e cálculo de delta
     qtd_anterior = produto.quantidade
     danif_anterior = produto.quantidade_danificada or 0
+    estado_anterior = estado(produto)
+    
+    # Mesmas regras do cadastro; nada é alterado se o formulário for inválido
+    dados = ProdutoSchemaValidator.padrao().validar_edicao(form_data, tipo, qtd_anterior + danif_anterior)
     
     # Atualizar atributos básicos 
-    produto.nome = form_data.get('nome')
-    produto.tipo = form_data.get('tipo')
-    produto.unidade_medida = form_data.get('unidade_medida') or produto.unidade_medida or 'unidade'
-    produto.local_produto = form_data.get('local_produto') or produto.local_produto or 'Estoque Geral'
+    produto.nome = dados['nome']
+    produto.tipo = tipo.rotulo
+    produto.unidade_medida = dados.get('unidade_medida') or produto.unidade_medida or 'unidade'
+    produto.local_produto = dados.get('local_produto') or produto.local_produto or 'Estoque Geral'
+    if 'ponto_reposicao' in dados:
+        produto.ponto_reposicao = dados['ponto_reposicao']
     
     # delegar lógica específica ao tipo apropriado
-    strategy = ProdutoStrategyFactory.get_strategy(produto.tipo)
-    strategy.atualizar(produto, form_data, qtd_anterior, danif_anterior)
+    tipo.update_strategy.atualizar(produto, dados, qtd_anterior, danif_anterior)
+    
+    # Unidades com número de série só mudam de status pelas ações das unidades
+    try:
+        conferir_unidades(produto)
+    except ValueError:
+        db.session.rollback()
+        raise
+    
+    # Mudança na divisão funcional/danificado é uma transição do fluxo de reparo
+    danif_novo = produto.quantidade_danificada or 0
+    delta_danif = danif_novo - danif_anterior
+    transicao = 0
+    if delta_danif and tipo.rastreia_danificados:
+        transicao = delta_danif
+        movimentacao_repo.criar_transicao(
+            produto.id, usuario_id,
+            'danificar' if delta_danif > 0 else 'reparar',
+            abs(delta_danif),
+            f'Edição: danificados {danif_anterior}→{danif_novo}',
+            commit=False,
+        )
+    
+    # Alertas de reposição e contadores do cabeçalho na mesma transação
+    avaliar_reposicao([produto])
+    registrar_alteracao(estado_anterior, estado(produto))
     
     # Persistir alterações no banco de dados
     produto_repo.commit()
     
-    # Criar movimentação de ajuste se houver alteração nas quantidades
-    delta = produto.quantidade - qtd_anterior
-    danif_novo = produto.quantidade_danificada or 0
+    # Ajuste para a variação funcional não explicada pela transição
+    delta = produto.quantidade - qtd_anterior + transicao
     
-    if delta != 0 or danif_novo != danif_anterior:
+    if delta != 0 or (delta_danif and not transicao):
         observacao = (
             f'Ajuste: funcional {qtd_anterior}→{produto.quantidade}; '
             f'danificados {danif_anterior}→{danif_novo}'
@@ -169,6 +188,32 @@ def atualizar_produto(produto_id: int, form_data: Dict, usuario_id: str, usuario
     
     # Registrar operação no log do sistema
     if usuario_nome:
-        registrar_log(usuario_nome, f'Editou produto ID {produto.id}')
+        registrar_log(usuario_nome, f'Editou produto ID {produto.id_publico}')
     
     return produto
+
+
+def excluir_produto(produto_id_publico: str, usuario_nome: Optional[str] = None):
+    """
+    Exclui o produto (e suas movimentações) e atualiza os contadores.
+    
+    Returns:
+        str: Nome do produto excluído
+    """
+    from models import db
+    from services.repositories import ProdutoRepository
+    from services.contador_service import estado, registrar_alteracao
+    from utils.log_utils import registrar_log
+    
+    produto_repo = ProdutoRepository()
+    produto = produto_repo.get_by_id_publico(produto_id_publico)
+    nome_produto = produto.nome
+    
+    registrar_alteracao(estado(produto), None)
+    db.session.delete(produto)
+    produto_repo.commit()
+    
+    if usuario_nome:
+        registrar_log(usuario_nome, f'Excluiu produto: {nome_produto} (ID {produto_id_publico})')
+    
+    return nome_produto
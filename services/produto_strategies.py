@@ -1,104 +1,59 @@
 from abc import ABC, abstractmethod
-from typing import Dict, TYPE_CHECKING
-from services.validators import QuantidadeValidator, OrigemValidator, ProdutoValidator
+from typing import Dict, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from models import Produto
 
 
 class ProdutoUpdateStrategy(ABC):
-    """Interface base para estratégias de atualização de produto."""
+    """
+    Interface base para estratégias de atualização de produto.
+    
+    `dados` já vem validado por ProdutoSchemaValidator.validar_edicao
+    (campos do formulário mais os normalizados).
+    """
     
     @abstractmethod
-    def atualizar(self, produto, form_data: Dict, qtd_funcional_anterior: int, qtd_danif_anterior: int):
+    def atualizar(self, produto, dados: Dict, qtd_funcional_anterior: int, qtd_danif_anterior: int):
         pass
 
 
 class MaterialUpdateStrategy(ProdutoUpdateStrategy):
     """Estratégia para atualização de materiais (sem origem, sem danificados)."""
     
-    def atualizar(self, produto, form_data: Dict, qtd_funcional_anterior: int, qtd_danif_anterior: int):
+    def atualizar(self, produto, dados: Dict, qtd_funcional_anterior: int, qtd_danif_anterior: int):
         """Materiais: atualização simples, sem origem e sem danificados."""
         produto.origem = None
-        produto.quantidade = QuantidadeValidator.validar(form_data.get('quantidade'))
+        produto.quantidade = dados['quantidade_int']
         
-        # Remover danificados se existirem
-        self._remover_danificados(produto)
-    
-    @staticmethod
-    def _remover_danificados(produto):
-        """Remove produtos danificados vinculados."""
-        from models import db
-        for pd in produto.produtos_danificados:
-            db.session.delete(pd)
+        # Materiais não têm fluxo de reparo
+        produto.quantidade_danificada = 0
+        produto.quantidade_em_reparo = 0
 
 
 class EquipamentoUpdateStrategy(ProdutoUpdateStrategy):
     """Estratégia para atualização de equipamentos (com origem e danificados)."""
     
-    def atualizar(self, produto, form_data: Dict, qtd_funcional_anterior: int, qtd_danif_anterior: int):
-        """Equipamentos: gerenciar origem e danificados."""
-        from models import db, Produto
-        
-        # Atualizar origem
-        produto.origem = OrigemValidator.normalizar(form_data.get('origem'))
-        
-        # Processar danificados
-        qtd_danificada = QuantidadeValidator.validar(form_data.get('quantidade_danificada', 0))
-        
-        # Validar regra de negócio
-        ProdutoValidator.validar_danificados(qtd_danificada, qtd_funcional_anterior, qtd_danif_anterior)
+    def atualizar(self, produto, dados: Dict, qtd_funcional_anterior: int, qtd_danif_anterior: int):
+        """Equipamentos: origem e divisão funcional/danificado (total constante)."""
+        produto.origem = dados['origem']
+        qtd_danificada = dados['quantidade_danificada_int']
         
-        # Calcular nova quantidade funcional
+        # Calcular nova quantidade funcional; unidades em reparo não mudam por aqui
         total_disponivel = qtd_funcional_anterior + qtd_danif_anterior
         produto.quantidade = total_disponivel - qtd_danificada
-        
-        # Gerenciar produto danificado
-        if qtd_danificada > 0:
-            self._criar_ou_atualizar_danificado(produto, qtd_danificada)
-        else:
-            self._remover_danificados(produto)
-    
-    @staticmethod
-    def _criar_ou_atualizar_danificado(produto, qtd_danificada: int):
-        """Cria ou atualiza produto danificado vinculado."""
-        from models import db, Produto
-        
-        produto_danificado = produto.produtos_danificados[0] if produto.produtos_danificados else None
-        
-        if produto_danificado:
-            # Atualizar existente
-            produto_danificado.nome = f"{produto.nome} (Danificado)"
-            produto_danificado.quantidade = qtd_danificada
-            produto_danificado.unidade_medida = produto.unidade_medida
-            produto_danificado.tipo = produto.tipo
-            produto_danificado.origem = produto.origem
-            produto_danificado.local_produto = produto.local_produto
-        else:
-            # Criar novo
-            db.session.add(Produto(
-                nome=f"{produto.nome} (Danificado)",
-                quantidade=qtd_danificada,
-                unidade_medida=produto.unidade_medida,
-                tipo=produto.tipo,
-                origem=produto.origem,
-                local_produto=produto.local_produto,
-                danificado=True,
-                origem_id=produto.id
-            ))
-    
-    @staticmethod
-    def _remover_danificados(produto):
-        """Remove produtos danificados vinculados."""
-        from models import db
-        for pd in produto.produtos_danificados:
-            db.session.delete(pd)
+        produto.quantidade_danificada = qtd_danificada
 
 
 class ProdutoCreateStrategy(ABC):
-    """Interface base para estratégias de criação de produto."""
+    """
+    Interface base para estratégias de criação de produto.
+    
+    Tipos com lógica própria (ex.: gravar tabelas extras) sobrescrevem `criar`;
+    quem cria produtos chama `novo_produto`, que garante as colunas comuns
+    (inclusive o `id` vindo da importação) qualquer que seja o `criar`.
+    """
     
-    @abstractmethod
     def criar(self, data: Dict) -> 'Produto':
         """
         Cria produto conforme regras específicas do tipo.
@@ -109,124 +64,93 @@ class ProdutoCreateStrategy(ABC):
         Returns:
             Produto: Instância do produto criado
         """
-        pass
-
-
-class MaterialCreateStrategy(ProdutoCreateStrategy):
-    """Estratégia para criação de materiais."""
-    
-    def criar(self, data: Dict) -> 'Produto':
-        """Materiais: criação simples, sem origem e sem danificados."""
         from models import db, Produto
         
-        produto = Produto(
-            nome=data['nome'],
-            quantidade=data['quantidade_funcional'],
-            tipo=data['tipo'],
-            origem=None,
-            unidade_medida=data['unidade_medida'],
-            local_produto=data['local_produto']
-        )
+        produto = Produto(**self._colunas(data))
         
         db.session.add(produto)
         db.session.flush()  # Para obter o ID
         
         return produto
-
-
-class EquipamentoCreateStrategy(ProdutoCreateStrategy):
-    """Estratégia para criação de equipamentos com danificados."""
     
-    def criar(self, data: Dict) -> 'Produto':
-        """Equipamentos: criar produto principal e danificado se necessário."""
-        from models import db, Produto
-        
-        # Criar produto principal
-        produto = Produto(
-            nome=data['nome'],
-            quantidade=data['quantidade_funcional'],
-            tipo=data['tipo'],
-            origem=data['origem'],
-            unidade_medida=data['unidade_medida'],
-            local_produto=data['local_produto']
-        )
-        
-        db.session.add(produto)
-        db.session.flush()  # Obter ID para vincular danificado
+    def novo_produto(self, data: Dict) -> 'Produto':
+        """`criar` seguido das colunas comuns, para strategies que montam o Produto por conta própria."""
+        from models import db
         
-        # Criar produto danificado se houver
-        if data['quantidade_danificada_int'] > 0:
-            produto_danificado = Produto(
-                nome=f"{data['nome']} (Danificado)",
-                quantidade=data['quantidade_danificada_int'],
-                tipo=data['tipo'],
-                origem=data['origem'],
-                unidade_medida=data['unidade_medida'],
-                local_produto=data['local_produto'],
-                danificado=True,
-                origem_id=produto.id
-            )
-            db.session.add(produto_danificado)
+        produto = self.criar(data)
+        for coluna, valor in self._colunas(data).items():
+            setattr(produto, coluna, valor)
+        db.session.flush()
         
         return produto
+    
+    def valores(self, data: Dict) -> Optional[Dict]:
+        """
+        Colunas do produto para inserção em lote (importação).
+        
+        Strategies que sobrescrevem `criar` devolvem None; a importação então
+        chama `novo_produto` linha a linha.
+        """
+        if type(self).criar is not ProdutoCreateStrategy.criar:
+            return None
+        return self._colunas(data)
+    
+    @staticmethod
+    def _colunas(data: Dict) -> Dict:
+        # Tipos sem origem ou sem danificados já chegam com None / 0 da validação
+        colunas = {
+            'nome': data['nome'],
+            'quantidade': data['quantidade_funcional'],
+            'quantidade_danificada': data['quantidade_danificada_int'],
+            'quantidade_em_reparo': data['quantidade_em_reparo_int'],
+            'tipo': data['tipo'],
+            'origem': data['origem'],
+            'unidade_medida': data['unidade_medida'],
+            'local_produto': data['local_produto'],
+            'ponto_reposicao': data.get('ponto_reposicao'),
+        }
+        if data.get('id_publico'):
+            colunas['id_publico'] = data['id_publico']
+        return colunas
+
+
+class MaterialCreateStrategy(ProdutoCreateStrategy):
+    """Estratégia para criação de materiais (sem origem, sem danificados)."""
+
+
+class EquipamentoCreateStrategy(ProdutoCreateStrategy):
+    """Estratégia para criação de equipamentos com danificados."""
 
 
 class ProdutoStrategyFactory:
-    """Factory para criar estratégias baseadas no tipo de produto."""
-    
-    _update_strategies = {
-        'material': MaterialUpdateStrategy(),
-        'equipamento': EquipamentoUpdateStrategy(),
-    }
+    """
+    Fachada de compatibilidade sobre o RegistroTiposProduto.
     
-    _create_strategies = {
-        'material': MaterialCreateStrategy(),
-        'equipamento': EquipamentoCreateStrategy(),
-    }
+    Código novo deve resolver o TipoProduto uma vez (RegistroTiposProduto.resolver)
+    e usar as strategies dele diretamente.
+    """
     
     @classmethod
     def get_update_strategy(cls, tipo: str) -> ProdutoUpdateStrategy:
         """
         Retorna a estratégia de atualização apropriada.
         
-        Args:
-            tipo: Tipo do produto ('material' ou 'equipamento')
-            
-        Returns:
-            ProdutoUpdateStrategy: Estratégia de atualização
-            
         Raises:
             ValueError: Se tipo for inválido
         """
-        tipo_lower = tipo.lower().strip()
-        strategy = cls._update_strategies.get(tipo_lower)
-        
-        if not strategy:
-            raise ValueError(f"Tipo de produto desconhecido: {tipo}")
-        
-        return strategy
+        from services.tipos_produto import RegistroTiposProduto
+        return RegistroTiposProduto.resolver(tipo).update_strategy
     
     @classmethod
     def get_create_strategy(cls, tipo: str) -> ProdutoCreateStrategy:
         """
         Retorna a estratégia de criação apropriada.
         
-        Args:
-            tipo: Tipo do produto ('material' ou 'equipamento')
-            
-        Returns:
-            ProdutoCreateStrategy: Estratégia de criação
-            
         Raises:
             ValueError: Se tipo for inválido
         """
-        tipo_lower = tipo.lower().strip()
-        strategy = cls._create_strategies.get(tipo_lower)
-        
-        if not strategy:
-            raise ValueError(f"Tipo de produto desconhecido: {tipo}")
-        
-        return strategy
+        from services.tipos_produto import RegistroTiposProduto
+        return RegistroTiposProduto.resolver(tipo).create_strategy
     
     @classmethod
     def get_strategy(cls, tipo: str) -> ProdutoUpdateStrategy:
@@ -239,13 +163,17 @@ class ProdutoStrategyFactory:
         """
         Registra novas estratégias (extensibilidade).
         
-        Args:
-            tipo: Tipo do produto
-            update_strategy: Instância da estratégia de atualização
-            create_strategy: Instância da estratégia de criação
+        Prefira registrar um TipoProduto completo em RegistroTiposProduto.
         """
-        tipo_lower = tipo.lower()
-        if update_strategy:
-            cls._update_strategies[tipo_lower] = update_strategy
-        if create_strategy:
-            cls._create_strategies[tipo_lower] = create_strategy
+        from services.tipos_produto import RegistroTiposProduto, TipoProduto
+        
+        existente = RegistroTiposProduto.buscar(tipo)
+        RegistroTiposProduto.registrar(TipoProduto(
+            tipo,
+            existente.rotulo if existente else tipo.strip().capitalize(),
+            create_strategy or (existente.create_strategy if existente else None),
+            update_strategy or (existente.update_strategy if existente else None),
+            usa_origem=existente.usa_origem if existente else False,
+            rastreia_danificados=existente.rastreia_danificados if existente else False,
+            validar_extra=existente.validar_extra if existente else None,
+        ))
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, Optional
 from abc import ABC, abstractmethod
 
 
@@ -10,6 +10,11 @@ class ProdutoRepositoryInterface(ABC):
         """Busca produto por ID."""
         pass
     
+    @abstractmethod
+    def get_by_id_publico(self, id_publico: str):
+        """Busca produto pelo identificador público (UUID)."""
+        pass
+    
     @abstractmethod
     def save(self, produto):
         """Salva produto."""
@@ -25,14 +30,31 @@ class MovimentacaoRepositoryInterface(ABC):
     """Interface para repositório de movimentações."""
     
     @abstractmethod
-    def criar_ajuste(self, produto_id: int, usuario_id: str, quantidade: int, observacao: str):
+    def criar_ajuste(self, produto_id: int, usuario_id: int, quantidade: int, observacao: str):
         """Cria movimentação de ajuste."""
         pass
     
     @abstractmethod
-    def criar_movimentacao_entrada(self, produto_id: int, usuario_id: str, quantidade: int, observacao: str):
+    def criar_movimentacao_entrada(self, produto_id: int, usuario_id: int, quantidade: int, observacao: str,
+                                   commit: bool = True):
         """Cria movimentação de entrada."""
         pass
+    
+    @abstractmethod
+    def criar_transicao(self, produto_id: int, usuario_id: int, acao: str, quantidade: int, observacao: str,
+                        commit: bool = True):
+        """Cria movimentação de transição de estado (fluxo de reparo)."""
+        pass
+    
+    @abstractmethod
+    def criar_movimentacoes_entrada(self, quantidades: Dict[int, int], usuario_id: int, observacao: str):
+        """Cria movimentações de entrada em lote ({produto_id: quantidade}), sem commit."""
+        pass
+    
+    @abstractmethod
+    def criar_transicoes(self, acao: str, quantidades: Dict[int, int], usuario_id: int, observacao: str):
+        """Cria transições em lote ({produto_id: unidades movidas}), sem commit."""
+        pass
 
 
 # Implementações concretas (SQLAlchemy)
@@ -45,6 +67,11 @@ class ProdutoRepository(ProdutoRepositoryInterface):
         from models import Produto
         return Produto.query.get_or_404(produto_id)
     
+    def get_by_id_publico(self, id_publico: str):
+        """Busca produto pelo identificador público (UUID)."""
+        from models import Produto
+        return Produto.query.filter_by(id_publico=id_publico).first_or_404()
+    
     def save(self, produto):
         """Salva produto no contexto."""
         from models import db
@@ -59,7 +86,7 @@ class ProdutoRepository(ProdutoRepositoryInterface):
 class MovimentacaoRepository(MovimentacaoRepositoryInterface):
     """Implementação concreta para movimentações."""
     
-    def criar_ajuste(self, produto_id: int, usuario_id: str, quantidade: int, observacao: str):
+    def criar_ajuste(self, produto_id: int, usuario_id: int, quantidade: int, observacao: str):
         """Cria e salva movimentação de ajuste."""
         from models import db, MovimentacaoEstoque
         
@@ -73,8 +100,9 @@ class MovimentacaoRepository(MovimentacaoRepositoryInterface):
         db.session.add(movimentacao)
         db.session.commit()
     
-    def criar_movimentacao_entrada(self, produto_id: int, usuario_id: str, quantidade: int, observacao: str):
-        """Cria e salva movimentação de entrada."""
+    def criar_movimentacao_entrada(self, produto_id: int, usuario_id: int, quantidade: int, observacao: str,
+                                   commit: bool = True):
+        """Cria e salva movimentação de entrada (commit=False mantém na transação corrente)."""
         from models import db, MovimentacaoEstoque
         
         movimentacao = MovimentacaoEstoque(
@@ -85,4 +113,60 @@ class MovimentacaoRepository(MovimentacaoRepositoryInterface):
             observacao=observacao
         )
         db.session.add(movimentacao)
-        db.session.commit()
+        if commit:
+            db.session.commit()
+    
+    def criar_transicao(self, produto_id: int, usuario_id: int, acao: str, quantidade: int, observacao: str,
+                        commit: bool = True):
+        """
+        Cria movimentação de transição de estado.
+        
+        `quantidade` são as unidades movidas; a linha grava o efeito no estoque
+        funcional (ver danificado_service.EFEITO_FUNCIONAL).
+        """
+        from models import db, MovimentacaoEstoque
+        
+        movimentacao = MovimentacaoEstoque(
+            produto_id=produto_id,
+            usuario_id=usuario_id,
+            tipo=acao,
+            **self._valores_transicao(acao, quantidade, observacao)
+        )
+        db.session.add(movimentacao)
+        if commit:
+            db.session.commit()
+        return movimentacao
+    
+    def criar_movimentacoes_entrada(self, quantidades: Dict[int, int], usuario_id: int, observacao: str):
+        """Cria movimentações de entrada em lote com um único INSERT executemany (sem commit)."""
+        from sqlalchemy import insert
+        from models import db, MovimentacaoEstoque
+        
+        if quantidades:
+            db.session.execute(insert(MovimentacaoEstoque), [
+                {'produto_id': produto_id, 'usuario_id': usuario_id, 'quantidade': quantidade,
+                 'tipo': 'entrada', 'observacao': observacao}
+                for produto_id, quantidade in quantidades.items()
+            ])
+    
+    def criar_transicoes(self, acao: str, quantidades: Dict[int, int], usuario_id: int, observacao: str):
+        """Cria transições em lote com um único INSERT executemany (sem commit)."""
+        from sqlalchemy import insert
+        from models import db, MovimentacaoEstoque
+        
+        if quantidades:
+            db.session.execute(insert(MovimentacaoEstoque), [
+                {'produto_id': produto_id, 'usuario_id': usuario_id, 'tipo': acao,
+                 **self._valores_transicao(acao, quantidade, observacao)}
+                for produto_id, quantidade in quantidades.items()
+            ])
+    
+    @staticmethod
+    def _valores_transicao(acao: str, unidades: int, observacao: str) -> Dict:
+        from services.danificado_service import EFEITO_FUNCIONAL
+        
+        efeito = EFEITO_FUNCIONAL[acao]
+        if not efeito:
+            # Sem efeito no saldo funcional: as unidades movidas ficam registradas na observação
+            observacao = f'{unidades} unidades: {observacao}'
+        return {'quantidade': efeito * unidades, 'observacao': observacao}
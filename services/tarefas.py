@@ -0,0 +1,162 @@
+"""
+Tarefas padrão executadas pelos workers de job (ver services.job_service).
+
+Cada tarefa recebe o ContextoJob e os parâmetros gravados no job, e devolve
+um resultado serializável em JSON.
+"""
+import csv
+import os
+from typing import Dict, List, Optional
+
+from services.job_service import tarefa
+
+TAMANHO_PAGINA = 5000
+LIMITE_ERROS = 500
+LIMITE_IDS = 1000
+
+
+@tarefa('importar_produtos')
+def importar_produtos(contexto, conteudo: Optional[str] = None, linhas: Optional[List[Dict]] = None,
+                      usuario_id: Optional[int] = None, usuario_nome: Optional[str] = None,
+                      parcial: bool = True) -> Dict:
+    """
+    Importa produtos de um CSV (`conteudo`) ou de uma lista de linhas (POST /api/produtos).
+
+    A importação é uma única transação; o cancelamento é verificado entre os
+    blocos e descarta tudo.
+    """
+    from services.importacao_service import ler_csv, importar_produtos as importar
+
+    if conteudo is not None:
+        linhas = ler_csv(conteudo)
+    contexto.progresso(0.1, f'{len(linhas or [])} linhas lidas')
+
+    resultado = importar(linhas or [], usuario_id, usuario_nome=usuario_nome, parcial=parcial,
+                         verificar=contexto.verificar_cancelamento)
+    erros = list(resultado['erros'].items())
+    return {
+        'criados': len(resultado['criados']),
+        'ids': [produto.id_publico for produto in resultado['criados'][:LIMITE_IDS]],
+        'linhas_com_erro': len(erros),
+        'erros': {str(indice): mensagens for indice, mensagens in erros[:LIMITE_ERROS]},
+    }
+
+
+@tarefa('exportar_produtos')
+def exportar_produtos(contexto) -> Dict:
+    """
+    Gera o CSV de produtos em `instance/exportacoes/`.
+
+    Lê por páginas de id (keyset) e encerra a transação de leitura a cada
+    página, para que o progresso possa ser gravado no SQLite.
+    """
+    from flask import current_app
+    from models import db, Produto
+    from services.importacao_service import COLUNAS_CSV, valores_csv
+
+    diretorio = os.path.join(current_app.instance_path, 'exportacoes')
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f'produtos_{contexto.job_id}.csv')
+
+    total = Produto.query.count()
+    db.session.commit()
+
+    escritos, ultimo_id = 0, 0
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        writer = csv.writer(arquivo)
+        writer.writerow(COLUNAS_CSV)
+        while True:
+            pagina = Produto.query.filter(Produto.id > ultimo_id).order_by(Produto.id).limit(TAMANHO_PAGINA).all()
+            if not pagina:
+                break
+            writer.writerows(valores_csv(produto) for produto in pagina)
+            escritos += len(pagina)
+            ultimo_id = pagina[-1].id
+            db.session.commit()
+            contexto.progresso(escritos / total if total else 1.0, f'{escritos}/{total} produtos')
+
+    return {'arquivo': os.path.basename(caminho), 'produtos': escritos}
+
+
+@tarefa('arquivar_movimentacoes')
+def arquivar_movimentacoes(contexto, dias_retencao: int = 730, usuario_nome: Optional[str] = None) -> Dict:
+    from services.arquivamento_service import arquivar_movimentacoes as arquivar
+
+    contexto.progresso(0.0, 'Arquivando movimentações')
+    resultado = arquivar(dias_retencao=dias_retencao, usuario_nome=usuario_nome)
+    return {'data_corte': resultado['data_corte'].isoformat(), 'anos': resultado['anos']}
+
+
+@tarefa('atualizar_analytics')
+def atualizar_analytics(contexto, janela_dias: int = 30) -> Dict:
+    from services.analytics_service import atualizar_resumo_consumo
+
+    contexto.progresso(0.0, 'Calculando resumo de consumo')
+    return atualizar_resumo_consumo(janela_dias=janela_dias)
+
+
+@tarefa('reconciliar_unidades')
+def reconciliar_unidades(contexto) -> Dict:
+    """
+    Compara as unidades com número de série com os contadores do produto.
+
+    Unidades identificadas em um estado não podem exceder o contador do
+    estado correspondente (nem todas as unidades precisam ter série).
+    """
+    from models import db, Produto, UnidadeEquipamento
+    from services.unidade_service import COLUNAS_STATUS as colunas
+
+    contagens = (
+        db.session.query(UnidadeEquipamento.produto_id, UnidadeEquipamento.status, db.func.count())
+        .filter(UnidadeEquipamento.status.in_(list(colunas)))
+        .group_by(UnidadeEquipamento.produto_id, UnidadeEquipamento.status)
+        .all()
+    )
+    por_produto: Dict[int, Dict[str, int]] = {}
+    for produto_id, status, total in contagens:
+        por_produto.setdefault(produto_id, {})[status] = total
+    contexto.progresso(0.5, f'{len(por_produto)} produtos com unidades')
+
+    divergencias = []
+    ids = list(por_produto)
+    for inicio in range(0, len(ids), TAMANHO_PAGINA):
+        for produto in Produto.query.filter(Produto.id.in_(ids[inicio:inicio + TAMANHO_PAGINA])):
+            for status, total in por_produto[produto.id].items():
+                contador = getattr(produto, colunas[status]) or 0
+                if total > contador:
+                    divergencias.append({
+                        'produto_id': produto.id_publico,
+                        'nome': produto.nome,
+                        'status': status,
+                        'unidades': total,
+                        'contador': contador,
+                    })
+    db.session.commit()
+
+    return {'produtos_verificados': len(por_produto), 'divergencias': divergencias[:LIMITE_ERROS]}
+
+
+@tarefa('conferir_saldos')
+def conferir_saldos(contexto) -> Dict:
+    """Compara o estoque funcional com o saldo das movimentações, incluindo os saldos arquivados."""
+    from services.arquivamento_service import conferir_saldos as conferir
+
+    contexto.progresso(0.0, 'Conferindo saldos')
+    return conferir(limite=LIMITE_ERROS)
+
+
+@tarefa('verificar_contadores')
+def verificar_contadores(contexto) -> Dict:
+    """Recalcula os contadores do cabeçalho e corrige desvios (agendado em JOBS_PERIODICOS)."""
+    from services.contador_service import verificar_contadores as verificar
+
+    contexto.progresso(0.0, 'Recalculando contadores')
+    return verificar(corrigir=True)
+
+
+@tarefa('limpar_chaves_idempotencia')
+def limpar_chaves_idempotencia(contexto) -> Dict:
+    """Remove as chaves de idempotência expiradas (agendado em JOBS_PERIODICOS)."""
+    from services.idempotencia_service import limpar_expiradas
+
+    return {'removidas': limpar_expiradas()}
@@ -0,0 +1,156 @@
+"""
+Registro de tipos de produto.
+
+Cada tipo declara suas strategies de criação/atualização, se usa origem,
+se controla unidades danificadas e, opcionalmente, regras de validação
+próprias. Tipos adicionais são carregados de `app.config['TIPOS_PRODUTO']`
+(caminhos "modulo:objeto") e do grupo de entry points `estoque.tipos_produto`,
+sem alterar os services.
+
+Exemplo (consumíveis com lote e validade):
+
+    class ConsumivelCreateStrategy(MaterialCreateStrategy):
+        def criar(self, data):
+            produto = super().criar(data)
+            db.session.add(LoteConsumivel(produto_id=produto.id, lote=data['lote'],
+                                          validade=data['validade']))
+            return produto
+
+    def validar_consumivel(linha, dados, erros):
+        if not linha.get('lote'):
+            erros.append('Lote é obrigatório para consumíveis.')
+        dados['lote'] = linha.get('lote')
+        dados['validade'] = linha.get('validade')
+
+    CONSUMIVEL = TipoProduto('consumivel', 'Consumível', ConsumivelCreateStrategy(),
+                             MaterialUpdateStrategy(), validar_extra=validar_consumivel)
+
+    # config: TIPOS_PRODUTO = ['meu_pacote.tipos:CONSUMIVEL']
+"""
+from importlib import import_module
+from importlib.metadata import entry_points
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+GRUPO_ENTRY_POINTS = 'estoque.tipos_produto'
+
+
+class TipoProduto:
+    """Descrição de um tipo de produto e do comportamento associado a ele."""
+
+    def __init__(self, nome: str, rotulo: str, create_strategy, update_strategy,
+                 usa_origem: bool = False, rastreia_danificados: bool = False,
+                 validar_extra: Optional[Callable[[Mapping, Dict, List[str]], None]] = None):
+        """
+        Args:
+            nome: Identificador normalizado (minúsculo, sem espaços nas pontas)
+            rotulo: Valor gravado em Produto.tipo e exibido nos formulários
+            create_strategy: Instância de ProdutoCreateStrategy
+            update_strategy: Instância de ProdutoUpdateStrategy
+            usa_origem: Se o tipo aceita origem (comprado/alugado)
+            rastreia_danificados: Se o tipo controla quantidade danificada
+            validar_extra: Regras adicionais fn(linha, dados, erros); pode
+                acrescentar campos em `dados` e mensagens em `erros`
+        """
+        self.nome = nome.strip().lower()
+        self.rotulo = rotulo
+        self.create_strategy = create_strategy
+        self.update_strategy = update_strategy
+        self.usa_origem = usa_origem
+        self.rastreia_danificados = rastreia_danificados
+        self.validar_extra = validar_extra
+
+    def __repr__(self):
+        return f'<TipoProduto {self.nome}>'
+
+
+class RegistroTiposProduto:
+    """Registro global com tabela de despacho pré-computada."""
+
+    _tipos: Dict[str, TipoProduto] = {}
+    _despacho: Dict[str, TipoProduto] = {}
+
+    @classmethod
+    def registrar(cls, tipo: TipoProduto):
+        """Registra (ou substitui) um tipo e recompila a tabela de despacho."""
+        cls._tipos[tipo.nome] = tipo
+        cls._compilar()
+
+    @classmethod
+    def _compilar(cls):
+        from services.validators import ProdutoSchemaValidator
+
+        despacho = {}
+        for tipo in cls._tipos.values():
+            # Grafias usuais resolvidas sem normalizar a string a cada chamada
+            for chave in (tipo.nome, tipo.rotulo, tipo.rotulo.lower(), tipo.rotulo.upper(), tipo.nome.upper()):
+                despacho[chave] = tipo
+        cls._despacho = despacho
+        ProdutoSchemaValidator._padrao = None
+
+    @classmethod
+    def buscar(cls, tipo: Optional[str]) -> Optional[TipoProduto]:
+        """Resolve o tipo pela tabela de despacho; None se desconhecido."""
+        if not tipo or not isinstance(tipo, str):
+            return None
+        encontrado = cls._despacho.get(tipo)
+        if encontrado is None:
+            encontrado = cls._despacho.get(tipo.strip().lower())
+        return encontrado
+
+    @classmethod
+    def resolver(cls, tipo: Optional[str]) -> TipoProduto:
+        """
+        Resolve o tipo ou falha.
+
+        Raises:
+            ValueError: Se o tipo não estiver registrado
+        """
+        encontrado = cls.buscar(tipo)
+        if encontrado is None:
+            raise ValueError(f"Tipo de produto desconhecido: {tipo}")
+        return encontrado
+
+    @classmethod
+    def todos(cls) -> List[TipoProduto]:
+        return list(cls._tipos.values())
+
+    @classmethod
+    def carregar(cls, caminhos: Iterable[str] = (), usar_entry_points: bool = True):
+        """
+        Carrega tipos externos.
+
+        Args:
+            caminhos: Referências "modulo:objeto"; o objeto pode ser um
+                TipoProduto, uma lista deles ou uma função que os retorne
+            usar_entry_points: Também carrega o grupo `estoque.tipos_produto`
+        """
+        objetos = []
+        for caminho in caminhos:
+            modulo, _, atributo = caminho.partition(':')
+            objetos.append(getattr(import_module(modulo), atributo))
+        if usar_entry_points:
+            objetos.extend(ep.load() for ep in entry_points(group=GRUPO_ENTRY_POINTS))
+
+        for objeto in objetos:
+            if callable(objeto) and not isinstance(objeto, TipoProduto):
+                objeto = objeto()
+            for tipo in (objeto if isinstance(objeto, (list, tuple)) else [objeto]):
+                cls.registrar(tipo)
+
+
+def _registrar_padrao():
+    from services.produto_strategies import (
+        MaterialCreateStrategy, MaterialUpdateStrategy,
+        EquipamentoCreateStrategy, EquipamentoUpdateStrategy,
+    )
+
+    RegistroTiposProduto.registrar(TipoProduto(
+        'material', 'Material', MaterialCreateStrategy(), MaterialUpdateStrategy(),
+    ))
+    RegistroTiposProduto.registrar(TipoProduto(
+        'equipamento', 'Equipamento', EquipamentoCreateStrategy(), EquipamentoUpdateStrategy(),
+        usa_origem=True, rastreia_danificados=True,
+    ))
+
+
+_registrar_padrao()
@@ -0,0 +1,299 @@
+"""
+Rastreamento por número de série de equipamentos.
+
+As transições de status são aplicadas em lote com um único UPDATE por bloco
+de números de série (índice único em numero_serie, índice produto/status).
+Os contadores agregados do produto (funcional, danificado, em reparo) são
+ajustados pelo número de linhas afetadas, sem recontar unidades, de modo
+que /estoque continua lendo apenas as colunas de Produto.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import update
+
+from utils.datetime_utils import agora_utc
+
+TAMANHO_BLOCO = 500
+
+# ação -> (status de origem, status de destino); as ações do fluxo de reparo
+# usam a transição de mesmo nome em danificado_service.TRANSICOES
+TRANSICOES = {
+    'danificar': ('disponivel', 'danificado'),
+    'reparar': ('danificado', 'disponivel'),
+    'enviar_reparo': ('danificado', 'em_reparo'),
+    'concluir_reparo': ('em_reparo', 'disponivel'),
+    'descartar': ('danificado', 'descartado'),
+    'transferir': ('disponivel', 'em_obra'),
+    'retornar': ('em_obra', 'disponivel'),
+}
+
+
+# status da unidade -> contador do produto que a inclui
+COLUNAS_STATUS = {
+    'disponivel': 'quantidade',
+    'danificado': 'quantidade_danificada',
+    'em_reparo': 'quantidade_em_reparo',
+}
+
+
+def _normalizar_seriais(numeros_serie: Iterable[str]) -> List[str]:
+    vistos = {}
+    for numero in numeros_serie:
+        numero = (numero or '').strip()
+        if numero:
+            vistos.setdefault(numero, None)
+    return list(vistos)
+
+
+def _produto_rastreavel(produto_id_publico: str):
+    from services.repositories import ProdutoRepository
+    from services.tipos_produto import RegistroTiposProduto
+
+    produto = ProdutoRepository().get_by_id_publico(produto_id_publico)
+    tipo = RegistroTiposProduto.buscar(produto.tipo)
+    if tipo is None or not tipo.rastreia_danificados:
+        raise ValueError('Rastreamento por número de série disponível apenas para equipamentos.')
+    return produto
+
+
+def cadastrar_unidades(produto_id_publico: str, numeros_serie: Iterable[str], usuario_id: int,
+                       entrada: bool = False, usuario_nome: Optional[str] = None) -> int:
+    """
+    Cadastra números de série (status 'disponivel') para um equipamento.
+
+    Args:
+        produto_id_publico: Identificador público do produto
+        numeros_serie: Números de série a cadastrar
+        usuario_id: ID do usuário responsável
+        entrada: Se True, as unidades são novas e somam à quantidade do produto;
+            caso contrário apenas identificam unidades já existentes no estoque
+        usuario_nome: Nome do usuário para logging (opcional)
+
+    Returns:
+        int: Quantidade de unidades cadastradas
+
+    Raises:
+        ValueError: Série já cadastrada ou mais séries que unidades disponíveis
+    """
+    from models import db, UnidadeEquipamento, MovimentacaoEstoque
+    from services.alerta_service import avaliar_reposicao
+    from services.contador_service import estado, registrar_alteracao
+    from utils.log_utils import registrar_log
+
+    produto = _produto_rastreavel(produto_id_publico)
+    seriais = _normalizar_seriais(numeros_serie)
+    if not seriais:
+        raise ValueError('Informe ao menos um número de série.')
+
+    existentes = set()
+    for inicio in range(0, len(seriais), TAMANHO_BLOCO):
+        bloco = seriais[inicio:inicio + TAMANHO_BLOCO]
+        existentes.update(
+            numero for (numero,) in db.session.query(UnidadeEquipamento.numero_serie)
+            .filter(UnidadeEquipamento.numero_serie.in_(bloco))
+        )
+    if existentes:
+        raise ValueError(f"Números de série já cadastrados: {', '.join(sorted(existentes)[:20])}")
+
+    if entrada:
+        anterior = estado(produto)
+        produto.quantidade += len(seriais)
+        registrar_alteracao(anterior, estado(produto))
+        db.session.add(MovimentacaoEstoque(
+            produto_id=produto.id,
+            usuario_id=usuario_id,
+            quantidade=len(seriais),
+            tipo='entrada',
+            observacao=f'Entrada de {len(seriais)} unidades com número de série.',
+        ))
+        avaliar_reposicao([produto])
+    else:
+        identificadas = produto.unidades.filter_by(status='disponivel').count()
+        if identificadas + len(seriais) > produto.quantidade:
+            raise ValueError(
+                f'O produto tem {produto.quantidade} unidades funcionais e {identificadas} já identificadas.'
+            )
+
+    db.session.execute(
+        UnidadeEquipamento.__table__.insert(),
+        [{'produto_id': produto.id, 'numero_serie': numero, 'status': 'disponivel'} for numero in seriais],
+    )
+    db.session.commit()
+
+    if usuario_nome:
+        registrar_log(usuario_nome, f'Cadastrou {len(seriais)} números de série no produto ID {produto.id_publico}')
+
+    return len(seriais)
+
+
+def transicionar_unidades(produto_id_publico: str, acao: str, numeros_serie: Iterable[str],
+                          usuario_id: int, obra_id: Optional[int] = None,
+                          usuario_nome: Optional[str] = None) -> int:
+    """
+    Aplica uma transição de status a várias unidades de uma vez.
+
+    Args:
+        produto_id_publico: Identificador público do produto
+        acao: Uma das chaves de TRANSICOES
+        numeros_serie: Unidades afetadas
+        usuario_id: ID do usuário responsável
+        obra_id: Obra de destino (obrigatória para 'transferir')
+        usuario_nome: Nome do usuário para logging (opcional)
+
+    Returns:
+        int: Quantidade de unidades alteradas
+
+    Raises:
+        ValueError: Ação inválida ou unidades fora do status de origem
+    """
+    from models import db, UnidadeEquipamento, MovimentacaoEstoqueObra
+    from services.alerta_service import avaliar_reposicao
+    from services.contador_service import estado, registrar_alteracao
+    from services.danificado_service import registrar_transicao
+    from utils.log_utils import registrar_log
+
+    if acao not in TRANSICOES:
+        raise ValueError(f'Ação desconhecida: {acao}')
+    if acao == 'transferir' and obra_id is None:
+        raise ValueError('Informe a obra de destino.')
+
+    origem, destino = TRANSICOES[acao]
+    produto = _produto_rastreavel(produto_id_publico)
+    seriais = _normalizar_seriais(numeros_serie)
+    if not seriais:
+        raise ValueError('Informe ao menos um número de série.')
+
+    agora = agora_utc()
+    valores = {'status': destino, 'atualizado_em': agora, 'obra_id': obra_id if destino == 'em_obra' else None}
+
+    alteradas = 0
+    for inicio in range(0, len(seriais), TAMANHO_BLOCO):
+        bloco = seriais[inicio:inicio + TAMANHO_BLOCO]
+        alteradas += db.session.execute(
+            update(UnidadeEquipamento)
+            .where(
+                UnidadeEquipamento.produto_id == produto.id,
+                UnidadeEquipamento.status == origem,
+                UnidadeEquipamento.numero_serie.in_(bloco),
+            )
+            .values(**valores)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    if alteradas != len(seriais):
+        db.session.rollback()
+        invalidas = _seriais_fora_do_status(produto.id, seriais, origem)
+        raise ValueError(
+            f"Unidades fora do status '{origem}' ou de outro produto: {', '.join(invalidas[:20])}"
+        )
+
+    observacao = f"{acao}: {alteradas} unidades ({', '.join(seriais[:10])}{'...' if alteradas > 10 else ''})"
+    try:
+        if acao in ('transferir', 'retornar'):
+            sinal = -1 if acao == 'transferir' else 1
+            if produto.quantidade + sinal * alteradas < 0:
+                raise ValueError('Quantidade funcional do produto é menor que o número de unidades informadas.')
+            anterior = estado(produto)
+            produto.quantidade += sinal * alteradas
+            registrar_alteracao(anterior, estado(produto))
+            db.session.add(MovimentacaoEstoqueObra(
+                produto_id=produto.id,
+                usuario_id=usuario_id,
+                tipo=acao,
+                quantidade=sinal * alteradas,
+                obra_id=obra_id,
+            ))
+        else:
+            registrar_transicao(produto, acao, alteradas, usuario_id, observacao)
+    except ValueError:
+        db.session.rollback()
+        raise
+
+    avaliar_reposicao([produto])
+    db.session.commit()
+
+    if usuario_nome:
+        registrar_log(usuario_nome, f'{observacao} - produto ID {produto.id_publico}')
+
+    return alteradas
+
+
+def conferir_unidades(produto) -> None:
+    """
+    Garante que as unidades com número de série cabem nos contadores do produto.
+
+    Alterações agregadas (edição, /produtos/<id>/reparo) só podem mover
+    unidades sem número de série; se deixarem um contador abaixo das unidades
+    identificadas naquele status, devem ser feitas pelas ações das unidades.
+
+    Raises:
+        ValueError: Contador menor que as unidades identificadas no status, ou
+            tipo que não rastreia unidades
+    """
+    from models import db, UnidadeEquipamento
+    from services.tipos_produto import RegistroTiposProduto
+
+    contagens = dict(
+        db.session.query(UnidadeEquipamento.status, db.func.count())
+        .filter(UnidadeEquipamento.produto_id == produto.id)
+        .group_by(UnidadeEquipamento.status)
+        .all()
+    )
+    if not contagens:
+        return
+
+    tipo = RegistroTiposProduto.buscar(produto.tipo)
+    if tipo is None or not tipo.rastreia_danificados:
+        raise ValueError('Produto possui unidades com número de série e precisa continuar sendo um equipamento.')
+
+    excedidos = [
+        status for status, coluna in COLUNAS_STATUS.items()
+        if contagens.get(status, 0) > (getattr(produto, coluna) or 0)
+    ]
+    if excedidos:
+        raise ValueError(
+            f"Unidades com número de série em {', '.join(excedidos)} excedem a nova quantidade; "
+            'use as ações por número de série.'
+        )
+
+
+def _seriais_fora_do_status(produto_id: int, seriais: List[str], status: str) -> List[str]:
+    from models import db, UnidadeEquipamento
+
+    validos = set()
+    for inicio in range(0, len(seriais), TAMANHO_BLOCO):
+        bloco = seriais[inicio:inicio + TAMANHO_BLOCO]
+        validos.update(
+            numero for (numero,) in db.session.query(UnidadeEquipamento.numero_serie).filter(
+                UnidadeEquipamento.produto_id == produto_id,
+                UnidadeEquipamento.status == status,
+                UnidadeEquipamento.numero_serie.in_(bloco),
+            )
+        )
+    return [numero for numero in seriais if numero not in validos]
+
+
+def listar_unidades(produto_id_publico: str, status: Optional[str] = None, limite: int = 1000) -> List:
+    """Unidades de um produto, opcionalmente filtradas por status."""
+    from models import UnidadeEquipamento
+    from services.repositories import ProdutoRepository
+
+    produto = ProdutoRepository().get_by_id_publico(produto_id_publico)
+    query = produto.unidades
+    if status:
+        query = query.filter_by(status=status)
+    return query.order_by(UnidadeEquipamento.numero_serie).limit(limite).all()
+
+
+def contar_unidades(produto_id_publico: str) -> Dict[str, int]:
+    """Contagem de unidades por status (consulta agregada pelo índice produto/status)."""
+    from models import db, UnidadeEquipamento
+    from services.repositories import ProdutoRepository
+
+    produto = ProdutoRepository().get_by_id_publico(produto_id_publico)
+    linhas = (
+        db.session.query(UnidadeEquipamento.status, db.func.count())
+        .filter(UnidadeEquipamento.produto_id == produto.id)
+        .group_by(UnidadeEquipamento.status)
+    )
+    return {status: total for status, total in linhas}
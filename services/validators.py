@@ -1,85 +1,287 @@
-from typing import Optional
+import uuid
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
 
 
-class QuantidadeValidator:
-    """Valida quantidades numéricas."""
+class ResultadoValidacao:
+    """Resultado da validação de um lote: linhas válidas e erros por linha."""
     
-    @staticmethod
-    def validar(valor, permitir_zero: bool = True) -> int:
-        """
-        Valida e converte quantidade.
-        
-        Args:
-            valor: Valor a ser validado
-            permitir_zero: Se True, aceita zero como válido
-            
-        Returns:
-            int: Quantidade validada
-            
-        Raises:
-            ValueError: Se quantidade for inválida
-        """
-        try:
-            qtd = int(valor)
-        except (ValueError, TypeError):
-            raise ValueError("Quantidade deve ser um número válido.")
-        
-        if qtd < 0:
-            raise ValueError("Quantidade não pode ser negativa.")
-        
-        if not permitir_zero and qtd == 0:
-            raise ValueError("Quantidade deve ser maior que zero.")
-        
-        return qtd
+    def __init__(self):
+        self.validos: List[Tuple[int, Dict]] = []
+        self.erros: Dict[int, List[str]] = {}
+    
+    @property
+    def ok(self) -> bool:
+        return not self.erros
 
 
-class OrigemValidator:
-    """Valida e normaliza origem de equipamentos."""
+class ProdutoSchemaValidator:
+    """
+    Valida lotes de linhas de produto em uma única passada.
+    
+    Usado pelo formulário de cadastro, pela API JSON e pela importação em
+    lote; a edição (`validar_edicao`) e as transições do fluxo de reparo
+    (`quantidade`) usam as mesmas regras. Todos os erros de cada linha são
+    acumulados (não para no primeiro).
+    As tabelas de normalização (tipos e aliases de origem) são montadas uma
+    vez no construtor; a instância padrão é descartada quando um tipo novo
+    é registrado. Cada linha válida carrega o TipoProduto já resolvido em
+    `dados['tipo_produto']`.
+    """
+    
+    CAMPOS_OBRIGATORIOS = ('nome', 'quantidade', 'tipo', 'unidade_medida')
     
-    ORIGENS_VALIDAS = {
+    ORIGENS = {
         'alugado': 'Alugado',
         'alugada': 'Alugado',
         'comprado': 'Comprado',
-        'comprada': 'Comprado'
+        'comprada': 'Comprado',
     }
     
-    @staticmethod
-    def normalizar(origem: Optional[str]) -> Optional[str]:
+    ERRO_DANIFICADA = 'Quantidade danificada não pode ser maior que a quantidade total.'
+    ERRO_EM_REPARO = 'Quantidade danificada mais a em reparo não pode ser maior que a quantidade total.'
+    
+    _padrao = None
+    
+    def __init__(self, tipos: Optional[Iterable] = None):
         """
-        Normaliza valor de origem.
+        Args:
+            tipos: TipoProduto aceitos (padrão: todos do RegistroTiposProduto)
+        """
+        if tipos is None:
+            from services.tipos_produto import RegistroTiposProduto
+            tipos = RegistroTiposProduto.todos()
+        
+        self._tipos = {}
+        for tipo in tipos:
+            self._tipos[tipo.nome] = tipo
+            self._tipos[tipo.rotulo.strip().lower()] = tipo
+        self._origens = dict(self.ORIGENS)
+    
+    @classmethod
+    def padrao(cls) -> 'ProdutoSchemaValidator':
+        """Instância compartilhada (tabelas compiladas uma única vez)."""
+        if cls._padrao is None:
+            cls._padrao = cls()
+        return cls._padrao
+    
+    def validar(self, linhas) -> ResultadoValidacao:
+        """
+        Valida um lote.
         
         Args:
-            origem: Valor bruto da origem
-            
+            linhas: Sequência de mapeamentos (uma linha por item) ou mapeamento
+                de colunas {campo: sequência de valores}
+        
         Returns:
-            str ou None: Origem normalizada ou None se inválida
+            ResultadoValidacao: Índice da linha -> dados normalizados ou lista de erros
         """
-        if not origem:
-            return None
+        resultado = ResultadoValidacao()
+        validar_linha = self._validar_linha
         
-        origem_lower = origem.strip().lower()
-        return OrigemValidator.ORIGENS_VALIDAS.get(origem_lower)
-
-
-class ProdutoValidator:
-    """Valida regras de negócio de produtos."""
+        for indice, linha in enumerate(self._iterar_linhas(linhas)):
+            erros: List[str] = []
+            dados = validar_linha(linha, erros)
+            if erros:
+                resultado.erros[indice] = erros
+            else:
+                resultado.validos.append((indice, dados))
+        
+        return resultado
+    
+    @staticmethod
+    def _iterar_linhas(linhas):
+        if isinstance(linhas, Mapping) and not hasattr(linhas, 'getlist'):
+            colunas = list(linhas.keys())
+            for valores in zip(*(linhas[coluna] for coluna in colunas)):
+                yield dict(zip(colunas, valores))
+        else:
+            yield from linhas
+    
+    @staticmethod
+    def _vazio(valor) -> bool:
+        return valor is None or (isinstance(valor, str) and not valor.strip())
     
     @staticmethod
-    def validar_danificados(qtd_danificada: int, qtd_funcional: int, qtd_danif_anterior: int = 0):
+    def _inteiro(valor, campo: str, erros: List[str]) -> Optional[int]:
+        if isinstance(valor, float) and not valor.is_integer():
+            erros.append(f'{campo}: Quantidade deve ser um número válido.')
+            return None
+        try:
+            numero = int(valor.strip() if isinstance(valor, str) else valor)
+        except (ValueError, TypeError):
+            erros.append(f'{campo}: Quantidade deve ser um número válido.')
+            return None
+        if numero < 0:
+            erros.append(f'{campo}: Quantidade não pode ser negativa.')
+            return None
+        return numero
+    
+    @classmethod
+    def quantidade(cls, valor, campo: str = 'quantidade') -> int:
+        """
+        Valida uma quantidade avulsa (ex.: transições do fluxo de reparo).
+        
+        Raises:
+            ValueError: Valor ausente, não inteiro ou negativo
+        """
+        erros: List[str] = []
+        numero = None if cls._vazio(valor) else cls._inteiro(valor, campo, erros)
+        if numero is None:
+            raise ValueError(' '.join(erros) or f'{campo}: Quantidade deve ser um número válido.')
+        return numero
+    
+    def _origem(self, tipo, origem_raw) -> Optional[str]:
+        if not tipo.usa_origem or not isinstance(origem_raw, str):
+            return None
+        return self._origens.get(origem_raw.strip().lower())
+    
+    def validar_edicao(self, form_data: Mapping, tipo, total_anterior: int) -> Dict:
         """
-        Valida que quantidade danificada não excede o total disponível.
+        Valida o formulário de edição de um produto com as regras do cadastro.
+        
+        Tipos que rastreiam danificados mantêm o total (funcional + danificado)
+        e recebem apenas a nova divisão; os demais recebem a nova quantidade.
+        As regras próprias do tipo (`validar_extra`) rodam como no cadastro.
         
         Args:
-            qtd_danificada: Nova quantidade de danificados
-            qtd_funcional: Quantidade funcional anterior
-            qtd_danif_anterior: Quantidade danificada anterior
-            
+            form_data: Campos do formulário
+            tipo: TipoProduto já resolvido
+            total_anterior: Quantidade funcional + danificada antes da edição
+        
+        Returns:
+            dict: Campos do formulário mais os normalizados (`nome`,
+                `quantidade_int`, `quantidade_danificada_int`, `origem` e,
+                se enviado, `ponto_reposicao`) e os acrescentados por
+                `validar_extra`, entregue à update strategy
+        
         Raises:
-            ValueError: Se danificados excedem o total
+            ValueError: Com todos os erros encontrados
         """
-        total_disponivel = qtd_funcional + qtd_danif_anterior
+        get = form_data.get
+        vazio = self._vazio
+        inteiro = self._inteiro
+        erros: List[str] = []
+        
+        nome = get('nome')
+        obrigatorios = ['nome'] if vazio(nome) else []
+        
+        quantidade = quantidade_danificada = None
+        if tipo.rastreia_danificados:
+            danificada_raw = get('quantidade_danificada')
+            quantidade_danificada = 0 if vazio(danificada_raw) else inteiro(
+                danificada_raw, 'quantidade_danificada', erros)
+            if quantidade_danificada is not None and quantidade_danificada > total_anterior:
+                erros.append(self.ERRO_DANIFICADA)
+        else:
+            quantidade_danificada = 0
+            quantidade_raw = get('quantidade')
+            if vazio(quantidade_raw):
+                obrigatorios.append('quantidade')
+            else:
+                quantidade = inteiro(quantidade_raw, 'quantidade', erros)
+        
+        if obrigatorios:
+            erros.insert(0, f"Campos obrigatórios ausentes: {', '.join(obrigatorios)}.")
+        
+        dados = {campo: get(campo) for campo in form_data.keys()}
+        if 'ponto_reposicao' in form_data:
+            ponto_reposicao = get('ponto_reposicao')
+            dados['ponto_reposicao'] = None if vazio(ponto_reposicao) else inteiro(
+                ponto_reposicao, 'ponto_reposicao', erros)
+        
+        if erros:
+            raise ValueError(' '.join(erros))
+        
+        dados.update({
+            'nome': nome.strip() if isinstance(nome, str) else nome,
+            'quantidade_int': quantidade,
+            'quantidade_danificada_int': quantidade_danificada,
+            'origem': self._origem(tipo, get('origem')),
+            'tipo_produto': tipo,
+        })
+        
+        if tipo.validar_extra is not None:
+            tipo.validar_extra(form_data, dados, erros)
+            if erros:
+                raise ValueError(' '.join(erros))
+        
+        return dados
+    
+    def _validar_linha(self, linha: Mapping, erros: List[str]) -> Optional[Dict]:
+        get = linha.get
+        vazio = self._vazio
+        inteiro = self._inteiro
+        
+        nome = get('nome')
+        quantidade_raw = get('quantidade')
+        tipo_raw = get('tipo')
+        unidade_medida = get('unidade_medida')
+        
+        if vazio(nome) or vazio(quantidade_raw) or vazio(tipo_raw) or vazio(unidade_medida):
+            faltando = [campo for campo in self.CAMPOS_OBRIGATORIOS if vazio(get(campo))]
+            erros.append(f"Campos obrigatórios ausentes: {', '.join(faltando)}.")
+        
+        # Valores que não são texto (ex.: JSON {"tipo": 5}) também são tipos desconhecidos
+        tipo_clean = tipo_raw.strip().lower() if isinstance(tipo_raw, str) else None
+        tipo = self._tipos.get(tipo_clean) if tipo_clean else None
+        if tipo is None and not vazio(tipo_raw):
+            erros.append(f'Tipo de produto desconhecido: {tipo_raw}')
+        com_danificados = tipo is not None and tipo.rastreia_danificados
+        
+        quantidade = None if vazio(quantidade_raw) else inteiro(quantidade_raw, 'quantidade', erros)
+        
+        quantidade_danificada = quantidade_em_reparo = 0
+        if com_danificados:
+            danificada_raw = get('quantidade_danificada')
+            if not vazio(danificada_raw):
+                quantidade_danificada = inteiro(danificada_raw, 'quantidade_danificada', erros)
+            em_reparo_raw = get('quantidade_em_reparo')
+            if not vazio(em_reparo_raw):
+                quantidade_em_reparo = inteiro(em_reparo_raw, 'quantidade_em_reparo', erros)
+        
+        ponto_reposicao = get('ponto_reposicao')
+        ponto_reposicao = None if vazio(ponto_reposicao) else inteiro(ponto_reposicao, 'ponto_reposicao', erros)
+        
+        # `id` opcional (CSV exportado): reimportar a mesma linha não duplica o produto
+        id_publico = get('id')
+        if vazio(id_publico):
+            id_publico = None
+        else:
+            try:
+                id_publico = str(uuid.UUID(str(id_publico).strip()))
+            except ValueError:
+                erros.append('id: Identificador inválido.')
+        
+        if quantidade is not None and quantidade_danificada is not None and quantidade_em_reparo is not None:
+            if quantidade_danificada + quantidade_em_reparo > quantidade:
+                erros.append(self.ERRO_EM_REPARO if quantidade_em_reparo else self.ERRO_DANIFICADA)
+        
+        if erros:
+            return None
+        
+        origem = self._origem(tipo, get('origem'))
+        
+        local_produto = get('local_produto')
+        
+        dados = {
+            'nome': nome.strip() if isinstance(nome, str) else nome,
+            'quantidade_int': quantidade,
+            'tipo': tipo.rotulo,
+            'tipo_clean': tipo.nome,
+            'tipo_produto': tipo,
+            'unidade_medida': unidade_medida,
+            'local_produto': 'Estoque Geral' if vazio(local_produto) else local_produto,
+            'quantidade_danificada_int': quantidade_danificada,
+            'quantidade_em_reparo_int': quantidade_em_reparo,
+            'origem': origem,
+            'quantidade_funcional': quantidade - quantidade_danificada - quantidade_em_reparo,
+            'ponto_reposicao': ponto_reposicao,
+            'id_publico': id_publico,
+        }
+        
+        if tipo.validar_extra is not None:
+            tipo.validar_extra(linha, dados, erros)
+            if erros:
+                return None
         
-        if qtd_danificada > total_disponivel:
-            raise ValueError(
-                f"Quantidade danificada ({qtd_danificada}) excede o total disponível ({total_disponivel})."
-            )
+        return dados
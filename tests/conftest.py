@@ -0,0 +1,41 @@
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from models import db
+from utils.banco_utils import opcoes_engine
+
+
+@pytest.fixture
+def criar_app(tmp_path):
+    """Aplicação mínima (só o banco) sobre um SQLite novo em tmp_path."""
+    def criar(nome: str = 'estoque.db') -> Flask:
+        app = Flask(__name__, instance_path=str(tmp_path))
+        url = f'sqlite:///{tmp_path / nome}'
+        app.config['SQLALCHEMY_DATABASE_URI'] = url
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(url)
+        db.init_app(app)
+        return app
+    return criar
+
+
+@pytest.fixture
+def app_banco(criar_app):
+    """Banco novo no esquema atual; devolve a app com contexto ativo."""
+    from migrations import atualizar_banco
+
+    app = criar_app()
+    with app.app_context():
+        atualizar_banco(db)
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def ativar_chaves_estrangeiras(app_banco):
+    """Faz o SQLite aplicar as FKs nas próximas conexões, como o PostgreSQL."""
+    def ativar():
+        db.session.remove()
+        db.engine.dispose()
+        event.listen(db.engine, 'connect', lambda conexao, _: conexao.execute('PRAGMA foreign_keys = ON'))
+    return ativar
@@ -0,0 +1,31 @@
+from sqlalchemy import text
+
+from models import db, MovimentacaoEstoque
+from services.arquivamento_service import (
+    _preparar_tabela, anexar_arquivo, arquivar_movimentacoes, conferir_saldos,
+)
+from services.produto_service import criar_produto, parse_produto_form
+
+
+def test_arquivar_de_novo_apos_copia_sem_remocao(app_banco):
+    """Execução anterior interrompida: linhas já no arquivo e ainda no banco principal."""
+    criar_produto(parse_produto_form({'nome': 'Trena', 'quantidade': '3', 'tipo': 'material', 'unidade_medida': 'un'}), 1)
+    movimentacao = MovimentacaoEstoque.query.one()
+    ano = movimentacao.data.year
+
+    conn = db.session.connection()
+    alias = anexar_arquivo(conn, ano, criar=True)
+    colunas = ', '.join(_preparar_tabela(conn, alias, 'movimentacao_estoque'))
+    conn.execute(text(f'INSERT INTO {alias}.movimentacao_estoque ({colunas}) '
+                      f'SELECT {colunas} FROM main.movimentacao_estoque'))
+    db.session.commit()
+
+    resultado = arquivar_movimentacoes(dias_retencao=-1)
+
+    conn = db.session.connection()
+    anexar_arquivo(conn, ano)
+    assert resultado['anos'] == {ano: 1}
+    assert conn.execute(text(f'SELECT COUNT(*) FROM {alias}.movimentacao_estoque')).scalar() == 1
+    assert MovimentacaoEstoque.query.count() == 0
+    assert conferir_saldos()['total_divergencias'] == 0
+
@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from utils.datetime_utils import formatar_em_lotes
+
+
+def test_formatar_em_lotes_converte_sob_demanda():
+    lidos = []
+
+    def linhas():
+        for hora in range(5):
+            lidos.append(hora)
+            yield SimpleNamespace(data=datetime(2026, 1, 10, hora, tzinfo=timezone.utc))
+        yield SimpleNamespace(data=None)
+
+    pares = formatar_em_lotes(linhas(), 2)
+    linha, texto = next(pares)
+    assert lidos == [0, 1]
+    assert texto == '09/01/2026 21:00'
+    assert [texto for _, texto in pares] == [
+        '09/01/2026 22:00', '09/01/2026 23:00', '10/01/2026 00:00', '10/01/2026 01:00', '',
+    ]
@@ -0,0 +1,84 @@
+import csv
+import io
+
+from migrations import atualizar_banco
+from models import db, Produto
+from services.arquivamento_service import conferir_saldos
+from services.danificado_service import registrar_transicao
+from services.importacao_service import COLUNAS_CSV, importar_produtos, ler_csv, valores_csv
+from services.produto_service import criar_produto, parse_produto_form
+from services.produto_strategies import MaterialUpdateStrategy, ProdutoCreateStrategy
+from services.tipos_produto import RegistroTiposProduto, TipoProduto
+from services.validators import ProdutoSchemaValidator
+
+
+def _exportar(produtos) -> str:
+    saida = io.StringIO()
+    writer = csv.writer(saida)
+    writer.writerow(COLUNAS_CSV)
+    writer.writerows(valores_csv(produto) for produto in produtos)
+    return saida.getvalue()
+
+
+def test_reimportar_csv_mantem_danificadas_e_em_reparo(app_banco, criar_app):
+    produto = criar_produto(parse_produto_form({
+        'nome': 'Betoneira', 'quantidade': '10', 'quantidade_danificada': '4',
+        'tipo': 'equipamento', 'unidade_medida': 'un',
+    }), 1)
+    registrar_transicao(produto, 'enviar_reparo', 3, 1)
+    db.session.commit()
+    conteudo = _exportar([produto])
+
+    with criar_app('outro.db').app_context():
+        atualizar_banco(db)
+        resultado = importar_produtos(ler_csv(conteudo), 1)
+
+        assert resultado['erros'] == {}
+        importado = Produto.query.one()
+        assert importado.id_publico == produto.id_publico
+        assert (importado.quantidade, importado.quantidade_danificada, importado.quantidade_em_reparo) == (6, 1, 3)
+        assert conferir_saldos()['total_divergencias'] == 0
+        db.session.remove()
+
+
+def test_importar_em_reparo_acima_do_total(app_banco):
+    resultado = importar_produtos([{
+        'nome': 'Serra', 'quantidade': '3', 'quantidade_danificada': '2', 'quantidade_em_reparo': '2',
+        'tipo': 'equipamento', 'unidade_medida': 'un',
+    }], 1)
+
+    assert resultado['criados'] == []
+    assert resultado['erros'][0] == [
+        'Quantidade danificada mais a em reparo não pode ser maior que a quantidade total.'
+    ]
+
+
+class KitCreateStrategy(ProdutoCreateStrategy):
+    """Monta o Produto sem passar pelas colunas da classe base."""
+
+    def criar(self, data):
+        produto = Produto(nome=data['nome'], quantidade=data['quantidade_int'], tipo=data['tipo'],
+                          local_produto='Kits')
+        db.session.add(produto)
+        db.session.flush()
+        return produto
+
+
+def test_reimportar_tipo_com_criar_proprio_nao_duplica(app_banco, monkeypatch):
+    monkeypatch.setattr(RegistroTiposProduto, '_tipos', dict(RegistroTiposProduto._tipos))
+    monkeypatch.setattr(RegistroTiposProduto, '_despacho', RegistroTiposProduto._despacho)
+    monkeypatch.setattr(ProdutoSchemaValidator, '_padrao', None)
+    RegistroTiposProduto.registrar(TipoProduto('kit', 'Kit', KitCreateStrategy(), MaterialUpdateStrategy()))
+    linha = {
+        'id': '6f1c2b1e-3d4a-4c55-9a2e-0b7d8e9f1a2b', 'nome': 'Kit EPI', 'quantidade': '4',
+        'tipo': 'kit', 'unidade_medida': 'cx', 'local_produto': 'Almoxarifado',
+    }
+
+    primeira = importar_produtos([linha], 1)
+    segunda = importar_produtos([linha], 1)
+
+    assert primeira['erros'] == {}
+    produto = Produto.query.one()
+    assert (produto.id_publico, produto.unidade_medida, produto.local_produto) == (
+        linha['id'], 'cx', 'Almoxarifado')
+    assert segunda == {'criados': [], 'erros': {0: [f"id: Produto {linha['id']} já existe."]}}
@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import update
+
+from models import db, Job
+from services import job_service
+from services.job_service import ParametrosInvalidos, enfileirar, executar_job, reivindicar
+
+
+@pytest.fixture
+def tarefa_soma(monkeypatch):
+    chamadas = []
+
+    def somar(contexto, a: int, b: int = 0):
+        chamadas.append((a, b))
+        return {'soma': a + b}
+
+    monkeypatch.setitem(job_service.TAREFAS, 'somar', somar)
+    return chamadas
+
+
+@pytest.mark.parametrize('tipo, parametros, mensagem', [
+    ('inexistente', {}, 'Tarefa desconhecida'),
+    ('somar', {'c': 1}, 'Parâmetros inválidos para somar'),
+    ('somar', {}, 'Parâmetros inválidos para somar'),
+    ('somar', [1, 2], 'devem ser um objeto'),
+])
+def test_enfileirar_rejeita_tipo_e_parametros(app_banco, tarefa_soma, tipo, parametros, mensagem):
+    with pytest.raises(ParametrosInvalidos, match=mensagem):
+        enfileirar(tipo, parametros)
+    assert Job.query.count() == 0
+
+
+def test_parametros_invalidos_falham_sem_nova_tentativa(app_banco, tarefa_soma):
+    job = Job(tipo='somar', parametros={'c': 1}, max_tentativas=3, disponivel_em=job_service._agora())
+    db.session.add(job)
+    db.session.commit()
+
+    job_id = reivindicar('w1')
+    assert executar_job(job_id, 'w1')
+
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.tentativas) == ('falhou', 1)
+    assert tarefa_soma == []
+
+
+def test_desfecho_descartado_quando_o_job_foi_reivindicado_de_novo(app_banco, tarefa_soma):
+    job_id = enfileirar('somar', {'a': 2, 'b': 3}).id
+    assert reivindicar('w1') == job_id
+    # Heartbeat expirou: o job voltou para a fila e outro worker o reivindicou
+    tabela = Job.__table__
+    with db.engine.begin() as conn:
+        conn.execute(update(tabela).where(tabela.c.id == job_id)
+                     .values(worker='w2', tentativas=tabela.c.tentativas + 1))
+
+    assert not executar_job(job_id, 'w1')
+
+    job = db.session.get(Job, job_id, populate_existing=True)
+    assert (job.status, job.worker, job.resultado) == ('executando', 'w2', None)
+    assert tarefa_soma == [(2, 3)]
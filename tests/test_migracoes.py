@@ -0,0 +1,94 @@
+from sqlalchemy import text
+
+from migrations import atualizar_banco
+from models import db
+
+# Esquema da versão original (chaves UUID em texto, clones "<nome> (Danificado)")
+ESQUEMA_ORIGINAL = """
+CREATE TABLE produto (
+    id VARCHAR(36) NOT NULL PRIMARY KEY,
+    nome VARCHAR(100) NOT NULL,
+    quantidade INTEGER NOT NULL,
+    local_produto VARCHAR(100) NOT NULL,
+    unidade_medida VARCHAR(50),
+    tipo VARCHAR(50) NOT NULL,
+    origem VARCHAR(50),
+    danificado BOOLEAN,
+    origem_id VARCHAR(36) REFERENCES produto (id)
+);
+CREATE TABLE movimentacao_estoque (
+    id INTEGER NOT NULL PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,
+    quantidade INTEGER NOT NULL,
+    produto_id VARCHAR(36) REFERENCES produto (id),
+    usuario_id VARCHAR(36),
+    observacao TEXT,
+    data DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+CREATE TABLE movimentacao_estoque_obra (
+    id INTEGER NOT NULL PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,
+    quantidade INTEGER NOT NULL,
+    produto_id VARCHAR(36) REFERENCES produto (id),
+    usuario_id VARCHAR(36),
+    obra_id INTEGER,
+    data DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+CREATE TABLE compra (
+    id INTEGER NOT NULL PRIMARY KEY,
+    produto_id VARCHAR(36) REFERENCES produto (id),
+    quantidade INTEGER,
+    fornecedor VARCHAR(200),
+    data DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+CREATE TABLE equipamento_danificado (
+    id INTEGER NOT NULL PRIMARY KEY,
+    produto_id VARCHAR(36) REFERENCES produto (id),
+    nome VARCHAR(100) NOT NULL,
+    quantidade INTEGER NOT NULL,
+    data DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+"""
+
+# Furadeira: cadastrada com 10 (3 danificadas). Serra: cadastrada com 10 (3
+# danificadas) e editada para 5 danificadas (ajuste só do funcional).
+DADOS_ORIGINAIS = """
+INSERT INTO produto VALUES ('f', 'Furadeira', 7, 'Estoque Geral', 'un', 'Equipamento', 'Comprado', 0, NULL);
+INSERT INTO produto VALUES ('fd', 'Furadeira (Danificado)', 3, 'Estoque Geral', 'un', 'Equipamento', 'Comprado', 1, 'f');
+INSERT INTO produto VALUES ('s', 'Serra', 5, 'Estoque Geral', 'un', 'Equipamento', 'Comprado', 0, NULL);
+INSERT INTO produto VALUES ('sd', 'Serra (Danificado)', 5, 'Estoque Geral', 'un', 'Equipamento', 'Comprado', 1, 's');
+INSERT INTO produto VALUES ('c', 'Cabo', 4, 'Estoque Geral', 'm', 'Material', NULL, 0, NULL);
+INSERT INTO movimentacao_estoque (tipo, quantidade, produto_id, usuario_id) VALUES ('entrada', 10, 'f', '1');
+INSERT INTO movimentacao_estoque (tipo, quantidade, produto_id, usuario_id) VALUES ('entrada', 10, 's', '1');
+INSERT INTO movimentacao_estoque (tipo, quantidade, produto_id, usuario_id) VALUES ('ajuste', -2, 's', '1');
+INSERT INTO movimentacao_estoque (tipo, quantidade, produto_id, usuario_id) VALUES ('entrada', 4, 'c', '1');
+"""
+
+
+def test_atualizacao_da_versao_original_mantem_o_livro_fechado(criar_app):
+    app = criar_app()
+    with app.app_context():
+        conexao = db.engine.raw_connection()
+        conexao.executescript(ESQUEMA_ORIGINAL + DADOS_ORIGINAIS)
+        conexao.close()
+
+        atualizar_banco(db)
+
+        from services.arquivamento_service import conferir_saldos
+        resultado = conferir_saldos()
+        assert resultado['produtos_verificados'] == 3
+        assert resultado['divergencias'] == []
+
+        produtos = {
+            nome: (quantidade, danificada)
+            for nome, quantidade, danificada in db.session.execute(
+                text('SELECT nome, quantidade, quantidade_danificada FROM produto')
+            )
+        }
+        assert produtos == {'Furadeira': (7, 3), 'Serra': (5, 5), 'Cabo': (4, 0)}
+
+        danificar = db.session.execute(text(
+            "SELECT p.nome, m.quantidade FROM movimentacao_estoque m JOIN produto p ON p.id = m.produto_id "
+            "WHERE m.tipo = 'danificar' ORDER BY p.nome"
+        )).all()
+        assert [tuple(linha) for linha in danificar] == [('Furadeira', -3), ('Serra', -3)]
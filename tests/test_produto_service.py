@@ -0,0 +1,40 @@
+from models import db, Produto, SaldoArquivado
+from services.produto_service import criar_produto, excluir_produto, parse_produto_form
+
+
+def _criar(nome='Furadeira', quantidade='5', tipo='equipamento'):
+    return criar_produto(
+        parse_produto_form({'nome': nome, 'quantidade': quantidade, 'tipo': tipo, 'unidade_medida': 'un'}), 1
+    )
+
+
+def test_excluir_produto_com_saldo_arquivado(app_banco, ativar_chaves_estrangeiras):
+    from services.arquivamento_service import arquivar_movimentacoes
+
+    produto = _criar()
+    arquivar_movimentacoes(dias_retencao=-1)
+    assert SaldoArquivado.query.filter_by(produto_id=produto.id).count() == 1
+    produto_id, id_publico = produto.id, produto.id_publico
+
+    ativar_chaves_estrangeiras()
+    excluir_produto(id_publico)
+
+    assert db.session.get(Produto, produto_id) is None
+    assert SaldoArquivado.query.count() == 0
+
+
+def test_excluir_produto_transferido_para_obra(app_banco, ativar_chaves_estrangeiras):
+    from models import MovimentacaoEstoqueObra
+    from services.unidade_service import cadastrar_unidades, transicionar_unidades
+
+    produto = _criar(quantidade='0')
+    cadastrar_unidades(produto.id_publico, ['S1', 'S2'], 1, entrada=True)
+    transicionar_unidades(produto.id_publico, 'transferir', ['S1'], 1, obra_id=7)
+    assert MovimentacaoEstoqueObra.query.filter_by(produto_id=produto.id).count() == 1
+    produto_id, id_publico = produto.id, produto.id_publico
+
+    ativar_chaves_estrangeiras()
+    excluir_produto(id_publico)
+
+    assert db.session.get(Produto, produto_id) is None
+    assert MovimentacaoEstoqueObra.query.count() == 0
@@ -0,0 +1,12 @@
+from sqlalchemy import text
+
+from models import db
+from utils.roteamento_leitura import RoteadorLeitura
+
+
+def test_roteamento_desligado_nao_altera_journal_mode(criar_app):
+    app = criar_app()
+    RoteadorLeitura().init_app(app, db)
+    with app.app_context():
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'delete'
+        db.session.remove()
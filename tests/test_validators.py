@@ -0,0 +1,62 @@
+import pytest
+
+from services.validators import ProdutoSchemaValidator
+
+
+def _linha(**campos):
+    linha = {'nome': 'Cabo', 'quantidade': '3', 'tipo': 'material', 'unidade_medida': 'm'}
+    linha.update(campos)
+    return linha
+
+
+@pytest.mark.parametrize('tipo', [5, ['material'], {'nome': 'material'}, 'inexistente'])
+def test_tipo_que_nao_resolve_e_erro_da_linha(tipo):
+    resultado = ProdutoSchemaValidator.padrao().validar([_linha(tipo=tipo)])
+
+    assert not resultado.validos
+    assert any('Tipo de produto desconhecido' in erro for erro in resultado.erros[0])
+
+
+def test_tipo_invalido_nao_interrompe_o_lote():
+    resultado = ProdutoSchemaValidator.padrao().validar([_linha(tipo=5), _linha()])
+
+    assert list(resultado.erros) == [0]
+    assert [indice for indice, _ in resultado.validos] == [1]
+    assert resultado.validos[0][1]['tipo'] == 'Material'
+
+
+def _consumivel():
+    from services.produto_strategies import MaterialCreateStrategy, MaterialUpdateStrategy
+    from services.tipos_produto import TipoProduto
+
+    def validar_consumivel(linha, dados, erros):
+        if not linha.get('lote'):
+            erros.append('Lote é obrigatório para consumíveis.')
+        dados['lote'] = linha.get('lote')
+
+    return TipoProduto('consumivel', 'Consumível', MaterialCreateStrategy(), MaterialUpdateStrategy(),
+                       validar_extra=validar_consumivel)
+
+
+def test_edicao_aplica_validar_extra_do_tipo():
+    consumivel = _consumivel()
+    validador = ProdutoSchemaValidator(tipos=[consumivel])
+
+    with pytest.raises(ValueError, match='Lote é obrigatório'):
+        validador.validar_edicao({'nome': 'Luva', 'quantidade': '8'}, consumivel, 10)
+
+    dados = validador.validar_edicao({'nome': 'Luva', 'quantidade': '8', 'lote': 'L-1'}, consumivel, 10)
+    assert dados['lote'] == 'L-1'
+    assert dados['quantidade_int'] == 8
+
+
+def test_cadastro_e_edicao_aplicam_as_mesmas_regras_do_tipo():
+    consumivel = _consumivel()
+    validador = ProdutoSchemaValidator(tipos=[consumivel])
+    linha = {'nome': 'Luva', 'quantidade': '8', 'tipo': 'consumivel', 'unidade_medida': 'par'}
+
+    cadastro = validador.validar([linha])
+    with pytest.raises(ValueError) as edicao:
+        validador.validar_edicao(linha, consumivel, 8)
+
+    assert cadastro.erros[0] == [str(edicao.value)]
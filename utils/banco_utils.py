@@ -0,0 +1,34 @@
+"""Utilitários de configuração do banco (SQLite ou PostgreSQL)."""
+from typing import Dict, Optional
+
+
+def url_banco(url: Optional[str], padrao: str) -> str:
+    """
+    Normaliza a URL do banco.
+
+    Args:
+        url: Valor de DATABASE_URL (vazio = usar o padrão)
+        padrao: URL usada quando nenhuma foi configurada
+    """
+    if not url:
+        return padrao
+    # Provedores costumam exportar o esquema antigo "postgres://"
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def opcoes_engine(url: str) -> Dict:
+    """SQLALCHEMY_ENGINE_OPTIONS adequadas ao backend da URL."""
+    if url.startswith('sqlite'):
+        return {'connect_args': {'timeout': 15}}
+    return {'pool_pre_ping': True, 'pool_size': 10, 'max_overflow': 20}
+
+
+def insert_com_conflito(bind):
+    """`insert` do dialeto (PostgreSQL ou SQLite), com suporte a ON CONFLICT."""
+    if bind.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
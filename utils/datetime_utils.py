@@ -1,13 +1,235 @@
-"""Utilitários para datas e timezone."""
-import pytz
+"""
+Utilitários para datas e timezone.
 
-fuso = pytz.timezone('America/Sao_paulo')
+Datas são gravadas em UTC (coluna `DataHoraUTC`) e convertidas para o fuso
+de exibição apenas na apresentação, em lote:
+
+- listas de `datetime` (`converter_lote`, `formatar_em_lotes`): `astimezone` com
+  `zoneinfo`, cuja implementação em C já guarda as transições do fuso; a
+  conversão por pytz (`localize` + `normalize`) é evitada;
+- arrays NumPy `datetime64` (`converter_array`, relatórios e exportações): os
+  offsets do fuso são calculados uma vez por ano e guardados por intervalo
+  entre transições (início em epoch UTC -> offset); o array inteiro vira um
+  único `searchsorted`.
+"""
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import islice
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import DateTime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import TypeDecorator
+
+FUSO = ZoneInfo('America/Sao_Paulo')
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+FORMATO_PADRAO = '%d/%m/%Y %H:%M'
 
 
 def fusohorario(dt_utc):
-    """Converte datetime UTC para o fuso horário de São Paulo."""
+    """Converte datetime UTC (aware ou ingênuo) para o fuso horário de São Paulo."""
     if dt_utc is None:
         return None
     if getattr(dt_utc, 'tzinfo', None) is None:
-        dt_utc = pytz.utc.localize(dt_utc)
-    return dt_utc.astimezone(fuso)
+        dt_utc = dt_utc.replace(tzinfo=timezone.utc)
+    return dt_utc.astimezone(FUSO)
+
+
+def como_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    """Datetime aware em UTC; valores ingênuos são considerados UTC."""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def agora_utc() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class DataHoraUTC(TypeDecorator):
+    """
+    DateTime sempre em UTC.
+
+    Grava UTC sem tzinfo (mesmo formato das colunas existentes; valores
+    ingênuos são considerados UTC) e devolve datetimes aware em UTC.
+    """
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return como_utc(value)
+
+
+class utc_agora(FunctionElement):
+    """Valor padrão do servidor em UTC, independente do fuso da sessão."""
+    type = DataHoraUTC()
+    inherit_cache = True
+
+
+@compiles(utc_agora)
+def _utc_agora_padrao(elemento, compilador, **kw):
+    # SQLite: CURRENT_TIMESTAMP já é UTC
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(utc_agora, 'postgresql')
+def _utc_agora_postgresql(elemento, compilador, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+class TransicoesFuso:
+    """
+    Offsets UTC de um fuso por intervalo entre transições, carregados por ano.
+
+    Em `tabela = (inicios, offsets)`, `inicios[i]` é o epoch UTC a partir do
+    qual vale `offsets[i]` (segundos). A tabela é substituída inteira a cada
+    ano carregado, então leitores concorrentes nunca a veem pela metade.
+    """
+
+    def __init__(self, fuso):
+        self.fuso = fuso
+        self.tabela = ([], [])
+        self._anos = frozenset()
+        self._arrays = None
+        self._lock = Lock()
+
+    def _offset(self, epoch: int) -> int:
+        instante = EPOCH + timedelta(seconds=epoch)
+        return int(instante.astimezone(self.fuso).utcoffset().total_seconds())
+
+    def _transicoes_do_ano(self, ano: int):
+        """Início do ano e cada transição (passo diário + busca binária até o segundo)."""
+        inicio = (datetime(ano, 1, 1, tzinfo=timezone.utc) - EPOCH) // timedelta(seconds=1)
+        fim = (datetime(ano + 1, 1, 1, tzinfo=timezone.utc) - EPOCH) // timedelta(seconds=1)
+        anterior, offset_anterior = inicio, self._offset(inicio)
+        pontos = [(inicio, offset_anterior)]
+        while anterior < fim:
+            atual = min(anterior + 86400, fim)
+            offset_atual = self._offset(atual)
+            if offset_atual != offset_anterior:
+                baixo, alto = anterior, atual
+                while alto - baixo > 1:
+                    meio = (baixo + alto) // 2
+                    if self._offset(meio) == offset_anterior:
+                        baixo = meio
+                    else:
+                        alto = meio
+                pontos.append((alto, offset_atual))
+            anterior, offset_anterior = atual, offset_atual
+        return pontos
+
+    def garantir(self, anos: Iterable[int]):
+        """Carrega os anos ainda ausentes da tabela."""
+        faltando = set(anos) - self._anos
+        if not faltando:
+            return
+        with self._lock:
+            faltando -= self._anos
+            pontos = dict(zip(*self.tabela))
+            for ano in faltando:
+                pontos.update(self._transicoes_do_ano(ano))
+            ordenados = sorted(pontos.items())
+            self.tabela = ([epoch for epoch, _ in ordenados], [offset for _, offset in ordenados])
+            self._anos = self._anos | faltando
+            self._arrays = None
+
+    def arrays(self):
+        """(inicios, offsets) como arrays NumPy int64."""
+        import numpy as np
+
+        arrays = self._arrays
+        if arrays is None or len(arrays[0]) != len(self.tabela[0]):
+            inicios, offsets = self.tabela
+            arrays = self._arrays = (np.array(inicios, dtype=np.int64), np.array(offsets, dtype=np.int64))
+        return arrays
+
+
+@lru_cache(maxsize=None)
+def transicoes(fuso=FUSO) -> TransicoesFuso:
+    return TransicoesFuso(fuso)
+
+
+def converter_lote(datas: Iterable[Optional[datetime]], fuso=FUSO) -> List[Optional[datetime]]:
+    """
+    Converte uma sequência de datas UTC (aware ou ingênuas) para o fuso.
+
+    None é preservado. Nos horários repetidos do fim do horário de verão o
+    resultado traz `fold` ajustado, então o instante continua identificável.
+    """
+    utc = timezone.utc
+    return [
+        None if dt is None else (dt if dt.tzinfo is not None else dt.replace(tzinfo=utc)).astimezone(fuso)
+        for dt in datas
+    ]
+
+
+def converter_array(datas, fuso=FUSO):
+    """
+    Converte um array NumPy `datetime64` (UTC) para o horário local do fuso.
+
+    Returns:
+        numpy.ndarray: datetime64 na mesma unidade, com o horário de parede local
+            (NaT é preservado)
+    """
+    import numpy as np
+
+    datas = np.asarray(datas)
+    if not np.issubdtype(datas.dtype, np.datetime64):
+        datas = datas.astype('datetime64[us]')
+    validos = ~np.isnat(datas)
+    if not validos.any():
+        return datas.copy()
+
+    tabela = transicoes(fuso)
+    tabela.garantir(np.unique(datas[validos].astype('datetime64[Y]').astype(np.int64) + 1970).tolist())
+    inicios, offsets = tabela.arrays()
+
+    epochs = datas.astype('datetime64[s]').astype(np.int64)
+    indices = np.searchsorted(inicios, epochs, side='right') - 1
+    deslocamento = offsets[np.clip(indices, 0, None)].astype('timedelta64[s]')
+    return np.where(validos, datas + deslocamento, datas)
+
+
+def formatar_lote(datas: Sequence[Optional[datetime]], formato: str = FORMATO_PADRAO, fuso=FUSO) -> List[str]:
+    """Datas UTC formatadas no fuso ('' para None)."""
+    return ['' if dt is None else dt.strftime(formato) for dt in converter_lote(datas, fuso)]
+
+
+def formatar_em_lotes(itens: Iterable, tamanho: int, atributo: str = 'data',
+                      formato: str = FORMATO_PADRAO, fuso=FUSO) -> Iterator[Tuple]:
+    """
+    Pares (item, data formatada) de um iterável, convertendo `tamanho` datas por vez.
+
+    Sob demanda: só um lote fica na memória, então serve para respostas em
+    streaming.
+    """
+    itens = iter(itens)
+    while True:
+        lote = list(islice(itens, tamanho))
+        if not lote:
+            return
+        yield from zip(lote, formatar_lote([getattr(item, atributo, None) for item in lote], formato, fuso))
+
+
+# Filtros Jinja
+
+def filtro_data_local(dt: Optional[datetime], formato: str = FORMATO_PADRAO) -> str:
+    """`{{ mov.data|data_local }}`"""
+    return formatar_lote([dt], formato)[0]
+
+
+FILTROS_JINJA: Dict = {
+    'data_local': filtro_data_local,
+}
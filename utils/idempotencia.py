@@ -0,0 +1,103 @@
+"""
+Decorator `@idempotente` para rotas de escrita (ver services.idempotencia_service).
+
+Requisições sem chave seguem normalmente. Com chave:
+
+- primeira vez: a rota executa e a resposta (status, Location, corpo e
+  mensagens flash) é gravada; respostas 5xx ou exceções liberam a chave;
+- repetição com o mesmo conteúdo: a resposta gravada é devolvida, com o
+  cabeçalho `Idempotent-Replayed: true`, e as mensagens flash são refeitas;
+- repetição enquanto a primeira ainda executa: 409;
+- mesma chave com outro método, caminho ou corpo: 422.
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from flask import current_app, flash, jsonify, request, session
+
+CABECALHO = 'Idempotency-Key'
+CAMPO_FORMULARIO = 'chave_idempotencia'
+CABECALHOS_GRAVADOS = ('Location', 'Content-Type')
+TAMANHO_MAXIMO_CHAVE = 100
+
+
+def nova_chave() -> str:
+    """Chave para o campo oculto dos formulários (`{{ nova_chave_idempotencia() }}`)."""
+    return str(uuid.uuid4())
+
+
+def _assinatura() -> str:
+    """sha256 de método, caminho e conteúdo (formulários pelos campos: o boundary do multipart muda a cada envio)."""
+    resumo = hashlib.sha256(f'{request.method}\n{request.path}\n'.encode())
+    if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        for nome, valor in sorted(request.form.items(multi=True)):
+            resumo.update(f'{nome}={valor}\n'.encode())
+        for nome, arquivo in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            resumo.update(f'{nome}:{arquivo.filename}\n'.encode())
+            resumo.update(arquivo.stream.read())
+            arquivo.stream.seek(0)
+    else:
+        resumo.update(request.get_data(cache=True))
+    return resumo.hexdigest()
+
+
+def _erro(mensagem: str, codigo: int):
+    return jsonify({'erro': mensagem}), codigo
+
+
+def _repetir(registro):
+    from services.idempotencia_service import CONCLUIDO
+
+    if registro.status != CONCLUIDO:
+        return _erro('Requisição com esta chave ainda em processamento.', 409)
+    for categoria, mensagem in registro.mensagens or []:
+        flash(mensagem, categoria)
+    resposta = current_app.response_class(registro.corpo or b'', status=registro.codigo)
+    for nome, valor in (registro.cabecalhos or {}).items():
+        resposta.headers[nome] = valor
+    resposta.headers['Idempotent-Replayed'] = 'true'
+    return resposta
+
+
+def idempotente(view):
+    """Torna a rota idempotente por `Idempotency-Key` / `chave_idempotencia` (apenas POST)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from services import idempotencia_service
+
+        if request.method != 'POST':
+            return view(*args, **kwargs)
+
+        assinatura = _assinatura()
+        chave = request.headers.get(CABECALHO) or request.form.get(CAMPO_FORMULARIO)
+        if not chave:
+            return view(*args, **kwargs)
+        if len(chave) > TAMANHO_MAXIMO_CHAVE:
+            return _erro(f'{CABECALHO} deve ter no máximo {TAMANHO_MAXIMO_CHAVE} caracteres.', 400)
+
+        ttl = current_app.config.get('IDEMPOTENCIA_TTL', idempotencia_service.TTL_PADRAO)
+        reservou, registro = idempotencia_service.reservar(chave, assinatura, ttl)
+        if not reservou:
+            if registro is None:
+                # Removida entre a tentativa de reserva e a leitura (limpeza concorrente)
+                return _erro('Requisição com esta chave ainda em processamento.', 409)
+            if registro.assinatura != assinatura:
+                return _erro(f'{CABECALHO} já usada em outra requisição.', 422)
+            return _repetir(registro)
+
+        mensagens_antes = len(session.get('_flashes', []))
+        try:
+            resposta = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            idempotencia_service.liberar(chave)
+            raise
+
+        if resposta.status_code >= 500 or resposta.is_streamed:
+            idempotencia_service.liberar(chave)
+            return resposta
+        mensagens = [list(m) for m in session.get('_flashes', [])[mensagens_antes:]]
+        cabecalhos = {nome: resposta.headers[nome] for nome in CABECALHOS_GRAVADOS if nome in resposta.headers}
+        idempotencia_service.concluir(chave, resposta.status_code, resposta.get_data(), cabecalhos, mensagens)
+        return resposta
+    return wrapper
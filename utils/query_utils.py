@@ -1,5 +1,4 @@
 """Utilitários para queries de produtos."""
-from sqlalchemy import not_
 
 
 def build_produtos_query(busca: str = '', tipo: str = '', ordem: str = 'asc'):
@@ -20,8 +19,6 @@ def build_produtos_query(busca: str = '', tipo: str = '', ordem: str = 'asc'):
     if tipo:
         query = query.filter(Produto.tipo == tipo)
 
-    query = query.filter(not_(Produto.nome.ilike('%(Danificado)%')))
-
     if ordem == 'desc':
         query = query.order_by(Produto.quantidade.desc())
     else:
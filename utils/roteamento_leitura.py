@@ -0,0 +1,201 @@
+"""
+Roteamento de leituras para uma fonte separada do banco principal.
+
+Rotas marcadas com `@somente_leitura(atraso_maximo=...)` executam suas
+consultas (GET/HEAD) na fonte de leitura; escritas, flushes e todas as
+demais rotas continuam no banco principal. Fontes, conforme a configuração:
+
+- `SQLALCHEMY_DATABASE_URI_LEITURA`: réplica real (ex.: PostgreSQL standby),
+  com atraso estimado em `LEITURA_ATRASO_REPLICA` segundos;
+- SQLite com `LEITURA_SQLITE_MODO = 'wal'`: conexões somente leitura ao
+  mesmo arquivo em modo WAL, que leem um snapshot sem bloquear nem serem
+  bloqueadas pelo escritor (atraso zero);
+- SQLite com `LEITURA_SQLITE_MODO = 'copia'`: cópia feita com a API de
+  backup em `instance/estoque_leitura.db`, renovada por uma thread em
+  segundo plano a cada `LEITURA_COPIA_INTERVALO` segundos (nunca dentro da
+  requisição); rotas cujo atraso máximo a cópia já excede leem do principal.
+
+Sem réplica e sem `LEITURA_SQLITE_MODO` o roteamento fica desligado: tudo lê
+do principal e o journal_mode do arquivo não é alterado.
+
+Read-your-writes: requisições que gravam devolvem o cookie `ultima_escrita`;
+enquanto a fonte de leitura for mais antiga que ele, a rota lê do principal.
+"""
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import Optional
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Delete, Insert, Update, create_engine, event
+
+from utils.banco_utils import opcoes_engine
+
+COOKIE_ULTIMA_ESCRITA = 'ultima_escrita'
+
+
+class SessaoRoteada(Session):
+    """Sessão que envia as consultas de rotas somente leitura para a fonte de leitura."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, (Insert, Update, Delete)):
+            engine = getattr(g, 'engine_leitura', None) if has_request_context() else None
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class RoteadorLeitura:
+    """Mantém a engine de leitura e decide, por requisição, se ela pode ser usada."""
+
+    def __init__(self):
+        self.modo = None
+        self.engine = None
+        self.atraso_replica = 0.0
+        self._origem = None
+        self._copia = None
+        self._atualizada_em = 0.0
+        self._intervalo_copia = 30.0
+        self._renovacao = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        app.extensions['roteador_leitura'] = self
+        url_leitura = app.config.get('SQLALCHEMY_DATABASE_URI_LEITURA')
+
+        with app.app_context():
+            principal = db.engine
+
+        if url_leitura:
+            self.modo = 'replica'
+            self.engine = create_engine(url_leitura, **opcoes_engine(url_leitura))
+            self.atraso_replica = float(app.config.get('LEITURA_ATRASO_REPLICA', 1.0))
+        elif (app.config.get('LEITURA_SQLITE_MODO') and principal.dialect.name == 'sqlite'
+              and principal.url.database not in (None, '', ':memory:')):
+            self._origem = principal.url.database
+            # WAL nas conexões do principal (o journal_mode fica gravado no arquivo na primeira delas)
+            event.listen(principal, 'connect', _ativar_wal)
+            if app.config['LEITURA_SQLITE_MODO'] == 'copia':
+                self.modo = 'copia'
+                self._copia = os.path.join(app.instance_path, 'estoque_leitura.db')
+                self._intervalo_copia = float(app.config.get('LEITURA_COPIA_INTERVALO', 30.0))
+                self.engine = create_engine(f'sqlite:///{self._copia}', connect_args={'timeout': 15})
+            else:
+                self.modo = 'wal'
+                self.engine = create_engine(
+                    f'sqlite:///file:{self._origem}?mode=ro&uri=true', connect_args={'timeout': 15}
+                )
+
+        app.after_request(self._marcar_escrita)
+        event.listen(db.session, 'after_flush', _registrar_escrita)
+        event.listen(db.session, 'do_orm_execute', _registrar_escrita_em_lote)
+
+    def idade(self) -> float:
+        """Segundos de atraso estimado da fonte de leitura em relação ao principal."""
+        if self.modo == 'replica':
+            return self.atraso_replica
+        if self.modo == 'copia':
+            return time.time() - self._atualizada_em
+        return 0.0
+
+    def atualizar_copia(self):
+        """Recria a cópia de leitura a partir do principal (API de backup do SQLite)."""
+        with self._lock:
+            inicio = time.time()
+            origem = sqlite3.connect(self._origem, timeout=15)
+            destino = sqlite3.connect(self._copia, timeout=15)
+            try:
+                origem.backup(destino)
+            finally:
+                destino.close()
+                origem.close()
+            self._atualizada_em = inicio
+
+    def _renovar_copia(self):
+        while True:
+            try:
+                self.atualizar_copia()
+            except sqlite3.Error:
+                # Principal ocupado ou indisponível: a cópia envelhece e as rotas caem no principal
+                pass
+            time.sleep(self._intervalo_copia)
+
+    def _iniciar_renovacao(self):
+        """Inicia a thread de renovação da cópia no primeiro uso (só nos processos que servem leituras)."""
+        with self._lock:
+            if self._renovacao is None:
+                self._renovacao = threading.Thread(target=self._renovar_copia, name='copia-leitura', daemon=True)
+                self._renovacao.start()
+
+    def engine_para(self, atraso_maximo: float, ultima_escrita: Optional[float]):
+        """
+        Engine de leitura para a requisição, ou None para usar o principal.
+
+        Args:
+            atraso_maximo: Atraso tolerado pela rota, em segundos
+            ultima_escrita: Epoch da última escrita do cliente (cookie), se houver
+        """
+        if self.engine is None:
+            return None
+
+        if self.modo == 'copia' and self._renovacao is None:
+            self._iniciar_renovacao()
+
+        agora = time.time()
+        idade = self.idade()
+        if idade > atraso_maximo:
+            return None
+        if ultima_escrita and agora - idade < ultima_escrita:
+            return None
+        return self.engine
+
+    @staticmethod
+    def _marcar_escrita(resposta):
+        if getattr(g, 'escreveu', False):
+            resposta.set_cookie(COOKIE_ULTIMA_ESCRITA, f'{time.time():.3f}', httponly=True, samesite='Lax')
+        return resposta
+
+
+def _ativar_wal(dbapi_conn, _registro):
+    cursor = dbapi_conn.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+def _registrar_escrita(session, _contexto):
+    if has_request_context() and (session.new or session.dirty or session.deleted):
+        g.escreveu = True
+
+
+def _registrar_escrita_em_lote(estado):
+    # INSERT/UPDATE/DELETE executados direto na sessão não passam pelo flush
+    if has_request_context() and (estado.is_insert or estado.is_update or estado.is_delete):
+        g.escreveu = True
+
+
+def somente_leitura(atraso_maximo: float = 30.0):
+    """
+    Marca a rota como somente leitura (apenas GET/HEAD são roteados).
+
+    Args:
+        atraso_maximo: Quanto, em segundos, os dados podem estar desatualizados
+    """
+    def decorador(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import current_app
+
+            roteador = current_app.extensions.get('roteador_leitura')
+            if roteador is not None and request.method in ('GET', 'HEAD'):
+                try:
+                    ultima_escrita = float(request.cookies.get(COOKIE_ULTIMA_ESCRITA, 0)) or None
+                except ValueError:
+                    ultima_escrita = None
+                g.engine_leitura = roteador.engine_para(atraso_maximo, ultima_escrita)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorador